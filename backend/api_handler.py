@@ -1,90 +1,113 @@
-from flask import Flask, jsonify, request, make_response
+from flask import Flask, jsonify, request, make_response, g
 from flask_cors import CORS, cross_origin
 import mysql.connector
-from mysql.connector import pooling
 import random
 import string
 import jwt
 import json
 import datetime
-import requests
-from dotenv import load_dotenv
+import math
 import os
 import re
 from time import time
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import logging
+from routing import to_point, haversine_km, order_stops, trip_matrix, plan_routes, open_route_length, repair_path, cheapest_insertion
+from planning import working_days, plan_month
+from cache import LRUCache
+from spatial_index import GridIndex
+from auth_store import create_auth_store, StoreDict
+from sms_dispatcher import SMSDispatcher, SMSQueueFull
+import queries
+from calendar_cache import CalendarCache
+import report_history
+from report_archive import ArchiveCutoffs, ARCHIVE_TABLES
+from catalog_cache import CatalogCache
+from equipment_search import EquipmentSearch
+import threading
+from config import (
+    AUTH_STATE_BACKEND, AUTH_STATE_PATH, AUTH_STATE_MAX_ENTRIES, CLIENT_CACHE_SIZE, CLIENT_CACHE_TTL,
+    JWT_SECRET_KEY, sms_url, sms_api_key, sms_root_phone, sms_root_password, sms_sender, SMS_WORKERS,
+    SMS_QUEUE_SIZE, SMS_RETRIES, OSRM_REFINE, DEPOT_LAT, DEPOT_LONG, WORK_WEEKDAYS, SERVICE_MINUTES,
+    DAY_START, TRIP_CACHE_SIZE, TRIP_CACHE_TTL, PRECOMPUTE_AT, NEARBY_INDEX_TTL, NEARBY_MAX_RADIUS_KM,
+    REPORT_HISTORY, REPORT_ARCHIVE, REPORT_ARCHIVE_REFRESH, ASSIGN_BATCH_SIZE, CALENDAR_MAX_DAYS,
+    CALENDAR_CACHE_MONTHS, CATALOG_CHECK_INTERVAL, EQUIPMENT_SEARCH_MAX_LIMIT
+)
+from database import connection_pool, get_db_connection
+from trip_planning import travel_matrix, routing_client, trip_store, get_travel_submatrix, get_optimal_trip, precompute_day_trips
 
-load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 limiter = Limiter(key_func=get_remote_address)
 limiter.init_app(app)
 
-# Configure MySQL connection
-db_config = {
-    'user': os.environ.get('DB_USER'),
-    'password': os.environ.get('DB_PASSWORD'),
-    'host': os.environ.get('DB_HOST'),
-    'database': os.environ.get('DB_NAME')
-}
 
-connection_pool = pooling.MySQLConnectionPool(pool_name="mypool", pool_size=10, **db_config)
+client_rows = LRUCache(maxsize=CLIENT_CACHE_SIZE, ttl=CLIENT_CACHE_TTL)
+rep_rows = LRUCache(maxsize=CLIENT_CACHE_SIZE, ttl=CLIENT_CACHE_TTL)
+client_contacts = LRUCache(maxsize=CLIENT_CACHE_SIZE, ttl=CLIENT_CACHE_TTL)
 
-otp_storage = {}
-otp_attempts = {}
-otp_resend_attempts = {}
-otp_blocked = {}
-otp_resend_blocked = {}
-otp_expiry = {}
-employee_login_attempts = {}
-employee_login_blocked = {}
+auth_store = create_auth_store(AUTH_STATE_BACKEND, AUTH_STATE_PATH, AUTH_STATE_MAX_ENTRIES)
+otp_storage = StoreDict(auth_store, 'otp')
+otp_attempts = StoreDict(auth_store, 'otp_attempts')
+otp_resend_attempts = StoreDict(auth_store, 'otp_resend_attempts')
+otp_blocked = StoreDict(auth_store, 'otp_blocked')
+otp_resend_blocked = StoreDict(auth_store, 'otp_resend_blocked')
+otp_expiry = StoreDict(auth_store, 'otp_expiry')
+employee_login_attempts = StoreDict(auth_store, 'employee_login_attempts')
+employee_login_blocked = StoreDict(auth_store, 'employee_login_blocked')
 MAX_OTP_ATTEMPTS = 5
 MAX_LOGIN_ATTEMPTS = 5
 BLOCK_TIME = 7200 # 2 hours = 7200 seconds
 OTP_VALIDITY_PERIOD = 10 * 60  # 10 minutes
-JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
-
-#SMS API data
 
-sms_url="https://api.sms4free.co.il/ApiSMS/v2/SendSMS"
-sms_api_key=os.environ.get('SMS_API_KEY')
-sms_root_phone=os.environ.get('SMS_ROOT_PHONE')
-sms_root_password=os.environ.get('SMS_ROOT_PASSWORD')
-sms_sender=os.environ.get('SMS_SENDER')
-
-# Set a connection to the database.
-def get_db_connection():
-    try:
-        conn = connection_pool.get_connection()
-        return conn
-    except mysql.connector.Error as err:
-        app.logger.error("Error: Could not connect to MySQL database.")
-        app.logger.error(err)
-        return None
+# Decimal places of the start position in the cache key (3 is roughly 100 m).
+TRIP_CACHE_PRECISION = 3
+
+trip_cache = LRUCache(maxsize=TRIP_CACHE_SIZE, ttl=TRIP_CACHE_TTL)
+# Last order handed out per employee and day, the warm start for incremental re-planning.
+trip_plans = LRUCache(maxsize=TRIP_CACHE_SIZE, ttl=24 * 60 * 60)
+report_archive_cutoffs = ArchiveCutoffs(REPORT_ARCHIVE_REFRESH)
+# Month versions live in the auth state store, so with AUTH_STATE_BACKEND=sqlite every worker sees the others' writes.
+calendar_cache = CalendarCache(StoreDict(auth_store, 'calendar_version'), CALENDAR_CACHE_MONTHS)
+# Catalog versions are shared the same way, so /invalidateCatalogCache reaches every worker.
+catalog_cache = CatalogCache(StoreDict(auth_store, 'catalog_version'), lambda rows: app.json.dumps(rows), CATALOG_CHECK_INTERVAL)
+# Follows the cached equipment catalog, re-indexing only the items that changed between versions.
+equipment_search = EquipmentSearch()
+# apt_date -> [GridIndex of the day's open appointments, last sync time]
+open_appointment_indexes = {}
+open_appointment_indexes_lock = threading.Lock()
+
+@app.teardown_request
+def release_db_connection(exc):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.release()
 
 def generate_otp():
     return ''.join(random.choices(string.digits, k=6))
 
+def sms_payload(recipient, text):
+    data={}
+    data["key"]=sms_api_key
+    data["user"]=sms_root_phone
+    data["sender"]=sms_sender
+    data["pass"]=sms_root_password
+    data["recipient"]=recipient
+    data["msg"]=text
+    return data
+
+sms_dispatcher = SMSDispatcher(sms_url, sms_payload, workers=SMS_WORKERS, queue_size=SMS_QUEUE_SIZE, retries=SMS_RETRIES)
+
 def send_otp(phone_number, otp):
+    # Queued for the background SMS workers, returns the message id to track delivery.
     try:
-        data={}
-        data["key"]=sms_api_key
-        data["user"]=sms_root_phone
-        data["sender"]=sms_sender
-        data["pass"]=sms_root_password
-        data["recipient"]=phone_number
-        data["msg"]="Hi, your one-time code is: " + otp
-        response=requests.post(sms_url, json=data)
-        print(response.text)
-
-        return response.text
-    except Exception as e:
-        print(e)
-        return None 
-    
+        return sms_dispatcher.send(phone_number, "Hi, your one-time code is: " + otp)
+    except SMSQueueFull as e:
+        app.logger.error(f"Could not queue OTP SMS: {e}")
+        return None
+
 def validate_token(token):
     if not token:
         return None, {'Error': 'Forbidden! Invalid token.', 'type': 'TokenError'}, 403
@@ -99,123 +122,474 @@ def validate_token(token):
     return decoded_token, None, None
 
 def fetch_client_data(client_id):
-    if not re.match(r'^\d+$', client_id):
+    if not re.match(r'^\d+$', str(client_id)):
         return None
+
+    # Callers get their own copy, so changing it cannot corrupt the cache.
+    client_data = client_rows.get(str(client_id))
+    if client_data is not None:
+        return dict(client_data)
     
     conn = get_db_connection()
     if conn is None:
         return None
     
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM Client WHERE client_id = %s", (client_id,))
-    client_data = cursor.fetchone()
-    cursor.close()
+    client_data = queries.fetch_one(conn, 'client_by_id', (client_id,))
     conn.close()
+
+    if client_data:
+        client_rows.set(str(client_id), dict(client_data), tags=[('client', str(client_id))])
     return client_data
 
 def fetch_client_representative(rep_id):
-    if not re.match(r'^\d+$', rep_id):
+    if not re.match(r'^\d+$', str(rep_id)):
         
         return None, "Invalid representative ID format"
 
+    result = rep_rows.get(str(rep_id))
+    if result is not None:
+        return dict(result), None
+
     conn = get_db_connection()
     if conn is None:
         return None, "Could not connect to the database"
 
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM ClientRepresentative WHERE rep_id = %s", (rep_id,))
-    result = cursor.fetchone()
-    cursor.close()
+    result = queries.fetch_one(conn, 'rep_by_id', (rep_id,))
     conn.close()
+
+    if result:
+        rep_rows.set(str(rep_id), dict(result), tags=[('rep', str(rep_id))])
     return result, None
 
+def fetch_client_contact(client_id):
+    """Client's representative and phone for the auth path, one JOIN on a cache miss."""
+    if not re.match(r'^\d+$', str(client_id)):
+        return None, "Invalid client ID format"
+
+    contact = client_contacts.get(str(client_id))
+    if contact is not None:
+        return dict(contact), None
+
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Could not connect to the database"
+
+    try:
+        contact = queries.fetch_one(conn, 'client_contact', (client_id,))
+    except mysql.connector.Error as err:
+        app.logger.error("Database query failed.")
+        app.logger.error(err)
+        return None, "Database query failed"
+    finally:
+        conn.close()
+
+    if contact:
+        client_contacts.set(str(client_id), dict(contact), tags=[('client', str(client_id)), ('rep', str(contact['client_rep']))])
+    return contact, None
+
+def invalidate_client_lookups(client_id=None, rep_id=None):
+    # Client and representative rows are edited outside this API, so the caches are dropped explicitly.
+    for cache in (client_rows, rep_rows, client_contacts):
+        if client_id is not None:
+            cache.invalidate_tag(('client', str(client_id)))
+        if rep_id is not None:
+            cache.invalidate_tag(('rep', str(rep_id)))
+        if client_id is None and rep_id is None:
+            cache.clear()
+
+def month_range(year, month, months=1):
+    """First day of the month and first day after the months-long period starting there."""
+    start = datetime.date(year, month, 1)
+    end_month = month - 1 + months
+    return start, datetime.date(year + end_month // 12, end_month % 12 + 1, 1)
+
 def fetch_appointments_by_month_and_year(month, year):
+    result, version = calendar_cache.rows(year, month)
+    if result is not None:
+        return result, None
+
+    result, error = fetch_appointments_in_range(*month_range(year, month))
+    if not error:
+        calendar_cache.load_rows(year, month, result, version)
+    return result, error
+
+def fetch_month_appointment_counts(month, year):
+    counts, version = calendar_cache.counts(year, month)
+    if counts is not None:
+        return counts, None
+
+    counts, error = fetch_appointment_counts(*month_range(year, month))
+    if not error:
+        calendar_cache.load_counts(year, month, {parse_apt_date(day): n for day, n in counts.items()}, version)
+    return counts, error
+
+def parse_apt_date(value):
+    # MySQL takes any delimiter between the date parts, and a time may follow.
+    match = re.match(r'^\s*(\d{4})\D(\d{1,2})\D(\d{1,2})', str(value))
+    if match is None:
+        return None
+    try:
+        return datetime.date(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+def fetch_appointments_in_range(start, end):
     conn = get_db_connection()
     if conn is None:
         return None, "Could not connect to the database"
 
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT * FROM Appointment WHERE MONTH(apt_date) = %s AND YEAR(apt_date) = %s", (month, year))
-    result = cur.fetchall()
-    cur.close()
+    result = queries.fetch_all(conn, 'appointments_in_range', (start, end))
     conn.close()
 
     return result, None
 
+def fetch_appointment_counts(start, end):
+    """Appointments per day between start (inclusive) and end (exclusive), counted by the database."""
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Could not connect to the database"
+
+    try:
+        rows = queries.fetch_all(conn, 'appointment_counts_in_range', (start, end))
+    except mysql.connector.Error as err:
+        app.logger.error("Database query failed.")
+        app.logger.error(err)
+        return None, "Database query failed"
+    finally:
+        conn.close()
+
+    return {row['apt_date'].strftime('%Y-%m-%d'): row['count'] for row in rows}, None
+
 def check_blocked(blocked_dict, dict_key):
     current_time = time()
 
     # Check if the client is blocked and if the block period has expired
-    if dict_key in blocked_dict:
-        if current_time < blocked_dict[dict_key]:
+    blocked_until = blocked_dict.get(dict_key)
+    if blocked_until is not None:
+        if current_time < blocked_until:
             return True
         else:
             # Unblock the client after the block period has expired
-            del blocked_dict[dict_key]
+            blocked_dict.pop(dict_key, None)
     
     return False
 
-def get_optimal_trip(start_lat, start_lon, clients):
-    # Define the OSRM API endpoint
-    osrm_url = 'http://router.project-osrm.org/trip/v1/driving/'
-
-    # Extract the waypoints coordinates from the clients array
-    waypoints = [(client['client_lat'], client['client_long']) for client in clients]
-
-    # Combine starting point and waypoints into a single list
-    coordinates = [(start_lon, start_lat)] + [(lon, lat) for lat, lon in waypoints]
+def repair_trip(start, clients, previous_order):
+    # Warm start from the last known order of the day, repaired only around what changed.
+    stops = [to_point(client['client_lat'], client['client_long']) for client in clients]
+    if not all(stops):
+        return None
+    stop_ids = [str(client['apt_client']) for client in clients]
+    node_of = {client_id: node for node, client_id in enumerate(stop_ids, start=1)}
+    matrix = trip_matrix(start, stops, get_travel_submatrix(clients))
+    path = repair_path(matrix, [node_of.get(client_id) for client_id in previous_order])
+    return [clients[node - 1] for node in path[1:]]
+
+def trip_delta(previous_order, order):
+    previous_ids, current_ids = set(previous_order), set(order)
+    previous = [client_id for client_id in previous_order if client_id in current_ids]
+    kept = [client_id for client_id in order if client_id in previous_ids]
+    return {
+        "removed": [client_id for client_id in previous_order if client_id not in current_ids],
+        "added": [client_id for client_id in order if client_id not in previous_ids],
+        "moved": [client_id for client_id, old_id in zip(kept, previous) if client_id != old_id]
+    }
+
+def plan_employee_trip(emp_id, apt_date, start_lat, start_lon, clients):
+    """Order an employee's open stops, returning (ordered clients, mode, delta, error).
+
+    mode is 'cached' for an identical request, 'incremental' when the last
+    order of the day was repaired, and 'full' for a fresh solve.
+    """
+    start = to_point(start_lat, start_lon)
+    if start is None:
+        ordered_clients, error = get_optimal_trip(start_lat, start_lon, clients)
+        return ordered_clients, 'full', None, error
+
+    stop_ids = [str(client['apt_client']) for client in clients]
+    key = (str(emp_id), str(apt_date), tuple(sorted(stop_ids)),
+           round(start[0], TRIP_CACHE_PRECISION), round(start[1], TRIP_CACHE_PRECISION))
+    day_key = (str(emp_id), str(apt_date))
+    previous_order = trip_plans.get(day_key)
+
+    # Only the visiting order is cached, the rows themselves always come fresh from the query.
+    order = trip_cache.get(key)
+    if order is not None:
+        clients_by_id = dict(zip(stop_ids, clients))
+        ordered_clients, mode = [clients_by_id[client_id] for client_id in order], 'cached'
+    else:
+        ordered_clients = repair_trip(start, clients, previous_order) if previous_order else None
+        mode = 'incremental'
+        if ordered_clients is None:
+            ordered_clients, error = get_optimal_trip(start_lat, start_lon, clients)
+            if error:
+                return None, 'full', None, error
+            mode = 'full'
+
+        order = [str(client['apt_client']) for client in ordered_clients]
+        tags = [('emp', str(emp_id), str(apt_date))] + [('stop', str(apt_date), client_id) for client_id in stop_ids]
+        trip_cache.set(key, order, tags=tags)
+
+    trip_plans.set(day_key, order)
+    delta = trip_delta(previous_order, order) if previous_order else None
+    return ordered_clients, mode, delta, None
+
+def parse_departure(apt_date, depart):
+    # Departure defaults to now for today's trip and to the start of the working day otherwise.
+    day = datetime.datetime.strptime(str(apt_date), '%Y-%m-%d').date()
+    if depart:
+        return datetime.datetime.combine(day, datetime.datetime.strptime(depart, '%H:%M').time())
+    now = datetime.datetime.now()
+    if day == now.date():
+        return now.replace(second=0, microsecond=0)
+    return datetime.datetime.combine(day, datetime.datetime.strptime(DAY_START, '%H:%M').time())
+
+def parse_service_minutes(value):
+    """Minutes on site per stop, a finite number between 0 and a full day."""
+    minutes = float(value)
+    if not math.isfinite(minutes) or not 0 <= minutes <= 24 * 60:
+        raise ValueError(f"service_minutes out of range: {value}")
+    return minutes
+
+def trip_schedule(start, ordered_clients, departure, service_minutes=SERVICE_MINUTES):
+    """Attach leg distance/duration and ETA to every stop, returning (stops, summary)."""
+    scheduled = []
+    clock = departure
+    total_km = 0.0
+    total_drive = 0.0
+    prev_id, prev_point = None, start
+    for client in ordered_clients:
+        point = to_point(client['client_lat'], client['client_long'])
+        if point is None or prev_point is None:
+            scheduled.append(dict(client, leg_distance_km=None, leg_minutes=None, eta=None))
+            prev_id, prev_point = None, None
+            continue
+
+        client_id = client['apt_client']
+        if prev_id is not None and prev_id in travel_matrix and client_id in travel_matrix:
+            leg_km = travel_matrix.distance(prev_id, client_id)
+        else:
+            leg_km = haversine_km(prev_point, point)
+        leg_minutes = travel_matrix.duration_minutes(leg_km)
+
+        clock += datetime.timedelta(minutes=leg_minutes)
+        total_km += leg_km
+        total_drive += leg_minutes
+        scheduled.append(dict(client,
+                              leg_distance_km=round(leg_km, 2),
+                              leg_minutes=round(leg_minutes, 1),
+                              eta=clock.strftime('%Y-%m-%d %H:%M')))
+        clock += datetime.timedelta(minutes=service_minutes)
+        prev_id, prev_point = client_id, point
+
+    summary = {
+        "departure": departure.strftime('%Y-%m-%d %H:%M'),
+        "end": clock.strftime('%Y-%m-%d %H:%M'),
+        "total_distance_km": round(total_km, 2),
+        "total_drive_minutes": round(total_drive, 1),
+        "total_minutes": round((clock - departure).total_seconds() / 60, 1)
+    }
+    return scheduled, summary
+
+def get_cached_trip(emp_id, apt_date, start_lat, start_lon, clients):
+    ordered_clients, _, _, error = plan_employee_trip(emp_id, apt_date, start_lat, start_lon, clients)
+    return ordered_clients, error
+
+def invalidate_trips(apt_date, client_id=None, emp_id=None):
+    # Drop cached trips of the employee's day and every cached trip that contains the stop.
+    if emp_id is not None:
+        trip_cache.invalidate_tag(('emp', str(emp_id), str(apt_date)))
+    if client_id is not None:
+        trip_cache.invalidate_tag(('stop', str(apt_date), str(client_id)))
+    try:
+        trip_store.invalidate(apt_date, emp_id=emp_id, client_id=client_id)
+    except (OSError, ValueError, TypeError, KeyError) as err:
+        app.logger.error(f"Could not invalidate precomputed trips: {err}")
+
+def run_precompute_scheduler():
+    # Every day at PRECOMPUTE_AT, precompute tomorrow's trips.
+    at = datetime.datetime.strptime(PRECOMPUTE_AT, '%H:%M').time()
+    while True:
+        now = datetime.datetime.now()
+        next_run = datetime.datetime.combine(now.date(), at)
+        if next_run <= now:
+            next_run += datetime.timedelta(days=1)
+        threading.Event().wait((next_run - now).total_seconds())
+
+        apt_date = (datetime.date.today() + datetime.timedelta(days=1)).strftime('%Y-%m-%d')
+        try:
+            # Every worker runs this thread, the one holding the claim does the work.
+            if not trip_store.claim_precompute():
+                continue
+            count, error = precompute_day_trips(apt_date)
+            if error:
+                app.logger.error(f"Trip precomputation for {apt_date} failed: {error}")
+            else:
+                app.logger.info(f"Precomputed {count} trips for {apt_date}")
+        except Exception as e:
+            app.logger.error(f"Trip precomputation for {apt_date} failed: {e}")
+
+def get_open_appointment_index(apt_date):
+    """Spatial index of the open appointments of a day, synced incrementally with the database."""
+    apt_date = str(apt_date)
+    with open_appointment_indexes_lock:
+        entry = open_appointment_indexes.setdefault(apt_date, [GridIndex(), 0.0])
+    index, synced_at = entry
+    if time() - synced_at < NEARBY_INDEX_TTL:
+        return index, None
 
-    # Format coordinates for the OSRM API
-    coordinates_str = ';'.join([f'{lon},{lat}' for lon, lat in coordinates])
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Database connection failed"
 
-    # Define the OSRM trip endpoint with the coordinates
-    trip_url = f'{osrm_url}{coordinates_str}?source=first&roundtrip=false'
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute('''
+                SELECT 
+                    a.apt_client,
+                    a.apt_emp_executive,
+                    c.client_name,
+                    c.client_lat,
+                    c.client_long,
+                    c.client_city,
+                    c.client_street,
+                    c.client_street_number
+                FROM 
+                    Appointment a
+                JOIN 
+                    Client c ON a.apt_client = c.client_id
+                WHERE 
+                    a.apt_date = %s
+                    AND a.apt_status = 'open'
+                ''', (apt_date,))
+        rows = cursor.fetchall()
+    except mysql.connector.Error as err:
+        app.logger.error("Database query failed.")
+        app.logger.error(err)
+        return None, "Database query failed"
+    finally:
+        cursor.close()
+        conn.close()
 
-    # Send request to the OSRM API
-    response = requests.get(trip_url)
-    data = response.json()
+    # Apply only the differences, the index is never rebuilt.
+    seen = set()
+    for row in rows:
+        point = to_point(row['client_lat'], row['client_long'])
+        if point is None:
+            continue
+        key = str(row['apt_client'])
+        seen.add(key)
+        if index.get(key) != row:
+            index.add(key, point, row)
+    for key in index.keys():
+        if key not in seen:
+            index.remove(key)
+    entry[1] = time()
+    return index, None
+
+def update_open_appointment_index(apt_date, client_id=None, closed=False):
+    # Closing removes the stop right away, any other change forces a re-sync on the next read.
+    entry = open_appointment_indexes.get(str(apt_date))
+    if entry is None:
+        return
+    if closed and client_id is not None:
+        entry[0].remove(str(client_id))
+    else:
+        entry[1] = 0.0
 
-    # Extract the route information
-    if data['code'] == 'Ok':
-        # Extract the waypoints order from the waypoints array
-        waypoints_info = data['waypoints']
+def fetch_employee_open_tasks(emp_id, apt_date):
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Database connection failed"
 
-        # The order is determined by the 'trips' array in the legs
-        waypoint_order = [waypoint['waypoint_index'] for waypoint in waypoints_info]
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute('''
+                SELECT 
+                    a.apt_client,
+                    c.client_name,
+                    c.client_lat,
+                    c.client_long,
+                    c.client_city,
+                    c.client_street,
+                    c.client_street_number,
+                    cr.rep_phone
+                FROM 
+                    Appointment a
+                LEFT JOIN 
+                    Client c ON a.apt_client = c.client_id
+                LEFT JOIN 
+                    ClientRepresentative cr ON c.client_rep = cr.rep_id
+                WHERE 
+                    a.apt_emp_executive = %s
+                    AND a.apt_date = %s
+                    AND a.apt_status = 'open'
+                ''', (emp_id, apt_date))
+        result = cursor.fetchall()
+    except mysql.connector.Error as err:
+        app.logger.error("Database query failed.")
+        app.logger.error(err)
+        return None, "Database query failed"
+    finally:
+        cursor.close()
+        conn.close()
 
-        # Create an ordered list of clients based on the waypoints order
-        ordered_clients = [clients[i - 1] for i in waypoint_order[1:]]  # Skip the first element as it is the start point
+    return result, None
 
-        return ordered_clients, None
-    else:
-        return None, data['message']
+def report_write_tables(conn, table, date):
+    # The hot table, plus the archive table when the visit may already have been moved there.
+    # A row is in exactly one of them, so writing to both changes it wherever it is.
+    if REPORT_ARCHIVE and report_archive_cutoffs.is_archived(conn, table, parse_apt_date(date)):
+        return [table, ARCHIVE_TABLES[table][0]]
+    return [table]
+
+def archive_added_report(conn, cur, table, key_columns, key):
+    # Reads only look in the archive when the hot table has nothing for the date, so a row
+    # added to a visit that was already archived is moved there too. It is inserted into the
+    # hot table first so its id comes from the hot table's counter, as for archive_before.
+    id_column, date_column, client_column = key_columns
+    _, report_date, client_id = key
+    if not (REPORT_ARCHIVE and report_archive_cutoffs.is_archived(conn, table, parse_apt_date(report_date))):
+        return
+    archive_table = ARCHIVE_TABLES[table][0]
+    cur.execute(
+        f"SELECT 1 FROM {archive_table} WHERE {date_column} = %s AND {client_column} = %s LIMIT 1",
+        (report_date, client_id)
+    )
+    if not cur.fetchall():
+        return
+    where = f"{id_column} = %s AND {date_column} = %s AND {client_column} = %s"
+    cur.execute(f"INSERT INTO {archive_table} SELECT * FROM {table} WHERE {where}", key)
+    cur.execute(f"DELETE FROM {table} WHERE {where}", key)
 
 def fetch_client_equipment_reports_in_date(date, client_id):
     conn = get_db_connection()
     if conn is None:
         return None, "Could not connect to the database"
 
-    cur = conn.cursor(dictionary=True)
-    cur.execute("""
-                SELECT 
-                    ReportedEquipment.*,
-                    Equipment.eqp_name,
-                    Equipment.eqp_type,
-                    Equipment.eqp_manufacturer
-                FROM 
-                    ReportedEquipment
-                LEFT JOIN 
-                    Equipment 
-                ON 
-                    ReportedEquipment.reqp_details = Equipment.eqp_cat_number
-                WHERE 
-                    ReportedEquipment.reqp_date = %s 
-                    AND ReportedEquipment.reqp_client = %s
-                """, (date, client_id))
-    result = cur.fetchall()
-    cur.close()
+    result = queries.fetch_all(conn, 'equipment_reports_in_date', (date, client_id))
+    if not result and REPORT_ARCHIVE and report_archive_cutoffs.is_archived(conn, 'ReportedEquipment', parse_apt_date(date)):
+        result = queries.fetch_all(conn, 'equipment_reports_in_date_archive', (date, client_id))
+    compacted = False
+    if not result and REPORT_HISTORY:
+        result = report_history.reconstruct(conn, client_id, 'equipment', date) or []
+        compacted = bool(result)
     conn.close()
 
+    if compacted:
+        # The change log has no join to Equipment, the names come from the cached catalog.
+        # Inside a request conn.close() above leaves the connection open until the request
+        # ends, so a catalog reload runs on this same connection.
+        try:
+            catalog = {eqp['eqp_cat_number']: eqp for eqp in catalog_cache.get('equipment')['rows']}
+        except mysql.connector.Error as err:
+            app.logger.error("Equipment catalog unavailable.")
+            app.logger.error(err)
+            catalog = {}
+        for row in result:
+            eqp = catalog.get(row['reqp_details'], {})
+            row.update({field: eqp.get(field) for field in ('eqp_name', 'eqp_type', 'eqp_manufacturer')})
+
     return result, None
 
 def fetch_client_cabinet_reports_in_date(date, client_id):
@@ -223,13 +597,11 @@ def fetch_client_cabinet_reports_in_date(date, client_id):
     if conn is None:
         return None, "Could not connect to the database"
 
-    cur = conn.cursor(dictionary=True)
-    cur.execute("""
-                SELECT * FROM ReportedCabinet 
-                WHERE rcab_date = %s AND rcab_client = %s
-                """, (date, client_id))
-    result = cur.fetchall()
-    cur.close()
+    result = queries.fetch_all(conn, 'cabinet_reports_in_date', (date, client_id))
+    if not result and REPORT_ARCHIVE and report_archive_cutoffs.is_archived(conn, 'ReportedCabinet', parse_apt_date(date)):
+        result = queries.fetch_all(conn, 'cabinet_reports_in_date_archive', (date, client_id))
+    if not result and REPORT_HISTORY:
+        result = report_history.reconstruct(conn, client_id, 'cabinet', date) or []
     conn.close()
 
     return result, None
@@ -239,27 +611,10 @@ def fetch_last_client_equipment_reports(client_id):
     if conn is None:
         return None, "Could not connect to the database"
 
-    cur = conn.cursor(dictionary=True)
-    cur.execute("""
-        SELECT MAX(reqp_date) as latest_date 
-        FROM ReportedEquipment 
-        WHERE reqp_client = %s AND reqp_in_use = 1
-    """, (client_id,))
-    latest_date_result = cur.fetchone()
-
-    if latest_date_result is None:
-        cur.close()
-        conn.close()
-        return None, None
-    
-    latest_date = latest_date_result['latest_date']
-    cur.execute("""
-        SELECT * FROM ReportedEquipment 
-        WHERE reqp_date = %s AND reqp_client = %s AND reqp_in_use = 1
-    """, (latest_date, client_id))
-    result = cur.fetchall()
-    
-    cur.close()
+    result = queries.fetch_all(conn, 'latest_equipment_reports', (client_id, client_id))
+    if not result and REPORT_ARCHIVE:
+        # No visit since the cutoff, the latest one was archived.
+        result = queries.fetch_all(conn, 'latest_equipment_reports_archive', (client_id, client_id))
     conn.close()
 
     return result, None
@@ -269,27 +624,9 @@ def fetch_last_client_cabinet_reports(client_id):
     if conn is None:
         return None, "Could not connect to the database"
 
-    cur = conn.cursor(dictionary=True)
-    cur.execute("""
-        SELECT MAX(rcab_date) as latest_date 
-        FROM ReportedCabinet 
-        WHERE rcab_client = %s
-    """, (client_id,))
-    latest_date_result = cur.fetchone()
-
-    if latest_date_result is None:
-        cur.close()
-        conn.close()
-        return None, None
-    
-    latest_date = latest_date_result['latest_date']
-    cur.execute("""
-        SELECT * FROM ReportedCabinet 
-        WHERE rcab_date = %s AND rcab_client = %s
-    """, (latest_date, client_id))
-    result = cur.fetchall()
-    
-    cur.close()
+    result = queries.fetch_all(conn, 'latest_cabinet_reports', (client_id, client_id))
+    if not result and REPORT_ARCHIVE:
+        result = queries.fetch_all(conn, 'latest_cabinet_reports_archive', (client_id, client_id))
     conn.close()
 
     return result, None
@@ -311,43 +648,50 @@ def request_client_auth():
       return jsonify({"error": "Maximum OTP attempts exceeded. Please try again later."}), 403
 
     try:
-        client_data = fetch_client_data(client_id)
-        if not client_data:
-            return jsonify({"error": "Client not found"}), 404
-        
-        rep_data, error = fetch_client_representative(client_data['client_rep']) 
+        contact, error = fetch_client_contact(client_id)
         if error:
             return jsonify({"error": error}), 500
+        if not contact:
+            return jsonify({"error": "Client not found"}), 404
         
-        rep_phone = rep_data['rep_phone']
+        rep_phone = contact['rep_phone']
 
-        if client_id in otp_storage:
-            otp_resend_attempts[client_id] += 1
+        # Every entry expires on its own: the OTP with its validity period, the counters with the block time.
+        resend_attempts = otp_resend_attempts.incr(client_id, ttl=BLOCK_TIME)
 
-            if current_time < otp_expiry.get(client_id, 0):
-                otp = otp_storage[client_id]
-            else:
-                otp = generate_otp()
-                otp_storage[client_id] = otp
-                otp_expiry[client_id] = current_time + OTP_VALIDITY_PERIOD
-                otp_attempts[client_id] = 0
-        else:
+        otp = otp_storage.get(client_id)
+        if otp is None or current_time >= otp_expiry.get(client_id, 0):
             otp = generate_otp()
-            otp_storage[client_id] = otp
-            otp_resend_attempts[client_id] = 1
-            otp_attempts[client_id] = 0
-            otp_expiry[client_id] = current_time + OTP_VALIDITY_PERIOD
+            otp_storage.set(client_id, otp, ttl=OTP_VALIDITY_PERIOD)
+            otp_expiry.set(client_id, current_time + OTP_VALIDITY_PERIOD, ttl=OTP_VALIDITY_PERIOD)
+            otp_attempts.set(client_id, 0, ttl=OTP_VALIDITY_PERIOD)
 
         # Check if attempts exceed the maximum allowed
-        if otp_resend_attempts[client_id] > MAX_OTP_ATTEMPTS:
-            otp_resend_blocked[client_id] = current_time + BLOCK_TIME
+        if resend_attempts > MAX_OTP_ATTEMPTS:
+            otp_resend_blocked.set(client_id, current_time + BLOCK_TIME, ttl=BLOCK_TIME)
             return jsonify({"error": "Maximum OTP attempts exceeded. Please try again later."}), 403
 
-        response = send_otp(rep_phone, otp)
+        message_id = send_otp(rep_phone, otp)
+        if message_id is None:
+            return jsonify({"error": "SMS service is busy. Please try again later."}), 503
         
-        return jsonify({"message": "OTP sent successfully " + response}), 200
+        return jsonify({"message": "OTP sent successfully", "message_id": message_id}), 200
     except Exception as e:
-        return jsonify({"error": "Internal server error: " + e}), 500
+        return jsonify({"error": "Internal server error: " + str(e)}), 500
+
+@app.route('/smsStatus', methods=['GET'])
+@limiter.limit("30 per minute")
+def get_sms_status():
+    message_id = request.args.get('message_id', '')
+
+    if not re.match(r'^[0-9a-f]{32}$', message_id):
+        return jsonify({"error": "Invalid message ID format"}), 400
+
+    status = sms_dispatcher.status(message_id)
+    if status is None:
+        return jsonify({"error": "Unknown message ID"}), 404
+
+    return jsonify({"status": status['status'], "attempts": status['attempts'], "updated_at": status['updated_at']}), 200
 
 @app.route('/clientAuth', methods=['POST'])
 @limiter.limit("5 per minute")
@@ -372,7 +716,7 @@ def client_auth():
         otp_expiry.pop(client_id, None)
         return jsonify({"error": "OTP expired. Please request a new OTP."}), 400
 
-    if otp_storage[client_id] == otp:
+    if otp_storage.get(client_id) == otp:
 
         otp_storage.pop(client_id, None)
         otp_attempts.pop(client_id, None)
@@ -380,26 +724,29 @@ def client_auth():
         otp_expiry.pop(client_id, None)
         otp_blocked.pop(client_id, None)
         otp_resend_blocked.pop(client_id, None)
-        client_data = fetch_client_data(client_id)
+        # Warmed by /requestClientAuth, so minting the token normally needs no query.
+        contact, error = fetch_client_contact(client_id)
+        if error or not contact:
+            return jsonify({"error": "Client not found"}), 404
 
         token = jwt.encode({
             'client_id': client_id,
-            'rep_id': client_data['client_rep'],
+            'rep_id': contact['client_rep'],
             'role': 'client',
             'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
         }, JWT_SECRET_KEY, algorithm='HS256')
         
         return jsonify({"token": token}), 200
     else:
-        otp_attempts[client_id] += 1
-        if otp_attempts[client_id] >= MAX_OTP_ATTEMPTS:
-            otp_blocked[client_id] = time() + BLOCK_TIME
+        attempts = otp_attempts.incr(client_id, ttl=OTP_VALIDITY_PERIOD)
+        if attempts >= MAX_OTP_ATTEMPTS:
+            otp_blocked.set(client_id, time() + BLOCK_TIME, ttl=BLOCK_TIME)
             otp_storage.pop(client_id, None)
             otp_attempts.pop(client_id, None)
             otp_expiry.pop(client_id, None)
             return jsonify({"error": "Maximum OTP attempts exceeded. Please try again later."}), 403
         
-        return jsonify({"error": f"Invalid OTP. {MAX_OTP_ATTEMPTS - otp_attempts[client_id]} attempts left"}), 401
+        return jsonify({"error": f"Invalid OTP. {MAX_OTP_ATTEMPTS - attempts} attempts left"}), 401
 
 @app.route('/employeeAuth', methods=['POST'])
 @limiter.limit("5 per minute")
@@ -445,16 +792,13 @@ def employee_auth():
         
             return jsonify({"token": token}), 200
         else:
-            if username not in employee_login_attempts:
-                employee_login_attempts[username] = 1
-            else:
-                employee_login_attempts[username] += 1
+            login_attempts = employee_login_attempts.incr(username, ttl=BLOCK_TIME)
 
-            if employee_login_attempts[username] >= MAX_LOGIN_ATTEMPTS:
-                employee_login_blocked[username] = time() + BLOCK_TIME
+            if login_attempts >= MAX_LOGIN_ATTEMPTS:
+                employee_login_blocked.set(username, time() + BLOCK_TIME, ttl=BLOCK_TIME)
                 return jsonify({"error":"Maximum login attempts exceeded. Please try again later."}), 403
                 
-            return jsonify({"error":f"username or password are incorrect {MAX_LOGIN_ATTEMPTS - employee_login_attempts[username]} attempts left"}), 401
+            return jsonify({"error":f"username or password are incorrect {MAX_LOGIN_ATTEMPTS - login_attempts} attempts left"}), 401
 
 @app.route('/userRole', methods=['GET'])
 def get_user_role():
@@ -500,18 +844,19 @@ def get_rep_name():
         return response
 
     rep_id = decoded_token.get('rep_id')
-    
-    conn = get_db_connection()
-    if conn is None:
-        response = make_response(jsonify({'Error':'Could not connect to the database.'}), 500)
+    # A token without a (numeric) representative id answers null, like an unknown representative.
+    if rep_id is None or not re.match(r'^\d+$', str(rep_id)):
+        response = make_response(jsonify(None))
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response
 
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT rep_firstname, rep_lastname FROM ClientRepresentative WHERE rep_id = %s", (rep_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    rep_data, error = fetch_client_representative(rep_id)
+    if error:
+        response = make_response(jsonify({'Error': error}), 500)
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
+
+    result = {'rep_firstname': rep_data['rep_firstname'], 'rep_lastname': rep_data['rep_lastname']} if rep_data else None
 
     response = make_response(jsonify(result))
     response.headers.add('Access-Control-Allow-Origin', '*')
@@ -531,10 +876,7 @@ def get_last_appointment():
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
 
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT * FROM Appointment WHERE apt_client = %s AND apt_date < CURDATE() AND apt_status = 'closed' ORDER BY apt_date DESC LIMIT 1", (client_id,))
-    appointment = cur.fetchone()
-    cur.close()
+    appointment = queries.fetch_one(conn, 'last_closed_appointment', (client_id,))
     conn.close()
 
     if appointment:
@@ -587,6 +929,8 @@ def get_appointments_in_month_and_year():
         year = int(year)
         if month < 1 or month > 12:
             raise ValueError
+        # Raises ValueError for years whose month does not fit the calendar (e.g. December 9999).
+        month_range(year, month)
     except ValueError:
         return jsonify({"error": "Month must be an integer between 1 and 12 and year must be a valid integer"}), 400
 
@@ -618,23 +962,173 @@ def get_appointments_count_by_month_and_year():
         year = int(year)
         if month < 1 or month > 12:
             raise ValueError
+        # Raises ValueError for years whose month does not fit the calendar (e.g. December 9999).
+        month_range(year, month)
     except ValueError:
         return jsonify({"error": "Month must be an integer between 1 and 12 and year must be a valid integer"}), 400
 
-    appointments, error = fetch_appointments_by_month_and_year(month, year)
+    appointments_count_by_date, error = fetch_month_appointment_counts(month, year)
 
     if error:
         return jsonify({"error": error}), 500
 
-    appointments_count_by_date = {}
-    for appointment in appointments:
-        date = appointment['apt_date'].strftime('%Y-%m-%d')
-        if date in appointments_count_by_date:
-            appointments_count_by_date[date] += 1
+    return jsonify(appointments_count_by_date)
+
+# GET /appointmentCalendar
+@app.route('/appointmentCalendar', methods=['GET'])
+def get_appointment_calendar():
+    """Appointments per day for a month, a quarter, a year or an explicit start/end date range."""
+    token = request.args.get('token')
+    year = request.args.get('year')
+    month = request.args.get('month')
+    quarter = request.args.get('quarter')
+    start = request.args.get('start')
+    end = request.args.get('end')
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    try:
+        if start and end:
+            # Both dates are included.
+            start = datetime.datetime.strptime(start, '%Y-%m-%d').date()
+            end = datetime.datetime.strptime(end, '%Y-%m-%d').date() + datetime.timedelta(days=1)
+            month = None
+        elif year and month:
+            month = int(month)
+            if month < 1 or month > 12:
+                raise ValueError
+            start, end = month_range(int(year), month)
+        elif year and quarter:
+            month = None
+            quarter = int(quarter)
+            if quarter < 1 or quarter > 4:
+                raise ValueError
+            start, end = month_range(int(year), 3 * quarter - 2, 3)
+        elif year:
+            start, end = month_range(int(year), 1, 12)
         else:
-            appointments_count_by_date[date] = 1
+            raise ValueError
+    except (ValueError, OverflowError):
+        return jsonify({"error": "Provide start and end dates (YYYY-MM-DD), or a year with an optional month (1-12) or quarter (1-4)"}), 400
 
-    return jsonify(appointments_count_by_date)
+    if not start < end or (end - start).days > CALENDAR_MAX_DAYS:
+        return jsonify({"error": f"The date range must cover 1 to {CALENDAR_MAX_DAYS} days"}), 400
+
+    if month:
+        counts, error = fetch_month_appointment_counts(month, start.year)
+    else:
+        counts, error = fetch_appointment_counts(start, end)
+    if error:
+        return jsonify({"error": error}), 500
+
+    return jsonify({
+        "start": start.strftime('%Y-%m-%d'),
+        "end": (end - datetime.timedelta(days=1)).strftime('%Y-%m-%d'),
+        "total": sum(counts.values()),
+        "counts": counts
+    }), 200
+
+# GET /planMonth
+@app.route('/planMonth', methods=['GET'])
+def plan_month_appointments():
+    """Propose a date for every movable appointment in a month, grouping nearby clients on the same day."""
+    token = request.args.get('token')
+    month = request.args.get('month')
+    year = request.args.get('year')
+    max_per_day = request.args.get('max_per_day')
+    weekdays = request.args.get('weekdays', WORK_WEEKDAYS)
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    if decoded_token.get('role') != 'Manager':
+        return jsonify("Forbidden!"), 403
+
+    if not month or not year:
+        return jsonify({"error": "Month and year are required query parameters."}), 400
+
+    try:
+        month = int(month)
+        year = int(year)
+        if month < 1 or month > 12:
+            raise ValueError
+        # Raises ValueError for years whose month does not fit the calendar (e.g. December 9999).
+        month_range(year, month)
+    except ValueError:
+        return jsonify({"error": "Month must be an integer between 1 and 12 and year must be a valid integer"}), 400
+
+    try:
+        max_per_day = int(max_per_day) if max_per_day else None
+        weekdays = set(int(day) for day in weekdays.split(','))
+        if (max_per_day is not None and max_per_day < 1) or not weekdays <= set(range(7)):
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "max_per_day must be a positive integer and weekdays a comma separated list of 0-6"}), 400
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({"error": "Database connection failed"}), 500
+
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("""
+            SELECT a.apt_date, 
+                   a.apt_client, 
+                   a.apt_emp_executive, 
+                   a.apt_status, 
+                   c.client_name, 
+                   c.client_lat, 
+                   c.client_long 
+            FROM Appointment a 
+            LEFT JOIN Client c ON a.apt_client = c.client_id 
+            WHERE a.apt_date >= %s AND a.apt_date < %s
+        """, month_range(year, month))
+        appointments = cur.fetchall()
+    except mysql.connector.Error as err:
+        app.logger.error("Database query failed.")
+        app.logger.error(err)
+        return jsonify({'error': 'Database query failed'}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+    # Only future days are planned; closed or already assigned appointments keep their date.
+    today = datetime.date.today()
+    days = [day for day in working_days(year, month, weekdays) if day >= today]
+    movable, fixed, unplanned = [], [], []
+    for index, apt in enumerate(appointments):
+        point = to_point(apt['client_lat'], apt['client_long'])
+        if apt['apt_date'] < today:
+            continue
+        if point is None:
+            unplanned.append(apt)
+        elif apt['apt_status'] != 'open' or apt['apt_emp_executive'] is not None:
+            fixed.append((apt['apt_date'], point))
+        else:
+            movable.append((index, point))
+
+    try:
+        proposed = plan_month(days, movable, fixed, max_per_day)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+
+    plan = {day.strftime('%Y-%m-%d'): [] for day in days}
+    moves = []
+    for index, day in proposed.items():
+        apt = appointments[index]
+        plan[day.strftime('%Y-%m-%d')].append(apt)
+        if day != apt['apt_date']:
+            # Ready to be sent to /changeClientAppointment.
+            moves.append({
+                "apt_client": apt['apt_client'],
+                "apt_date": apt['apt_date'].strftime('%Y-%m-%d'),
+                "new_apt_date": day.strftime('%Y-%m-%d')
+            })
+
+    return jsonify({"days": plan, "moves": moves, "unplanned": unplanned}), 200
 
 # PUT /changeAppointment
 @app.route('/changeAppointment', methods=['PUT'])
@@ -654,6 +1148,7 @@ def change_appointment():
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
 
+    calendar_write = calendar_cache.begin(parse_apt_date(apt_date), parse_apt_date(new_apt_date))
     cur = conn.cursor()
     try:
         cur.execute(
@@ -669,8 +1164,17 @@ def change_appointment():
         conn.close()
         return jsonify({"error": "Database error occurred"}), 500
 
+    moved = cur.rowcount
     cur.close()
     conn.close()
+    if moved > 0:
+        if parse_apt_date(apt_date) and parse_apt_date(new_apt_date):
+            calendar_cache.move(calendar_write, parse_apt_date(apt_date), apt_client, parse_apt_date(new_apt_date), moved)
+        invalidate_trips(apt_date, client_id=apt_client)
+        # The moved appointment keeps its executive, so that employee's new day is unknown here.
+        invalidate_trips(new_apt_date)
+        update_open_appointment_index(apt_date)
+        update_open_appointment_index(new_apt_date)
     return jsonify({'message': 'Appointment updated successfully'}), 200
 
 
@@ -697,6 +1201,7 @@ def change_client_appointment():
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
 
+    calendar_write = calendar_cache.begin(parse_apt_date(apt_date), parse_apt_date(new_apt_date))
     cur = conn.cursor(dictionary=True)
 
     try:
@@ -714,8 +1219,17 @@ def change_client_appointment():
         conn.close()
         return jsonify({"error": "Database error occurred"}), 500
 
+    moved = cur.rowcount
     cur.close()
     conn.close()
+    if moved > 0:
+        if parse_apt_date(apt_date) and parse_apt_date(new_apt_date):
+            calendar_cache.move(calendar_write, parse_apt_date(apt_date), apt_client, parse_apt_date(new_apt_date), moved)
+        invalidate_trips(apt_date, client_id=apt_client)
+        # The moved appointment keeps its executive, so that employee's new day is unknown here.
+        invalidate_trips(new_apt_date)
+        update_open_appointment_index(apt_date)
+        update_open_appointment_index(new_apt_date)
     return jsonify({'message': 'Appointment updated successfully'}), 200
 # POST /makeAppointment
 @app.route('/makeAppointment', methods=['POST'])
@@ -735,6 +1249,7 @@ def make_appointment():
     if conn is None:
         return jsonify({"error": "Database connection failed"}), 500
 
+    calendar_write = calendar_cache.begin(parse_apt_date(apt_date))
     cur = conn.cursor()
     try:
         cur.execute(
@@ -752,6 +1267,9 @@ def make_appointment():
 
     cur.close()
     conn.close()
+    if parse_apt_date(apt_date):
+        calendar_cache.add(calendar_write, {'apt_date': parse_apt_date(apt_date), 'apt_client': apt_client, 'apt_emp_executive': None, 'apt_status': 'open'})
+    update_open_appointment_index(apt_date)
     return jsonify({'message': 'Appointment added successfully'}), 200
 
 # GET /appointmentsInDate
@@ -875,6 +1393,53 @@ def get_all_employees():
     else:
         return jsonify({"error": "No employees found"}), 404
 
+def assign_executives(conn, appointments):
+    """Set apt_emp_executive of many appointments with one locking SELECT and one UPDATE per batch.
+
+    Returns (per-item results, first item without a matching appointment
+    or None). Nothing is committed, the caller commits or rolls back.
+    """
+    # A later item for the same appointment overrides an earlier one, like the row-by-row updates did.
+    items = {}
+    for appointment in appointments:
+        items[(str(parse_apt_date(appointment['apt_date']) or appointment['apt_date']), str(appointment['apt_client']))] = appointment
+
+    found = set()
+    keys = list(items)
+    cur = conn.cursor()
+    try:
+        for start in range(0, len(keys), ASSIGN_BATCH_SIZE):
+            batch = keys[start:start + ASSIGN_BATCH_SIZE]
+            pairs = ', '.join(['(%s, %s)'] * len(batch))
+            pair_params = [value for key in batch for value in (items[key]['apt_date'], items[key]['apt_client'])]
+
+            cur.execute(f"SELECT apt_date, apt_client FROM Appointment WHERE (apt_date, apt_client) IN ({pairs}) FOR UPDATE", pair_params)
+            found.update((str(apt_date), str(apt_client)) for apt_date, apt_client in cur.fetchall())
+
+            cases = ' '.join(['WHEN apt_date = %s AND apt_client = %s THEN %s'] * len(batch))
+            case_params = [value for key in batch for value in (items[key]['apt_date'], items[key]['apt_client'], items[key].get('apt_emp_executive'))]
+            cur.execute(f"""
+                UPDATE Appointment 
+                SET apt_emp_executive = CASE {cases} ELSE apt_emp_executive END 
+                WHERE (apt_date, apt_client) IN ({pairs})
+            """, case_params + pair_params)
+    finally:
+        cur.close()
+
+    results = []
+    missing = None
+    for key, appointment in items.items():
+        assigned = key in found
+        results.append({
+            "apt_date": appointment['apt_date'],
+            "apt_client": appointment['apt_client'],
+            "apt_emp_executive": appointment.get('apt_emp_executive'),
+            "status": "assigned" if assigned else "not_found"
+        })
+        if not assigned and missing is None:
+            missing = appointment
+    return results, missing
+
 # PUT /assignExecutiveEmployee
 @app.route('/assignExecutiveEmployee', methods=['PUT'])
 def assign_executive_employee():
@@ -903,38 +1468,34 @@ def assign_executive_employee():
             response.headers.add('Access-Control-Allow-Origin', '*')
             return response
 
-        cur = conn.cursor()
         for appointment in appointments:
-            apt_date = appointment.get('apt_date')  # Get the date from the JSON object
-            apt_client = appointment.get('apt_client')  # Get the client_id from the JSON object
-            apt_emp_executive = appointment.get('apt_emp_executive')  # Get the executive ID from the JSON object
-
-            if not apt_date or not apt_client:
-                conn.rollback()
-                cur.close()
+            if not isinstance(appointment, dict) or not appointment.get('apt_date') or not appointment.get('apt_client'):
                 conn.close()
                 response = make_response(jsonify({"error": "Missing required parameters in one of the objects"}), 400)
                 response.headers.add('Access-Control-Allow-Origin', '*')
                 return response
 
-            cur.execute("""
-                UPDATE Appointment 
-                SET apt_emp_executive = %s 
-                WHERE apt_date = %s AND apt_client = %s
-            """, (apt_emp_executive, apt_date, apt_client))
-            
-            if cur.rowcount == 0:
-                conn.rollback()
-                cur.close()
-                conn.close()
-                response = make_response(jsonify({"error": f"No matching appointment found for date: {apt_date}, client_id: {apt_client}"}), 404)
-                response.headers.add('Access-Control-Allow-Origin', '*')
-                return response
+        calendar_write = calendar_cache.begin(*(parse_apt_date(appointment.get('apt_date')) for appointment in appointments))
+        results, missing = assign_executives(conn, appointments)
+        if missing:
+            conn.rollback()
+            conn.close()
+            response = make_response(jsonify({
+                "error": f"No matching appointment found for date: {missing['apt_date']}, client_id: {missing['apt_client']}",
+                "results": results
+            }), 404)
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            return response
 
         conn.commit()
-        cur.close()
         conn.close()
-        response = make_response(jsonify({"message": "Executive employees assigned successfully"}), 200)
+        for appointment in appointments:
+            if parse_apt_date(appointment.get('apt_date')):
+                calendar_cache.update(calendar_write, parse_apt_date(appointment.get('apt_date')), appointment.get('apt_client'), apt_emp_executive=appointment.get('apt_emp_executive'))
+            invalidate_trips(appointment.get('apt_date'), client_id=appointment.get('apt_client'), emp_id=appointment.get('apt_emp_executive'))
+        for apt_date in set(appointment.get('apt_date') for appointment in appointments):
+            update_open_appointment_index(apt_date)
+        response = make_response(jsonify({"message": "Executive employees assigned successfully", "results": results}), 200)
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response
     
@@ -944,6 +1505,125 @@ def assign_executive_employee():
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response
     
+# POST /planAssignments
+@app.route('/planAssignments', methods=['POST'])
+def plan_assignments():
+    """Propose a technician and stop order for every unassigned appointment in a date."""
+    data = request.get_json()
+    token = data.get('token')
+    date = data.get('date')
+    emp_ids = data.get('emp_ids')
+    max_stops = data.get('max_stops')
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    if decoded_token.get('role') != 'Manager':
+        return jsonify("Forbidden!"), 403
+
+    if not date:
+        return jsonify({"error": "Date parameter is required"}), 400
+
+    if emp_ids is not None and not isinstance(emp_ids, list):
+        return jsonify({"error": "emp_ids must be a list of employee IDs"}), 400
+
+    try:
+        max_stops = int(max_stops) if max_stops is not None else None
+        if max_stops is not None and max_stops < 1:
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({"error": "max_stops must be a positive integer"}), 400
+
+    conn = get_db_connection()
+    if conn is None:
+        return jsonify({"error": "Database connection failed"}), 500
+
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("""
+            SELECT a.apt_date, 
+                   a.apt_client, 
+                   c.client_name, 
+                   c.client_lat, 
+                   c.client_long, 
+                   c.client_city, 
+                   c.client_street, 
+                   c.client_street_number 
+            FROM Appointment a 
+            LEFT JOIN Client c ON a.apt_client = c.client_id 
+            WHERE a.apt_date = %s AND a.apt_status = 'open' AND a.apt_emp_executive is NULL
+        """, (date,))
+        appointments = cur.fetchall()
+
+        cur.execute("""
+            SELECT emp_ID, emp_firstname, emp_lastname 
+            FROM Employee
+        """)
+        employees = cur.fetchall()
+    except mysql.connector.Error as err:
+        app.logger.error("Database query failed.")
+        app.logger.error(err)
+        return jsonify({'error': 'Database query failed'}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+    if emp_ids is not None:
+        wanted = set(str(emp_id) for emp_id in emp_ids)
+        employees = [employee for employee in employees if str(employee['emp_ID']) in wanted]
+
+    if not employees:
+        return jsonify({"error": "No employees available for assignment"}), 400
+
+    # Appointments without coordinates cannot be routed and are left for manual assignment.
+    stops = [to_point(apt['client_lat'], apt['client_long']) for apt in appointments]
+    routable = [apt for apt, point in zip(appointments, stops) if point is not None]
+    unrouted = [apt for apt, point in zip(appointments, stops) if point is None]
+    points = [point for point in stops if point is not None]
+
+    depot = to_point(DEPOT_LAT, DEPOT_LONG)
+    if depot is None and points:
+        depot = (sum(lat for lat, _ in points) / len(points), sum(lon for _, lon in points) / len(points))
+
+    try:
+        matrix = trip_matrix(depot, points, get_travel_submatrix(routable)) if points else [[0.0]]
+        routes = plan_routes(matrix, len(employees), max_stops)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+
+    plan = []
+    assignments = []
+    total_minutes = 0.0
+    for employee, route in zip(employees, routes):
+        distance_km = open_route_length(matrix, route) if route else 0.0
+        drive_minutes = travel_matrix.duration_minutes(distance_km)
+        total_minutes += drive_minutes
+        stops_in_order = [routable[node - 1] for node in route]
+        plan.append({
+            "emp_ID": employee['emp_ID'],
+            "emp_firstname": employee['emp_firstname'],
+            "emp_lastname": employee['emp_lastname'],
+            "stops": stops_in_order,
+            "distance_km": round(distance_km, 2),
+            "drive_minutes": round(drive_minutes, 1)
+        })
+        for apt in stops_in_order:
+            # Ready to be posted back to /assignExecutiveEmployee as is.
+            assignments.append({
+                "apt_date": date,
+                "apt_client": apt['apt_client'],
+                "apt_emp_executive": employee['emp_ID']
+            })
+
+    return jsonify({
+        "date": date,
+        "routes": plan,
+        "assignments": assignments,
+        "unrouted": unrouted,
+        "total_drive_minutes": round(total_minutes, 1)
+    }), 200
+
 # GET /clientData
 @app.route('/clientData', methods=['GET'])
 def get_client_data():
@@ -1053,7 +1733,44 @@ def get_last_cabinet_reports():
     return jsonify(results), 200
 
 
+def copy_last_reports(date, client_id, equipment=True, cabinets=True):
+    """Copy the client's last visit to date in one transaction, one INSERT ... SELECT per table.
+
+    Returns ({'equipment': created, 'cabinets': created}, error). Tables
+    that already have reports in date are left alone.
+
+    The new visit is a full copy of the inventory, not a delta. With
+    REPORT_HISTORY on, older visits only become change log entries once
+    compact_reports.py has run.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Database connection failed"
+
+    created = {}
+    try:
+        for key, kind, enabled in (('equipment', 'equipment', equipment), ('cabinets', 'cabinet', cabinets)):
+            if not enabled:
+                continue
+            params = (date, client_id, client_id, date, client_id)
+            count = queries.execute(conn, f'copy_latest_{kind}_reports', params)
+            if not count and REPORT_ARCHIVE and not queries.fetch_all(conn, f'latest_{kind}_reports', (client_id, client_id)):
+                # A client not visited since the archive cutoff starts from its archived last visit.
+                count = queries.execute(conn, f'copy_latest_{kind}_reports_archive', params)
+            created[key] = count
+        conn.commit()
+    except mysql.connector.Error as err:
+        conn.rollback()
+        app.logger.error("Error: Could not execute INSERT statement.")
+        app.logger.error(err)
+        return None, "Database error occurred"
+    finally:
+        conn.close()
+
+    return created, None
+
 # POST /makeEquipmentReportsInDate
+# Writes full rows for the new visit, see copy_last_reports.
 @app.route('/makeEquipmentReportsInDate', methods=['POST'])
 def make_equipment_reports_in_date():
     data = request.get_json()
@@ -1065,50 +1782,23 @@ def make_equipment_reports_in_date():
     if error_response:
         return jsonify(error_response), status_code
 
-    reports_in_date, error = fetch_client_equipment_reports_in_date(date, client_id)
+    created, error = copy_last_reports(date, client_id, cabinets=False)
+    if error:
+        return jsonify({"error": error}), 500
 
+    reports_in_date, error = fetch_client_equipment_reports_in_date(date, client_id)
     if error:
         return jsonify({"error-fetch-in-date": error}), 500
-    
-    if reports_in_date:
-        return jsonify({"message" : "This client already has equipment reports in this date."}), 200
-    else:
-        latest_reports, error = fetch_last_client_equipment_reports(client_id)
-
-        if error:
-            return jsonify({"error": error}), 500
-        
-        if not latest_reports:
-            return jsonify({"message" : "This client has no equipment reports. It might be a new client."}), 200
-        else:
-            conn = get_db_connection()
-
-            if conn is None:
-                return jsonify({"error": "Database connection failed"}), 500
-            
-            cur = conn.cursor()
-
-            try:
-                for report in latest_reports:
-                    cur.execute(""" INSERT INTO ReportedEquipment (reqp_id, reqp_date, reqp_client, reqp_details, reqp_location, reqp_belongs_cabinet, reqp_pressure_test_year)
-                                    VALUES (%s, %s, %s, %s, %s, %s, %s) 
-                                """,(report['reqp_id'], date, client_id, report['reqp_details'], report['reqp_location'],report['reqp_belongs_cabinet'], report['reqp_pressure_test_year']))
-                conn.commit()
-            except mysql.connector.Error as err:
-                conn.rollback()
-                app.logger.error("Error: Could not execute INSERT statement.")
-                app.logger.error(err)
-                cur.close()
-                conn.close()
-                return jsonify({"error": err}), 500
 
-            cur.close()
-            conn.close()
-            
-            return jsonify({"message": "Reported equipments is made successfully!"}), 200
+    if created['equipment']:
+        return jsonify({"message": "Reported equipments is made successfully!", "reports": reports_in_date}), 200
+    if reports_in_date:
+        return jsonify({"message" : "This client already has equipment reports in this date.", "reports": reports_in_date}), 200
+    return jsonify({"message" : "This client has no equipment reports. It might be a new client.", "reports": []}), 200
 
 
 # POST /makeCabinetReportsInDate
+# Writes full rows for the new visit, see copy_last_reports.
 @app.route('/makeCabinetReportsInDate', methods=['POST'])
 def make_cabinet_reports_in_date():
     data = request.get_json()
@@ -1120,47 +1810,102 @@ def make_cabinet_reports_in_date():
     if error_response:
         return jsonify(error_response), status_code
 
-    reports_in_date, error = fetch_client_cabinet_reports_in_date(date, client_id)
+    created, error = copy_last_reports(date, client_id, equipment=False)
+    if error:
+        return jsonify({"error": error}), 500
 
+    reports_in_date, error = fetch_client_cabinet_reports_in_date(date, client_id)
     if error:
         return jsonify({"error": error}), 500
-    
+
+    if created['cabinets']:
+        return jsonify({"message": "Reported cabinets is made successfully!", "reports": reports_in_date}), 200
     if reports_in_date:
-        return jsonify({"message" : "This client already has cabinet reports in this date."}), 200
-    else:
-        latest_reports, error = fetch_last_client_cabinet_reports(client_id)
+        return jsonify({"message" : "This client already has cabinet reports in this date.", "reports": reports_in_date}), 200
+    return jsonify({"error" : "This client has no cabinet reports. It might be a new client.", "reports": []}), 200
 
-        if error:
-            return jsonify({"error": error}), 500
-        
-        if not latest_reports:
-            return jsonify({"error" : "This client has no cabinet reports. It might be a new client."}), 200
-        else:
-            conn = get_db_connection()
+# POST /makeReportsInDate
+@app.route('/makeReportsInDate', methods=['POST'])
+def make_reports_in_date():
+    """Open a visit: copy the last equipment and cabinet reports to date together and return both."""
+    data = request.get_json()
+    token = data.get('token')
+    date = data.get('date')
+    client_id = data.get('client_id')
 
-            if conn is None:
-                return jsonify({"error": "Database connection failed"}), 500
-            
-            cur = conn.cursor()
-
-            try:
-                for report in latest_reports:
-                    cur.execute(""" INSERT INTO ReportedCabinet (rcab_id, rcab_date, rcab_client, rcab_location, rcab_rollers, rcab_nozzle2s, rcab_hoses, rcab_firehydrants, rcab_firecabinets)
-                                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) 
-                                """,(report['rcab_id'], date, client_id, report['rcab_location'], report['rcab_rollers'], report['rcab_nozzle2s'], report['rcab_hoses'], report['rcab_firehydrants'], report['rcab_firecabinets']))
-                conn.commit()
-            except mysql.connector.Error as err:
-                conn.rollback()
-                app.logger.error("Error: Could not execute INSERT statement.")
-                app.logger.error(err)
-                cur.close()
-                conn.close()
-                return jsonify({"error": "Database error occurred"}), 500
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
 
-            cur.close()
-            conn.close()
+    if not date or not client_id:
+        return jsonify({"error": "date and client_id are required"}), 400
 
-            return jsonify({"message": "Reported cabinets is made successfully!"}), 200
+    created, error = copy_last_reports(date, client_id)
+    if error:
+        return jsonify({"error": error}), 500
+
+    equipment, error = fetch_client_equipment_reports_in_date(date, client_id)
+    if error:
+        return jsonify({"error": error}), 500
+
+    cabinets, error = fetch_client_cabinet_reports_in_date(date, client_id)
+    if error:
+        return jsonify({"error": error}), 500
+
+    return jsonify({"created": created, "equipment": equipment, "cabinets": cabinets}), 200
+
+# Reference catalogs served from catalog_cache: table, statement loading the rows.
+CATALOGS = {
+    'equipment': ('Equipment', 'all_equipment'),
+    'maintenance_ops': ('MaintenanceOperations', 'all_maintenance_ops')
+}
+
+def load_catalog_rows(name):
+    conn = get_db_connection()
+    if conn is None:
+        raise mysql.connector.Error(msg="Database connection failed")
+    try:
+        return queries.fetch_all(conn, CATALOGS[name][1])
+    finally:
+        conn.close()
+
+def catalog_checksum(name):
+    """CHECKSUM TABLE of the catalog, a single cheap round trip for tables of this size."""
+    conn = get_db_connection()
+    if conn is None:
+        raise mysql.connector.Error(msg="Database connection failed")
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"CHECKSUM TABLE {CATALOGS[name][0]}")
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+    return row[1] if row else None
+
+for catalog_name in CATALOGS:
+    catalog_cache.register(
+        catalog_name,
+        lambda name=catalog_name: load_catalog_rows(name),
+        lambda name=catalog_name: catalog_checksum(name)
+    )
+
+def catalog_response(name):
+    """The cached catalog body with its ETag, or 304 when the client already holds that version."""
+    try:
+        entry = catalog_cache.get(name)
+    except mysql.connector.Error as err:
+        app.logger.error("Database query failed.")
+        app.logger.error(err)
+        return jsonify({"error": "Database query failed"}), 500
+
+    response = app.response_class(entry['body'], mimetype='application/json')
+    response.set_etag(entry['etag'])
+    # Let browsers keep the body but revalidate it on every use.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 # GET /allEquipments
 @app.route('/allEquipments', methods=['GET'])
@@ -1170,19 +1915,37 @@ def get_all_equipments():
     decoded_token, error_response, status_code = validate_token(token)
     if error_response:
         return jsonify(error_response), status_code
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Database connection failed"}), 500
 
-    cur = conn.cursor(dictionary=True)
-    cur.execute("""
-        SELECT * FROM Equipment
-    """)
-    results = cur.fetchall()
-    cur.close()
-    conn.close()
+    return catalog_response('equipment')
+
+# GET /searchEquipment
+@app.route('/searchEquipment', methods=['GET'])
+def search_equipment():
+    """Best matching equipments for q by catalog number, name, type or manufacturer, best first."""
+    token = request.args.get('token')
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', '10')
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
 
-    return jsonify(results)
+    try:
+        limit = int(limit)
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    if limit < 1 or limit > EQUIPMENT_SEARCH_MAX_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {EQUIPMENT_SEARCH_MAX_LIMIT}"}), 400
+
+    try:
+        entry = catalog_cache.get('equipment')
+    except mysql.connector.Error as err:
+        app.logger.error("Database query failed.")
+        app.logger.error(err)
+        return jsonify({"error": "Database query failed"}), 500
+
+    equipment_search.sync(entry['rows'], entry['etag'])
+    return jsonify(equipment_search.search(query, limit)), 200
 
 # GET /allMeintenanceOps
 @app.route('/allMeintenanceOps', methods=['GET'])
@@ -1193,20 +1956,8 @@ def get_all_meintenance_operations():
     decoded_token, error_response, status_code = validate_token(token)
     if error_response:
         return jsonify(error_response), status_code
-    
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Database connection failed"}), 500
 
-    cur = conn.cursor(dictionary=True)
-    cur.execute("""
-        SELECT * FROM MaintenanceOperations
-    """)
-    results = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    return jsonify(results)
+    return catalog_response('maintenance_ops')
 
 
 #POST /addReportedEquipment
@@ -1253,6 +2004,10 @@ def add_reported_equipment():
                     new_reported_equipment['reqp_pressure_test_year'],
                 )
             )
+        archive_added_report(
+            conn, cur, 'ReportedEquipment', ('reqp_id', 'reqp_date', 'reqp_client'),
+            (new_reported_equipment['reqp_id'], new_reported_equipment['reqp_date'], new_reported_equipment['reqp_client'])
+        )
         conn.commit()
     except mysql.connector.Error as err:
         conn.rollback()
@@ -1306,33 +2061,42 @@ def update_reported_equipment():
     cur = conn.cursor()
     
     try:
-        cur.execute(
-            """UPDATE ReportedEquipment 
-               SET reqp_details = %s, 
-                reqp_location = %s, 
-                reqp_belongs_cabinet = %s, 
-                reqp_in_use = %s, 
-                reqp_pressure_test_year = %s, 
-                reqp_maintenance_ops = %s, 
-                reqp_fix_desc = %s,
-                reqp_future_treatment = %s, 
-                reqp_remarks = %s
-               WHERE reqp_id = %s AND reqp_date = %s AND reqp_client = %s""",
-            (
-                updated_reported_equipment['reqp_details'], 
-                updated_reported_equipment['reqp_location'],
-                updated_reported_equipment['reqp_belongs_cabinet'],
-                updated_reported_equipment['reqp_in_use'],
-                updated_reported_equipment['reqp_pressure_test_year'],  
-                updated_reported_equipment['reqp_maintenance_ops'], 
-                updated_reported_equipment['reqp_fix_desc'],
-                updated_reported_equipment['reqp_future_treatment'], 
-                updated_reported_equipment['reqp_remarks'], 
-                updated_reported_equipment['reqp_id'],
-                updated_reported_equipment['reqp_date'],
-                updated_reported_equipment['reqp_client']
+        updated = 0
+        for table in report_write_tables(conn, 'ReportedEquipment', updated_reported_equipment['reqp_date']):
+            cur.execute(
+                f"""UPDATE {table} 
+                   SET reqp_details = %s, 
+                    reqp_location = %s, 
+                    reqp_belongs_cabinet = %s, 
+                    reqp_in_use = %s, 
+                    reqp_pressure_test_year = %s, 
+                    reqp_maintenance_ops = %s, 
+                    reqp_fix_desc = %s,
+                    reqp_future_treatment = %s, 
+                    reqp_remarks = %s
+                   WHERE reqp_id = %s AND reqp_date = %s AND reqp_client = %s""",
+                (
+                    updated_reported_equipment['reqp_details'], 
+                    updated_reported_equipment['reqp_location'],
+                    updated_reported_equipment['reqp_belongs_cabinet'],
+                    updated_reported_equipment['reqp_in_use'],
+                    updated_reported_equipment['reqp_pressure_test_year'],  
+                    updated_reported_equipment['reqp_maintenance_ops'], 
+                    updated_reported_equipment['reqp_fix_desc'],
+                    updated_reported_equipment['reqp_future_treatment'], 
+                    updated_reported_equipment['reqp_remarks'], 
+                    updated_reported_equipment['reqp_id'],
+                    updated_reported_equipment['reqp_date'],
+                    updated_reported_equipment['reqp_client']
+                )
             )
-        )
+            updated += cur.rowcount
+        if not updated and REPORT_HISTORY and report_history.is_compacted(
+                conn, updated_reported_equipment['reqp_client'], 'equipment', updated_reported_equipment['reqp_date']):
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({"error": "Compacted visits are read-only"}), 409
         conn.commit()
     except mysql.connector.Error as err:
         conn.rollback()
@@ -1399,6 +2163,10 @@ def add_reported_cabinet():
             new_reported_cabinet['rcab_firehydrants'], 
             new_reported_cabinet['rcab_firecabinets']
         ))
+        archive_added_report(
+            conn, cursor, 'ReportedCabinet', ('rcab_id', 'rcab_date', 'rcab_client'),
+            (cursor.lastrowid, new_reported_cabinet['rcab_date'], new_reported_cabinet['rcab_client'])
+        )
         conn.commit()
     except mysql.connector.Error as err:
         app.logger.error("Database insert failed.")
@@ -1457,7 +2225,7 @@ def update_reported_cabinet():
 
     try:
         query = '''
-            UPDATE ReportedCabinet
+            UPDATE {table}
             SET rcab_location = %s, rcab_rollers = %s, rcab_nozzle2s = %s, rcab_hoses = %s, 
                 rcab_firehydrants = %s, rcab_firecabinets = %s, rcab_new_hoses = %s, 
                 rcab_new_rollers = %s, rcab_new_nozzle2s = %s, rcab_new_nozzle1s = %s, 
@@ -1465,7 +2233,7 @@ def update_reported_cabinet():
                 rcab_remarks = %s
             WHERE rcab_id = %s AND rcab_date = %s AND rcab_client = %s
         '''
-        cursor.execute(query, (
+        params = (
             updated_reported_cabinet['rcab_location'], 
             updated_reported_cabinet['rcab_rollers'], 
             updated_reported_cabinet['rcab_nozzle2s'], 
@@ -1483,7 +2251,17 @@ def update_reported_cabinet():
             updated_reported_cabinet['rcab_id'], 
             updated_reported_cabinet['rcab_date'], 
             updated_reported_cabinet['rcab_client']
-        ))
+        )
+        updated = 0
+        for table in report_write_tables(conn, 'ReportedCabinet', updated_reported_cabinet['rcab_date']):
+            cursor.execute(query.format(table=table), params)
+            updated += cursor.rowcount
+        if not updated and REPORT_HISTORY and report_history.is_compacted(
+                conn, updated_reported_cabinet['rcab_client'], 'cabinet', updated_reported_cabinet['rcab_date']):
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return jsonify({'error': 'Compacted visits are read-only'}), 409
         conn.commit()
     except mysql.connector.Error as err:
         app.logger.error("Database update failed.")
@@ -1503,6 +2281,8 @@ def daily_employee_open_tasks():
     apt_date = request.args.get('apt_date')
     lat = request.args.get('lat')
     long = request.args.get('long')
+    depart = request.args.get('depart')
+    service_minutes = request.args.get('service_minutes', SERVICE_MINUTES)
 
     decoded_token, error_response, status_code = validate_token(token)
     if error_response:
@@ -1513,58 +2293,231 @@ def daily_employee_open_tasks():
     if not apt_date or not apt_emp_executive:
         return jsonify({'error': 'Missing required parameters'}), 400
 
-    # Establish a connection to the database
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        departure = parse_departure(apt_date, depart)
+        service_minutes = parse_service_minutes(service_minutes)
+    except ValueError:
+        return jsonify({'error': 'apt_date must be YYYY-MM-DD, depart HH:MM and service_minutes a number between 0 and 1440'}), 400
+
+    # A plan precomputed overnight skips both the query and the solve.
+    plan = trip_store.get(apt_emp_executive, departure.date().isoformat())
+    if plan is not None:
+        tasks = plan['stops']
+        trip_plans.set((str(apt_emp_executive), str(apt_date)), [str(task['apt_client']) for task in tasks])
+        if lat and long:
+            scheduled_tasks, _ = trip_schedule(to_point(lat, long), tasks, departure, service_minutes)
+            return jsonify(scheduled_tasks), 200
+        return jsonify(tasks), 200
+
+    results, error = fetch_employee_open_tasks(apt_emp_executive, apt_date)
+    if error:
+        return jsonify({'error': error}), 500
 
-    cursor = conn.cursor(dictionary=True)
+    if not results:
+        return jsonify(results), 200
+    else:
+        if lat and long:
+            ordered_tasks, error = get_cached_trip(apt_emp_executive, apt_date, lat, long, results)
+
+            if error:
+                # Without a usable start position the stops are still returned, just unordered.
+                app.logger.warning(f"Could not order the trip: {error}")
+                return jsonify(results), 200
+            else:
+                scheduled_tasks, _ = trip_schedule(to_point(lat, long), ordered_tasks, departure, service_minutes)
+                return jsonify(scheduled_tasks), 200
+        else:
+            return jsonify(results), 200
+
+# GET /replanTrip
+@app.route('/replanTrip', methods=['GET'])
+def replan_trip():
+    """Re-order the remaining open stops of the day from the current position, reporting what changed."""
+    token = request.args.get('token')
+    apt_date = request.args.get('apt_date')
+    lat = request.args.get('lat')
+    long = request.args.get('long')
+    depart = request.args.get('depart')
+    service_minutes = request.args.get('service_minutes', SERVICE_MINUTES)
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    apt_emp_executive = decoded_token.get('emp_ID')
+
+    if not apt_date or not apt_emp_executive or not lat or not long:
+        return jsonify({'error': 'Missing required parameters'}), 400
 
     try:
-        query = '''
-                SELECT 
-                    a.apt_client,
-                    c.client_name,
-                    c.client_lat,
-                    c.client_long,
-                    c.client_city,
-                    c.client_street,
-                    c.client_street_number,
-                    cr.rep_phone
-                FROM 
-                    Appointment a
-                LEFT JOIN 
-                    Client c ON a.apt_client = c.client_id
-                LEFT JOIN 
-                    ClientRepresentative cr ON c.client_rep = cr.rep_id
-                WHERE 
-                    a.apt_emp_executive = %s
-                    AND a.apt_date = %s
-                    AND a.apt_status = 'open'
-                '''
-        cursor.execute(query, (apt_emp_executive, apt_date))
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        departure = parse_departure(apt_date, depart)
+        service_minutes = parse_service_minutes(service_minutes)
+    except ValueError:
+        return jsonify({'error': 'apt_date must be YYYY-MM-DD, depart HH:MM and service_minutes a number between 0 and 1440'}), 400
 
-        if not results:
-            return jsonify(results), 200
-        else:
-            if lat and long:
-                ordered_tasks, error = get_optimal_trip(lat, long, results)
+    results, error = fetch_employee_open_tasks(apt_emp_executive, apt_date)
+    if error:
+        return jsonify({'error': error}), 500
 
-                if error:
-                    return jsonify(results), 401
-                else:
-                    return jsonify(ordered_tasks), 200
-            else:
-                return jsonify(results), 200
-    except mysql.connector.Error as err:
-        app.logger.error("Database query failed.")
-        app.logger.error(err)
-        cursor.close()
-        conn.close()
-        return jsonify({'error': 'Database query failed'}), 500
+    ordered_tasks, mode, delta, error = plan_employee_trip(apt_emp_executive, apt_date, lat, long, results)
+    if error:
+        return jsonify({'error': error}), 400
+
+    scheduled_tasks, summary = trip_schedule(to_point(lat, long), ordered_tasks, departure, service_minutes)
+    return jsonify({'mode': mode, 'order': scheduled_tasks, 'delta': delta, 'summary': summary}), 200
+
+# GET /nearbyOpenAppointments
+@app.route('/nearbyOpenAppointments', methods=['GET'])
+def nearby_open_appointments():
+    """Open appointments near the current position, with the cheapest place to add each one to the current trip."""
+    token = request.args.get('token')
+    apt_date = request.args.get('apt_date')
+    lat = request.args.get('lat')
+    long = request.args.get('long')
+    radius_km = request.args.get('radius_km')
+    k = request.args.get('k', '10')
+    unassigned_only = request.args.get('unassigned_only', '1') == '1'
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    apt_emp_executive = decoded_token.get('emp_ID')
+    position = to_point(lat, long)
+
+    if not apt_date or not apt_emp_executive or position is None:
+        return jsonify({'error': 'Missing required parameters'}), 400
+
+    try:
+        radius_km = float(radius_km) if radius_km else None
+        k = int(k)
+        if k < 1 or (radius_km is not None and not (math.isfinite(radius_km) and 0 < radius_km <= NEARBY_MAX_RADIUS_KM)):
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': f'radius_km must be a number between 0 and {NEARBY_MAX_RADIUS_KM:g} and k a positive integer'}), 400
+
+    index, error = get_open_appointment_index(apt_date)
+    if error:
+        return jsonify({'error': error}), 500
+
+    def is_candidate(_, row):
+        if str(row['apt_emp_executive']) == str(apt_emp_executive):
+            return False
+        return not unassigned_only or row['apt_emp_executive'] is None
+
+    if radius_km is not None:
+        found = [item for item in index.within(position, radius_km) if is_candidate(item[1], item[2])][:k]
+    else:
+        found = index.nearest(position, k, is_candidate)
+
+    # The technician's remaining trip, in the order last handed out when there is one.
+    order = trip_plans.get((str(apt_emp_executive), str(apt_date)))
+    if order is not None:
+        trip = [index.get(client_id) for client_id in order if client_id in index]
+    else:
+        trip = [index.get(key) for key in index.keys() if str(index.get(key)['apt_emp_executive']) == str(apt_emp_executive)]
+        trip = [trip[i] for i in order_stops(position, [to_point(row['client_lat'], row['client_long']) for row in trip])]
+    trip_points = [to_point(row['client_lat'], row['client_long']) for row in trip]
+
+    results = []
+    for distance_km, _, row in found:
+        point = to_point(row['client_lat'], row['client_long'])
+        matrix = trip_matrix(position, trip_points + [point])
+        extra_km, pos = cheapest_insertion(matrix, list(range(1, len(trip_points) + 1)), len(trip_points) + 1)
+        results.append(dict(row,
+                            distance_km=round(distance_km, 2),
+                            insert_position=pos,
+                            insert_after=trip[pos - 1]['apt_client'] if pos > 0 else None,
+                            extra_distance_km=round(extra_km, 2),
+                            extra_minutes=round(travel_matrix.duration_minutes(extra_km), 1)))
+
+    return jsonify(results), 200
+
+# POST /invalidateClientCache
+@app.route('/invalidateClientCache', methods=['POST'])
+def invalidate_client_cache():
+    """Drop cached client/representative rows after they were edited directly in the database."""
+    data = request.get_json()
+    token = data.get('token')
+    client_id = data.get('client_id')
+    rep_id = data.get('rep_id')
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    if decoded_token.get('role') != 'Manager':
+        return jsonify("Forbidden!"), 403
+
+    invalidate_client_lookups(client_id, rep_id)
+    return jsonify({'message': 'Client cache invalidated successfully'}), 200
+
+# POST /invalidateCatalogCache
+@app.route('/invalidateCatalogCache', methods=['POST'])
+def invalidate_catalog_cache():
+    """Reload the equipment/maintenance catalogs after they were edited directly in the database."""
+    data = request.get_json()
+    token = data.get('token')
+    catalog = data.get('catalog')
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    if decoded_token.get('role') != 'Manager':
+        return jsonify("Forbidden!"), 403
+
+    if catalog is not None and catalog not in CATALOGS:
+        return jsonify({"error": f"catalog must be one of {', '.join(CATALOGS)}"}), 400
+
+    catalog_cache.invalidate(catalog)
+    return jsonify({'message': 'Catalog cache invalidated successfully'}), 200
+
+# GET /authStateStats
+@app.route('/authStateStats', methods=['GET'])
+def get_auth_state_stats():
+    token = request.args.get('token')
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    if decoded_token.get('role') != 'Manager':
+        return jsonify("Forbidden!"), 403
+
+    return jsonify(auth_store.stats()), 200
+
+# GET /dbPoolStats (pool state and per-statement timings)
+@app.route('/dbPoolStats', methods=['GET'])
+def get_db_pool_stats():
+    token = request.args.get('token')
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    if decoded_token.get('role') != 'Manager':
+        return jsonify("Forbidden!"), 403
+
+    return jsonify(dict(connection_pool.stats(), queries=queries.query_stats.snapshot(), catalogs=catalog_cache.stats(), equipment_search=equipment_search.stats())), 200
+
+# GET /routingStats
+@app.route('/routingStats', methods=['GET'])
+def get_routing_stats():
+    token = request.args.get('token')
+
+    decoded_token, error_response, status_code = validate_token(token)
+    if error_response:
+        return jsonify(error_response), status_code
+
+    if decoded_token.get('role') != 'Manager':
+        return jsonify("Forbidden!"), 403
+
+    return jsonify({
+        "osrm": routing_client.stats(),
+        "osrm_refine": OSRM_REFINE,
+        "trip_cache": trip_cache.stats()
+    }), 200
 
 @app.route('/closeAppointment', methods=['PUT'])
 def close_appointment():
@@ -1588,6 +2541,7 @@ def close_appointment():
     if conn is None:
         return jsonify({'error': 'Database connection failed'}), 500
 
+    calendar_write = calendar_cache.begin(parse_apt_date(date))
     cursor = conn.cursor()
 
     try:
@@ -1605,9 +2559,16 @@ def close_appointment():
     
     cursor.close()
     conn.close()
+    if parse_apt_date(date):
+        calendar_cache.update(calendar_write, parse_apt_date(date), client_id, apt_status='closed')
+    invalidate_trips(date, client_id=client_id)
+    update_open_appointment_index(date, client_id, closed=True)
     return jsonify({'message': 'Appointment closed successfully'}), 200
 
 
+if PRECOMPUTE_AT:
+    threading.Thread(target=run_precompute_scheduler, daemon=True).start()
+
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Construct the full path to the PEM files
@@ -0,0 +1,42 @@
+import argparse
+import datetime
+import sys
+
+import report_archive
+from config import REPORT_ARCHIVE_REFRESH
+from database import get_db_connection
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old ReportedEquipment/ReportedCabinet rows to the archive tables.")
+    parser.add_argument('--before', help='Archive visits dated before this day (YYYY-MM-DD), January 1st of last year by default.')
+    parser.add_argument('--keep-years', type=int, default=1, help='Full years before the current one to keep hot when --before is not given.')
+    parser.add_argument(
+        '--wait', type=float, default=REPORT_ARCHIVE_REFRESH,
+        help='Seconds between recording a new cutoff and moving rows, so every API worker has re-read it (REPORT_ARCHIVE_REFRESH by default).'
+    )
+    args = parser.parse_args()
+
+    before = datetime.datetime.strptime(args.before, '%Y-%m-%d').date() if args.before else report_archive.default_cutoff(keep_years=args.keep_years)
+
+    conn = get_db_connection()
+    if conn is None:
+        print("Could not connect to the database")
+        return 1
+
+    try:
+        report_archive.create_tables(conn)
+        moved = report_archive.archive_before(
+            conn, before, progress=lambda table, day, count: print(f"{table} {day}: {count} rows"), wait=args.wait
+        )
+    finally:
+        conn.close()
+
+    for table, count in moved.items():
+        print(f"Archived {count} {table} rows dated before {before}")
+    print("Set REPORT_ARCHIVE=1 so the API reads old dates from the archive tables")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+import random
+import sqlite3
+import threading
+from time import time
+
+from ttl_store import TTLStore
+
+
+class MemoryAuthStore:
+    """Auth state kept in this process only, fine for a single worker.
+
+    Every namespace gets its own bounded TTLStore, so a flood of entries in
+    one (login attempts for made-up usernames) can only evict entries of
+    that namespace and never a block, an OTP or a cache version.
+    """
+
+    def __init__(self, max_entries=100000, sweep_interval=30.0):
+        self.max_entries = max_entries
+        self._stores = {}
+        self._lock = threading.Lock()
+        if sweep_interval:
+            self._stop = threading.Event()
+            sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,), daemon=True)
+            sweeper.start()
+
+    def _store(self, namespace):
+        store = self._stores.get(namespace)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(namespace)
+                if store is None:
+                    # One sweeper thread serves every namespace.
+                    store = self._stores[namespace] = TTLStore(max_entries=self.max_entries, sweep_interval=0)
+        return store
+
+    def get(self, namespace, key):
+        return self._store(namespace).get(key)
+
+    def set(self, namespace, key, value, ttl=None):
+        self._store(namespace).set(key, value, ttl)
+
+    def incr(self, namespace, key, amount=1, ttl=None):
+        return self._store(namespace).incr(key, amount, ttl)
+
+    def delete(self, namespace, key):
+        return self._store(namespace).delete(key)
+
+    def sweep(self):
+        return sum(store.sweep() for store in list(self._stores.values()))
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.sweep()
+
+    def close(self):
+        if hasattr(self, '_stop'):
+            self._stop.set()
+
+    def stats(self):
+        namespaces = {namespace: store.stats() for namespace, store in list(self._stores.items())}
+        totals = {field: sum(stats[field] for stats in namespaces.values()) for field in ('entries', 'bytes', 'evictions', 'expired')}
+        return dict(totals, backend='memory', namespaces=namespaces)
+
+
+class SQLiteAuthStore:
+    """Auth state in a SQLite file, shared by every worker process on the host.
+
+    Every operation is a single statement or an immediate transaction, so
+    increments from concurrent workers are never lost.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS auth_state (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value,
+                expires REAL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        row = self._conn().execute(
+            "SELECT value FROM auth_state WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires > ?)",
+            (namespace, key, time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, namespace, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO auth_state (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+            (namespace, key, value, time() + ttl if ttl is not None else None)
+        )
+        # Purge expired rows now and then instead of on every write.
+        if random.random() < 0.01:
+            self.sweep()
+
+    def sweep(self):
+        cursor = self._conn().execute("DELETE FROM auth_state WHERE expires IS NOT NULL AND expires <= ?", (time(),))
+        return cursor.rowcount
+
+    def stats(self):
+        conn = self._conn()
+        entries = conn.execute("SELECT COUNT(*) FROM auth_state").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {'backend': 'sqlite', 'entries': entries, 'bytes': page_count * page_size}
+
+    def incr(self, namespace, key, amount=1, ttl=None):
+        conn = self._conn()
+        now = time()
+        expires = now + ttl if ttl is not None else None
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("""
+                INSERT INTO auth_state (namespace, key, value, expires) VALUES (?, ?, ?, ?)
+                ON CONFLICT (namespace, key) DO UPDATE SET
+                    value = CASE WHEN expires IS NOT NULL AND expires <= ? THEN excluded.value ELSE value + excluded.value END,
+                    expires = CASE WHEN expires IS NOT NULL AND expires <= ? THEN excluded.expires ELSE expires END
+            """, (namespace, key, amount, expires, now, now))
+            value = conn.execute(
+                "SELECT value FROM auth_state WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()[0]
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+
+    def delete(self, namespace, key):
+        cursor = self._conn().execute("DELETE FROM auth_state WHERE namespace = ? AND key = ?", (namespace, key))
+        return cursor.rowcount > 0
+
+
+class StoreDict:
+    """Dict-like view of one namespace of an auth store.
+
+    Lets the auth helpers keep their dict syntax while the state lives in
+    a shared backend. Use incr() instead of `d[key] += 1` so increments
+    stay atomic across workers.
+    """
+
+    def __init__(self, store, namespace):
+        self.store = store
+        self.namespace = namespace
+
+    def __contains__(self, key):
+        return self.store.get(self.namespace, key) is not None
+
+    def __getitem__(self, key):
+        value = self.store.get(self.namespace, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.store.set(self.namespace, key, value)
+
+    def __delitem__(self, key):
+        if not self.store.delete(self.namespace, key):
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        value = self.store.get(self.namespace, key)
+        return default if value is None else value
+
+    def set(self, key, value, ttl=None):
+        self.store.set(self.namespace, key, value, ttl)
+
+    def pop(self, key, default=None):
+        value = self.store.get(self.namespace, key)
+        self.store.delete(self.namespace, key)
+        return default if value is None else value
+
+    def incr(self, key, amount=1, ttl=None):
+        return self.store.incr(self.namespace, key, amount, ttl)
+
+
+def create_auth_store(backend, path=None, max_entries=100000):
+    if backend == 'memory':
+        return MemoryAuthStore(max_entries)
+    if backend == 'sqlite':
+        return SQLiteAuthStore(path)
+    raise ValueError(f"Unknown auth state backend: {backend}")
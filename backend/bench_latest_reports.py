@@ -0,0 +1,107 @@
+import argparse
+import datetime
+import statistics
+import sys
+from time import perf_counter
+
+import queries
+from database import get_db_connection
+
+
+def old_latest_equipment(conn, client_id):
+    # The lookup as it was: MAX() in one round trip, the rows in a second one.
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT MAX(reqp_date) AS latest_date FROM ReportedEquipment WHERE reqp_client = %s AND reqp_in_use = 1", (client_id,))
+    latest_date = cur.fetchone()['latest_date']
+    cur.execute("SELECT * FROM ReportedEquipment WHERE reqp_date = %s AND reqp_client = %s AND reqp_in_use = 1", (latest_date, client_id))
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def new_latest_equipment(conn, client_id):
+    return queries.fetch_all(conn, 'latest_equipment_reports', (client_id, client_id))
+
+
+def seed(conn, client_id, years, items, visits_per_year):
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM ReportedEquipment WHERE reqp_client = %s", (client_id,))
+    if cur.fetchone()[0]:
+        raise SystemExit(f"Client {client_id} already has equipment reports, pick an unused id to seed")
+    start = datetime.date.today() - datetime.timedelta(days=365 * years)
+    step = datetime.timedelta(days=365 // visits_per_year)
+    rows = []
+    for visit in range(years * visits_per_year):
+        day = start + step * visit
+        rows.extend((item, day, client_id, None, f'Location {item}', None, 0, 1, day.year) for item in range(1, items + 1))
+    cur.executemany(
+        "INSERT INTO ReportedEquipment (reqp_id, reqp_date, reqp_client, reqp_details, reqp_location, reqp_belongs_cabinet, reqp_is_new, reqp_in_use, reqp_pressure_test_year) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        rows
+    )
+    cur.close()
+    return len(rows)
+
+
+def explain(conn, client_id):
+    # The plan the single query gets, to confirm it uses the (client, date) index.
+    cur = conn.cursor(dictionary=True)
+    cur.execute("EXPLAIN " + queries.STATEMENTS['latest_equipment_reports'].sql, (client_id, client_id))
+    plan = cur.fetchall()
+    cur.close()
+    return plan
+
+
+def timed(fn, conn, client_id, runs):
+    samples = []
+    for _ in range(runs):
+        started = perf_counter()
+        rows = fn(conn, client_id)
+        samples.append((perf_counter() - started) * 1000)
+    samples.sort()
+    return len(rows), statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the two-query and single-query latest equipment report lookups.")
+    parser.add_argument('--client', type=int, required=True, help='Client to look up.')
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--seed-years', type=int, help='Insert this many years of visits for the client first; rolled back at the end.')
+    parser.add_argument('--items', type=int, default=200, help='Extinguishers per seeded visit.')
+    parser.add_argument('--visits-per-year', type=int, default=2)
+    parser.add_argument('--create-indexes', action='store_true', help='Add the missing report indexes (queries.REPORT_INDEXES) first.')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if conn is None:
+        print("Could not connect to the database")
+        return 1
+
+    try:
+        # DDL commits, so this runs before anything is seeded.
+        if args.create_indexes:
+            for table, name, columns in queries.create_indexes(conn):
+                print(f"Created index {name} on {table} ({', '.join(columns)})")
+        for table, name, columns in queries.missing_indexes(conn):
+            print(f"Missing index {name} on {table} ({', '.join(columns)}), rerun with --create-indexes")
+
+        if args.seed_years:
+            count = seed(conn, args.client, args.seed_years, args.items, args.visits_per_year)
+            print(f"Seeded {count} rows for client {args.client} (not committed)")
+
+        for label, fn in (('MAX() + rows (2 round trips)', old_latest_equipment), ('single query (1 round trip)', new_latest_equipment)):
+            fn(conn, args.client)
+            rows, mean, p50, p95 = timed(fn, conn, args.client, args.runs)
+            print(f"{label:32} rows={rows:<5} mean={mean:7.2f} ms  p50={p50:7.2f} ms  p95={p95:7.2f} ms")
+
+        print("Plan of the single query:")
+        for step in explain(conn, args.client):
+            print(f"  {step.get('table')}: type={step.get('type')} key={step.get('key')} rows={step.get('rows')} extra={step.get('Extra')}")
+    finally:
+        conn.rollback()
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import threading
+from collections import OrderedDict
+
+
+def _key_value(value):
+    # Ids come back from MySQL as ints but often arrive from requests as strings.
+    return int(value) if isinstance(value, str) and value.isdigit() else value
+
+
+class CalendarCache:
+    """Per-day appointment counts, and optionally the appointment rows, of recently viewed months.
+
+    Write endpoints apply their change to the cached month instead of
+    dropping it. Every month also has a version number in versions (a
+    StoreDict); when that store is shared between workers, a worker whose
+    copy of a month is older than the shared version reloads it from the
+    database, so workers never serve a month another worker changed.
+
+    A write bumps the version twice: begin() before the database write and
+    add()/update()/move() after the commit. A month loaded while the write
+    was in flight may or may not hold the change already, so it is dropped;
+    only a copy loaded before begin() is patched in place.
+    """
+
+    def __init__(self, versions, max_months=48):
+        self.versions = versions
+        self.max_months = max_months
+        # (year, month) -> {'counts': {date: n}, 'rows': {(apt_date, apt_client): row} or None, 'version': v}
+        self._months = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _version_key(year, month):
+        return f'{year}-{month:02d}'
+
+    def _current(self, year, month, need_rows):
+        version = self.versions.get(self._version_key(year, month), 0)
+        with self._lock:
+            entry = self._months.get((year, month))
+            if entry is None or entry['version'] != version or (need_rows and entry['rows'] is None):
+                self.misses += 1
+                return None, version
+            self._months.move_to_end((year, month))
+            self.hits += 1
+            if need_rows:
+                return [dict(row) for row in entry['rows'].values()], version
+            return {day.strftime('%Y-%m-%d'): n for day, n in sorted(entry['counts'].items()) if n > 0}, version
+
+    def rows(self, year, month):
+        """(rows, version) of the month; rows is None on a miss and version goes to load_rows()."""
+        return self._current(year, month, True)
+
+    def counts(self, year, month):
+        """({'YYYY-MM-DD': n}, version) of the month; counts is None on a miss and version goes to load_counts()."""
+        return self._current(year, month, False)
+
+    def load_rows(self, year, month, rows, version):
+        counts = {}
+        by_key = {}
+        for row in rows:
+            by_key[(row['apt_date'], _key_value(row['apt_client']))] = row
+            counts[row['apt_date']] = counts.get(row['apt_date'], 0) + 1
+        self._store(year, month, {'counts': counts, 'rows': by_key, 'version': version})
+
+    def load_counts(self, year, month, counts, version):
+        """Cache {date: n} counted by the database."""
+        self._store(year, month, {'counts': dict(counts), 'rows': None, 'version': version})
+
+    def _store(self, year, month, entry):
+        with self._lock:
+            # Skip data read before a write to the month finished.
+            if self.versions.get(self._version_key(year, month), 0) != entry['version']:
+                return
+            self._months[(year, month)] = entry
+            self._months.move_to_end((year, month))
+            while len(self._months) > self.max_months:
+                self._months.popitem(last=False)
+
+    def begin(self, *dates):
+        """Call before writing appointments of dates; pass the result to add(), update() or move() after the commit.
+
+        Bumps the versions of the dates' months, so nothing read from the
+        database until the commit can be cached under the old version.
+        """
+        write = {}
+        with self._lock:
+            for day in dates:
+                if day is None or (day.year, day.month) in write:
+                    continue
+                write[(day.year, day.month)] = self.versions.incr(self._version_key(day.year, day.month)) - 1
+        return write
+
+    def _apply(self, write, apt_date, change):
+        # Bump the month version and apply change to the cached month if it was loaded before begin().
+        key = (apt_date.year, apt_date.month)
+        with self._lock:
+            version = self.versions.incr(self._version_key(*key))
+            entry = self._months.get(key)
+            if entry is None:
+                return
+            if key not in write or entry['version'] != write[key]:
+                del self._months[key]
+                return
+            change(entry)
+            entry['version'] = version
+            # Further changes of the same write keep patching this copy.
+            write[key] = version
+
+    def add(self, write, row):
+        """A new appointment was inserted."""
+        row = {field: _key_value(value) for field, value in row.items()}
+
+        def change(entry):
+            entry['counts'][row['apt_date']] = entry['counts'].get(row['apt_date'], 0) + 1
+            if entry['rows'] is not None:
+                entry['rows'][(row['apt_date'], row['apt_client'])] = row
+
+        self._apply(write, row['apt_date'], change)
+
+    def update(self, write, apt_date, apt_client, **fields):
+        """Fields of an existing appointment changed, its date did not."""
+        fields = {field: _key_value(value) for field, value in fields.items()}
+
+        def change(entry):
+            if entry['rows'] is None:
+                return
+            row = entry['rows'].get((apt_date, _key_value(apt_client)))
+            if row is None:
+                entry['rows'] = None
+            else:
+                row.update(fields)
+
+        self._apply(write, apt_date, change)
+
+    def move(self, write, apt_date, apt_client, new_apt_date, count=1):
+        """count appointments of apt_client were moved from apt_date to new_apt_date."""
+        moved = []
+
+        def take(entry):
+            entry['counts'][apt_date] = entry['counts'].get(apt_date, 0) - count
+            if entry['rows'] is not None:
+                row = entry['rows'].pop((apt_date, _key_value(apt_client)), None)
+                if row is None:
+                    entry['rows'] = None
+                else:
+                    moved.append(dict(row, apt_date=new_apt_date))
+
+        def put(entry):
+            entry['counts'][new_apt_date] = entry['counts'].get(new_apt_date, 0) + count
+            if entry['rows'] is not None:
+                if moved:
+                    entry['rows'][(new_apt_date, moved[0]['apt_client'])] = moved[0]
+                else:
+                    # The old month was not cached, the rest of the moved row is unknown here.
+                    entry['rows'] = None
+
+        self._apply(write, apt_date, take)
+        self._apply(write, new_apt_date, put)
+
+    def stats(self):
+        with self._lock:
+            return {'months': len(self._months), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,100 @@
+import hashlib
+import threading
+from time import monotonic
+
+
+class CatalogCache:
+    """Small reference tables (the equipment and maintenance catalogs) kept in memory as ready-to-send JSON.
+
+    Each catalog is registered with a load function returning its rows
+    and optionally a check function returning a cheap signature of the
+    table (e.g. CHECKSUM TABLE). The body is serialized once per load and
+    its hash is the catalog version, sent as the ETag. Within
+    check_interval seconds of the last load or check a catalog is served
+    from memory without touching the database; after that the next
+    request runs the check and only reloads the rows if the signature
+    changed. invalidate() bumps the catalog's counter in versions (a
+    StoreDict), so when that store is shared every worker reloads.
+    """
+
+    def __init__(self, versions, serialize, check_interval=300.0):
+        self.versions = versions
+        self.serialize = serialize
+        self.check_interval = check_interval
+        # name -> {'load': fn, 'check': fn or None, 'lock': Lock}
+        self._catalogs = {}
+        # name -> {'rows', 'body', 'etag', 'signature', 'shared', 'checked_at'}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'checks': 0, 'loads': 0}
+
+    def register(self, name, load, check=None):
+        self._catalogs[name] = {'load': load, 'check': check, 'lock': threading.Lock()}
+
+    def _fresh(self, entry, shared):
+        return (
+            entry is not None and entry['shared'] == shared
+            and monotonic() - entry['checked_at'] < self.check_interval
+        )
+
+    def get(self, name):
+        """The catalog's entry, with 'rows', 'body' (bytes) and 'etag', loading or re-checking it when due."""
+        shared = self.versions.get(name, 0)
+        with self._lock:
+            entry = self._entries.get(name)
+            if self._fresh(entry, shared):
+                self.counters['hits'] += 1
+                return entry
+
+        catalog = self._catalogs[name]
+        # One request per catalog goes to the database, the others wait for its result.
+        with catalog['lock']:
+            with self._lock:
+                entry = self._entries.get(name)
+                if self._fresh(entry, shared):
+                    self.counters['hits'] += 1
+                    return entry
+
+            signature = None
+            if catalog['check'] is not None:
+                signature = catalog['check']()
+                with self._lock:
+                    self.counters['checks'] += 1
+                if entry is not None and entry['shared'] == shared and signature == entry['signature']:
+                    with self._lock:
+                        entry['checked_at'] = monotonic()
+                    return entry
+
+            rows = catalog['load']()
+            body = self.serialize(rows)
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            entry = {
+                'rows': rows,
+                'body': body,
+                'etag': hashlib.sha1(body).hexdigest()[:16],
+                'signature': signature,
+                'shared': shared,
+                'checked_at': monotonic()
+            }
+            with self._lock:
+                self._entries[name] = entry
+                self.counters['loads'] += 1
+            return entry
+
+    def invalidate(self, name=None):
+        """Reload name (or every catalog) on its next request, in this worker and the ones sharing versions."""
+        names = [name] if name is not None else list(self._catalogs)
+        for catalog_name in names:
+            self.versions.incr(catalog_name)
+            with self._lock:
+                self._entries.pop(catalog_name, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['catalogs'] = {
+                name: {'etag': entry['etag'], 'rows': len(entry['rows']), 'bytes': len(entry['body'])}
+                for name, entry in self._entries.items()
+            }
+        return stats
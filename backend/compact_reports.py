@@ -0,0 +1,63 @@
+import argparse
+import logging
+import sys
+
+import mysql.connector
+
+import report_history
+from config import REPORT_HISTORY_KEEP_VISITS
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+def compact_report_history(client_id=None, keep_visits=REPORT_HISTORY_KEEP_VISITS):
+    """Turn every client's older visits into change log entries, returning (visits compacted, error)."""
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Database connection failed"
+
+    compacted = 0
+    try:
+        report_history.create_tables(conn)
+        for kind, spec in report_history.KINDS.items():
+            if client_id is not None:
+                client_ids = [client_id]
+            else:
+                cur = conn.cursor()
+                cur.execute(f"SELECT DISTINCT {spec['client']} FROM {spec['table']}")
+                client_ids = [row[0] for row in cur.fetchall()]
+                cur.close()
+            for client in client_ids:
+                compacted += report_history.compact_client(conn, client, kind, keep_visits)
+    except mysql.connector.Error as err:
+        logger.error("Report history compaction failed.")
+        logger.error(err)
+        return compacted, "Database error occurred"
+    finally:
+        conn.close()
+
+    return compacted, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move older report visits into the report history change log.")
+    parser.add_argument('--client', type=int, help='Only compact this client.')
+    parser.add_argument('--keep', type=int, default=REPORT_HISTORY_KEEP_VISITS, help='Latest visits per client to keep as full rows.')
+    args = parser.parse_args()
+
+    if args.keep < 1:
+        print("--keep must be at least 1, new visits are copied from the latest one")
+        return 1
+
+    count, error = compact_report_history(args.client, args.keep)
+    if error:
+        print(f"Report history compaction failed after {count} visits: {error}")
+        return 1
+
+    print(f"Compacted {count} visits, set REPORT_HISTORY=1 so the API reads them back")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
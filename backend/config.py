@@ -0,0 +1,92 @@
+import os
+
+from dotenv import load_dotenv
+
+# Settings read from the environment (and .env). Importing this module has no other side effects,
+# so the command line jobs can share the API's configuration without starting the API.
+load_dotenv()
+
+# Configure MySQL connection
+db_config = {
+    'user': os.environ.get('DB_USER'),
+    'password': os.environ.get('DB_PASSWORD'),
+    'host': os.environ.get('DB_HOST'),
+    'database': os.environ.get('DB_NAME')
+}
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))
+# Seconds a request waits for a free connection before giving up.
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '5'))
+# Connections older than this many seconds are replaced, idle ones are pinged before reuse.
+DB_POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', '3600'))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+
+# OTP and login attempt state. 'memory' is per process, use 'sqlite' to share it between workers.
+AUTH_STATE_BACKEND = os.environ.get('AUTH_STATE_BACKEND', 'memory')
+AUTH_STATE_PATH = os.environ.get('AUTH_STATE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'auth_state.db'))
+
+# Upper bound on in-memory auth entries per namespace (OTPs, login attempts, blocks...), so scanning traffic cannot grow them without limit.
+AUTH_STATE_MAX_ENTRIES = int(os.environ.get('AUTH_STATE_MAX_ENTRIES', '100000'))
+
+CLIENT_CACHE_SIZE = int(os.environ.get('CLIENT_CACHE_SIZE', '4096'))
+CLIENT_CACHE_TTL = float(os.environ.get('CLIENT_CACHE_TTL', '600'))
+
+JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
+
+#SMS API data
+
+sms_url=os.environ.get('SMS_URL', "https://api.sms4free.co.il/ApiSMS/v2/SendSMS")
+sms_api_key=os.environ.get('SMS_API_KEY')
+sms_root_phone=os.environ.get('SMS_ROOT_PHONE')
+sms_root_password=os.environ.get('SMS_ROOT_PASSWORD')
+sms_sender=os.environ.get('SMS_SENDER')
+SMS_WORKERS = int(os.environ.get('SMS_WORKERS', '4'))
+SMS_QUEUE_SIZE = int(os.environ.get('SMS_QUEUE_SIZE', '1000'))
+SMS_RETRIES = int(os.environ.get('SMS_RETRIES', '3'))
+
+#Routing data
+
+OSRM_TRIP_URL = os.environ.get('OSRM_TRIP_URL', 'http://router.project-osrm.org/trip/v1/driving/')
+OSRM_REFINE = os.environ.get('OSRM_REFINE', '0') == '1'
+OSRM_TIMEOUT = float(os.environ.get('OSRM_TIMEOUT', '3'))
+OSRM_POOL_SIZE = int(os.environ.get('OSRM_POOL_SIZE', '10'))
+# Consecutive failures that open the circuit, and seconds before OSRM is tried again.
+OSRM_FAILURE_THRESHOLD = int(os.environ.get('OSRM_FAILURE_THRESHOLD', '3'))
+OSRM_RESET_TIMEOUT = float(os.environ.get('OSRM_RESET_TIMEOUT', '30'))
+# Files the backend writes at runtime (travel matrix, precomputed trips) live here, outside the source tree.
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.expanduser('~'), '.firefighting-workshop'))
+TRAVEL_MATRIX_PATH = os.environ.get('TRAVEL_MATRIX_PATH', os.path.join(DATA_DIR, 'travel_matrix.bin'))
+DEPOT_LAT = os.environ.get('DEPOT_LAT')
+DEPOT_LONG = os.environ.get('DEPOT_LONG')
+# Python weekday numbers (Monday = 0), Sunday to Thursday by default.
+WORK_WEEKDAYS = os.environ.get('WORK_WEEKDAYS', '6,0,1,2,3')
+# Minutes spent on site per appointment and the default start of a working day.
+SERVICE_MINUTES = float(os.environ.get('SERVICE_MINUTES', '30'))
+DAY_START = os.environ.get('DAY_START', '08:00')
+TRIP_CACHE_SIZE = int(os.environ.get('TRIP_CACHE_SIZE', '2048'))
+TRIP_CACHE_TTL = float(os.environ.get('TRIP_CACHE_TTL', '900'))
+PRECOMPUTED_TRIPS_DIR = os.environ.get('PRECOMPUTED_TRIPS_DIR', os.path.join(DATA_DIR, 'precomputed_trips'))
+# Time of day (HH:MM) to precompute the next day's trips in-process, unset to rely on the command line job.
+PRECOMPUTE_AT = os.environ.get('PRECOMPUTE_AT')
+# Seconds before the open-appointments spatial index of a day is re-synced with the database.
+NEARBY_INDEX_TTL = float(os.environ.get('NEARBY_INDEX_TTL', '60'))
+# Largest radius_km /nearbyOpenAppointments accepts.
+NEARBY_MAX_RADIUS_KM = float(os.environ.get('NEARBY_MAX_RADIUS_KM', '200'))
+# Read compacted report visits back from the change log (see compact_reports.py).
+REPORT_HISTORY = os.environ.get('REPORT_HISTORY', '0') == '1'
+# Latest visits per client that compaction leaves as full rows.
+REPORT_HISTORY_KEEP_VISITS = int(os.environ.get('REPORT_HISTORY_KEEP_VISITS', '1'))
+# Look up report dates older than the archive cutoff in the archive tables (see archive_reports.py).
+REPORT_ARCHIVE = os.environ.get('REPORT_ARCHIVE', '0') == '1'
+# Seconds between re-reads of the archive cutoffs.
+REPORT_ARCHIVE_REFRESH = float(os.environ.get('REPORT_ARCHIVE_REFRESH', '60'))
+# Appointments per UPDATE statement in /assignExecutiveEmployee.
+ASSIGN_BATCH_SIZE = int(os.environ.get('ASSIGN_BATCH_SIZE', '500'))
+# Longest date range /appointmentCalendar answers in one call.
+CALENDAR_MAX_DAYS = int(os.environ.get('CALENDAR_MAX_DAYS', '366'))
+# Months of appointment counts/rows kept in memory.
+CALENDAR_CACHE_MONTHS = int(os.environ.get('CALENDAR_CACHE_MONTHS', '48'))
+# Seconds /allEquipments and /allMeintenanceOps answer from memory before checksumming the tables again.
+CATALOG_CHECK_INTERVAL = float(os.environ.get('CATALOG_CHECK_INTERVAL', '300'))
+# Most matches /searchEquipment returns per call.
+EQUIPMENT_SEARCH_MAX_LIMIT = int(os.environ.get('EQUIPMENT_SEARCH_MAX_LIMIT', '50'))
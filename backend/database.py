@@ -0,0 +1,29 @@
+import logging
+
+import mysql.connector
+from flask import g, has_request_context
+
+from config import db_config, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PING_AFTER
+from db_pool import DBPool
+
+logger = logging.getLogger(__name__)
+
+# Connections are only opened on first use.
+connection_pool = DBPool(DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PING_AFTER, **db_config)
+
+
+# Set a connection to the database.
+# Inside a request the same connection is handed out to every helper and goes back to the pool when the request ends.
+def get_db_connection():
+    if has_request_context() and 'db_conn' in g:
+        return g.db_conn
+    try:
+        conn = connection_pool.get_connection()
+    except mysql.connector.Error as err:
+        logger.error("Error: Could not connect to MySQL database.")
+        logger.error(err)
+        return None
+    if has_request_context():
+        conn.keep_open = True
+        g.db_conn = conn
+    return conn
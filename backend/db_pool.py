@@ -0,0 +1,187 @@
+import threading
+import weakref
+from collections import deque
+from time import monotonic, perf_counter
+
+import mysql.connector
+
+
+class PoolExhausted(mysql.connector.Error):
+    pass
+
+
+class PooledConnection:
+    """Connection checked out of a DBPool, close() hands it back instead of closing it.
+
+    Cursors are buffered by default, so a connection shared by several
+    queries of one request never trips over unread result sets.
+    """
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._prepared = pool._prepared.setdefault(conn, {})
+        self.created_at = created_at
+        self.keep_open = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('buffered', True)
+        return self._conn.cursor(*args, **kwargs)
+
+    def prepared_cursor(self, sql):
+        """Server-side prepared cursor for sql, kept for as long as the underlying connection lives."""
+        cursor = self._prepared.get(sql)
+        if cursor is None:
+            cursor = self._conn.cursor(prepared=True)
+            self._prepared[sql] = cursor
+        return cursor
+
+    def discard_prepared(self, sql):
+        cursor = self._prepared.pop(sql, None)
+        if cursor is not None:
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass
+
+    def close(self):
+        # The request-scoped connection stays checked out until the request ends.
+        if not self.keep_open:
+            self.release()
+
+    def release(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool._put(self)
+
+
+class DBPool:
+    """Bounded MySQL connection pool that waits for a free connection instead of failing.
+
+    get_connection() blocks up to timeout seconds while all size
+    connections are in use and raises PoolExhausted after that.
+    Connections idle for longer than ping_after seconds are pinged
+    (and reconnected) before being handed out, connections older than
+    recycle seconds are replaced.
+    """
+
+    def __init__(self, size=10, timeout=5.0, recycle=3600.0, ping_after=30.0, **db_config):
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self.db_config = db_config
+        self._idle = deque()
+        self._open = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._latencies = deque(maxlen=256)
+        # connection -> {sql: prepared cursor}
+        self._prepared = weakref.WeakKeyDictionary()
+        self.counters = {'checkouts': 0, 'created': 0, 'recycled': 0, 'reconnects': 0, 'exhausted': 0}
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.db_config)
+        with self._cond:
+            self.counters['created'] += 1
+        return conn, monotonic()
+
+    def get_connection(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = perf_counter()
+        deadline = monotonic() + timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        self.counters['exhausted'] += 1
+                        raise PoolExhausted(msg=f"No database connection free after {timeout:g} seconds")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            if self._idle:
+                entry = self._idle.pop()
+            else:
+                entry = None
+                self._open += 1
+
+        try:
+            if entry is None:
+                conn, created_at = self._connect()
+            else:
+                conn, created_at = self._check(*entry)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self.counters['checkouts'] += 1
+            self._latencies.append((perf_counter() - started) * 1000)
+            return PooledConnection(self, conn, created_at)
+
+    def _check(self, conn, created_at, last_used):
+        now = monotonic()
+        if self.recycle and now - created_at >= self.recycle:
+            self._close_quietly(conn)
+            with self._cond:
+                self.counters['recycled'] += 1
+            return self._connect()
+        if now - last_used >= self.ping_after:
+            try:
+                conn.ping(reconnect=False)
+            except mysql.connector.Error:
+                self._close_quietly(conn)
+                with self._cond:
+                    self.counters['reconnects'] += 1
+                return self._connect()
+        return conn, created_at
+
+    def _put(self, pooled):
+        conn = pooled._conn
+        try:
+            # Ends whatever transaction the borrower left open.
+            conn.rollback()
+            healthy = True
+        except mysql.connector.Error:
+            self._close_quietly(conn)
+            healthy = False
+        with self._cond:
+            if healthy:
+                self._idle.append((conn, pooled.created_at, monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except mysql.connector.Error:
+            pass
+
+    def stats(self):
+        with self._cond:
+            latencies = sorted(self._latencies)
+            stats = dict(self.counters)
+            stats.update({
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._open - len(self._idle),
+                'idle': len(self._idle),
+                'waiting': self._waiting
+            })
+        if latencies:
+            stats['checkout_ms'] = {
+                'avg': round(sum(latencies) / len(latencies), 2),
+                'p50': round(latencies[len(latencies) // 2], 2),
+                'p95': round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 2),
+                'max': round(latencies[-1], 2)
+            }
+        return stats
@@ -0,0 +1,164 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left
+
+# How much a match in each field counts towards an item's score.
+FIELD_WEIGHTS = {'eqp_cat_number': 3.0, 'eqp_name': 2.0, 'eqp_type': 1.0, 'eqp_manufacturer': 1.0}
+# Match quality of a query word against a catalog word.
+EXACT, PREFIX, SUBSTRING, FUZZY = 1.0, 0.8, 0.6, 0.5
+# Share of a query word's trigrams a catalog word must contain to count as a fuzzy match.
+MIN_GRAM_RATIO = 0.5
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def _words(text):
+    return _WORD.findall(str(text or '').lower())
+
+
+def _grams(word):
+    padded = f' {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class EquipmentSearch:
+    """Prefix and typo tolerant search over the equipment catalog, from in-memory indexes.
+
+    The catalog is indexed by word: every distinct word maps to the items
+    (per field) containing it. Query words are matched against the sorted
+    vocabulary for exact words and prefixes, and against a trigram index
+    of the vocabulary for substrings and typos, so the work per query
+    depends on the matching words and not on the catalog size. Items must
+    match every query word; they are ranked by match quality weighted by
+    field (catalog number, then name, then type and manufacturer).
+
+    sync() only re-indexes the items that were added, changed or removed
+    since the last catalog version.
+    """
+
+    def __init__(self):
+        self.version = None
+        # eqp_cat_number -> (row, {field: set of words})
+        self._items = {}
+        # word -> {field: set of eqp_cat_number}
+        self._postings = {}
+        # trigram -> set of words
+        self._grams = {}
+        self._sorted_words = []
+        self._by_name = []
+        self._lock = threading.Lock()
+
+    def _index(self, key, row):
+        fields = {}
+        for field in FIELD_WEIGHTS:
+            fields[field] = set(_words(row.get(field)))
+            for word in fields[field]:
+                postings = self._postings.get(word)
+                if postings is None:
+                    postings = self._postings[word] = {}
+                    for gram in _grams(word):
+                        self._grams.setdefault(gram, set()).add(word)
+                postings.setdefault(field, set()).add(key)
+        self._items[key] = (row, fields)
+
+    def _unindex(self, key):
+        _, fields = self._items.pop(key)
+        for field, words in fields.items():
+            for word in words:
+                postings = self._postings[word]
+                postings[field].discard(key)
+                if not postings[field]:
+                    del postings[field]
+                if not postings:
+                    del self._postings[word]
+                    for gram in _grams(word):
+                        self._grams[gram].discard(word)
+                        if not self._grams[gram]:
+                            del self._grams[gram]
+
+    def sync(self, rows, version):
+        """Update the index to the catalog rows of version. Returns the number of items re-indexed."""
+        with self._lock:
+            if version is not None and version == self.version:
+                return 0
+            current = {row['eqp_cat_number']: row for row in rows}
+            changed = 0
+            for key in [key for key in self._items if key not in current]:
+                self._unindex(key)
+                changed += 1
+            for key, row in current.items():
+                item = self._items.get(key)
+                if item is not None:
+                    if item[0] == row:
+                        continue
+                    self._unindex(key)
+                self._index(key, row)
+                changed += 1
+            if changed or self.version is None:
+                self._sorted_words = sorted(self._postings)
+                self._by_name = sorted(self._items, key=lambda key: str(self._items[key][0].get('eqp_name') or '').lower())
+            self.version = version
+            return changed
+
+    def _matching_words(self, word):
+        # {catalog word: match quality} for one query word.
+        matches = {}
+        index = bisect_left(self._sorted_words, word)
+        while index < len(self._sorted_words) and self._sorted_words[index].startswith(word):
+            candidate = self._sorted_words[index]
+            matches[candidate] = EXACT if candidate == word else PREFIX
+            index += 1
+        if len(word) < 3:
+            return matches
+
+        # No trailing pad: the query word may be only the start of a catalog word.
+        padded = f' {word}'
+        grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+        hits = {}
+        for gram in grams:
+            for candidate in self._grams.get(gram, ()):
+                hits[candidate] = hits.get(candidate, 0) + 1
+        for candidate, count in hits.items():
+            if candidate in matches:
+                continue
+            if word in candidate:
+                matches[candidate] = SUBSTRING
+            elif count >= len(grams) * MIN_GRAM_RATIO:
+                matches[candidate] = FUZZY * count / len(grams)
+        return matches
+
+    def search(self, query, limit=10):
+        """Up to limit catalog rows best matching query, best first. An empty query lists the catalog by name."""
+        words = _words(query)
+        with self._lock:
+            if not words:
+                return [self._items[key][0] for key in self._by_name[:limit]]
+
+            matches = [self._matching_words(word) for word in dict.fromkeys(words)]
+            # Most selective word first, later words then only score the items still in the running.
+            matches.sort(key=lambda word_matches: sum(len(keys) for word in word_matches for keys in self._postings[word].values()))
+            totals = None
+            for word_matches in matches:
+                scores = {}
+                for candidate, quality in word_matches.items():
+                    for field, keys in self._postings[candidate].items():
+                        if totals is not None and len(keys) > len(totals):
+                            keys = [key for key in totals if key in keys]
+                        score = FIELD_WEIGHTS[field] * quality
+                        for key in keys:
+                            if score > scores.get(key, 0.0):
+                                scores[key] = score
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {key: total + scores[key] for key, total in totals.items() if key in scores}
+                if not totals:
+                    return []
+
+            best = heapq.nsmallest(limit, ((-score, key) for key, score in totals.items()))
+            return [self._items[key][0] for _, key in best]
+
+    def stats(self):
+        with self._lock:
+            return {'version': self.version, 'items': len(self._items), 'words': len(self._postings)}
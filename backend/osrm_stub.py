@@ -0,0 +1,72 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+# Minimal stand-in for the OSRM trip service, to exercise the routing client locally:
+#   python osrm_stub.py --port 5001 --delay 0.5 --fail-rate 0.2
+#   OSRM_TRIP_URL=http://127.0.0.1:5001/trip/v1/driving/ OSRM_REFINE=1 python api_handler.py
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    fail_rate = 0.0
+    # (status, body) to answer every trip request with instead of a computed trip, set by tests.
+    response = None
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if not path.startswith('/trip/v1/driving/'):
+            self.reply(404, {'code': 'InvalidUrl', 'message': 'Unknown endpoint'})
+            return
+
+        time.sleep(self.delay)
+        if self.response is not None:
+            self.reply(*self.response)
+            return
+        if random.random() < self.fail_rate:
+            self.reply(400, {'code': 'NoTrips', 'message': 'Stub failure'})
+            return
+
+        coordinates = path[len('/trip/v1/driving/'):].split(';')
+        # Keep the start first and visit the remaining waypoints in reverse, so the order is visibly OSRM's.
+        order = [0] + list(range(len(coordinates) - 1, 0, -1))
+        waypoints = [{'waypoint_index': order.index(i), 'location': coordinates[i].split(',')} for i in range(len(coordinates))]
+        self.reply(200, {'code': 'Ok', 'waypoints': waypoints, 'trips': []})
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=0):
+    """Start the stub on a background thread, returning the server (server_address holds the port)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OSRM trip service stub.')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before answering.')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of requests answered with an error.')
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    StubHandler.fail_rate = args.fail_rate
+    ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import calendar
+import datetime
+import random
+from math import cos, radians
+
+
+def project(points):
+    # Equirectangular projection around the mean latitude, good enough at country scale.
+    if not points:
+        return []
+    lat0 = radians(sum(lat for lat, _ in points) / len(points))
+    scale = cos(lat0)
+    return [(lon * scale, lat) for lat, lon in points]
+
+
+def squared_distance(a, b):
+    dx = a[0] - b[0]
+    dy = a[1] - b[1]
+    return dx * dx + dy * dy
+
+
+def kmeans_plus_plus(xy, k, rng):
+    centers = [xy[rng.randrange(len(xy))]]
+    nearest = [squared_distance(p, centers[0]) for p in xy]
+    while len(centers) < k:
+        total = sum(nearest)
+        if total == 0:
+            centers.append(xy[rng.randrange(len(xy))])
+            continue
+        target = rng.random() * total
+        acc = 0.0
+        for i, d in enumerate(nearest):
+            acc += d
+            if acc >= target:
+                break
+        centers.append(xy[i])
+        nearest = [min(d, squared_distance(p, xy[i])) for p, d in zip(xy, nearest)]
+    return centers
+
+
+def capacitated_kmeans(xy, k, capacities, fixed=None, iterations=20, seed=0):
+    """Cluster projected points into k groups limited by capacities.
+
+    fixed maps cluster index to the projected points already bound to that
+    cluster; they pull its centre but are not reassigned. Returns a list
+    with the cluster index of every point in xy.
+    """
+    fixed = fixed or {}
+    if not xy:
+        return []
+    if sum(capacities) < len(xy):
+        raise ValueError("Not enough capacity for all appointments")
+
+    rng = random.Random(seed)
+    seeds = kmeans_plus_plus(xy, k, rng)
+    centers = []
+    for c in range(k):
+        anchors = fixed.get(c)
+        if anchors:
+            centers.append((sum(x for x, _ in anchors) / len(anchors), sum(y for _, y in anchors) / len(anchors)))
+        else:
+            centers.append(seeds[c])
+
+    labels = [None] * len(xy)
+    for _ in range(iterations):
+        # Points with the most to lose from a second choice pick their centre first.
+        open_centers = [c for c in range(k) if capacities[c] > 0]
+        choices = []
+        for i, p in enumerate(xy):
+            ranked = sorted((squared_distance(p, centers[c]), c) for c in open_centers)
+            regret = ranked[1][0] - ranked[0][0] if len(ranked) > 1 else 0.0
+            choices.append((-regret, i, ranked))
+        choices.sort(key=lambda item: item[0])
+        room = list(capacities)
+        new_labels = [None] * len(xy)
+        for _, i, ranked in choices:
+            for _, c in ranked:
+                if room[c] > 0:
+                    new_labels[i] = c
+                    room[c] -= 1
+                    break
+        if new_labels == labels:
+            break
+        labels = new_labels
+
+        sums = [[0.0, 0.0, 0] for _ in range(k)]
+        for c, anchors in fixed.items():
+            for x, y in anchors:
+                sums[c][0] += x
+                sums[c][1] += y
+                sums[c][2] += 1
+        for p, c in zip(xy, labels):
+            sums[c][0] += p[0]
+            sums[c][1] += p[1]
+            sums[c][2] += 1
+        centers = [(sx / count, sy / count) if count else centers[c] for c, (sx, sy, count) in enumerate(sums)]
+
+    return labels
+
+
+def working_days(year, month, weekdays):
+    days_in_month = calendar.monthrange(year, month)[1]
+    days = [datetime.date(year, month, day) for day in range(1, days_in_month + 1)]
+    return [day for day in days if day.weekday() in weekdays]
+
+
+def plan_month(days, movable, fixed, max_per_day=None):
+    """Spread movable appointments over days by location.
+
+    days is a list of dates, movable a list of (key, point) and fixed a list
+    of (date, point) for appointments that keep their date. Returns a dict
+    of key -> proposed date.
+    """
+    if not movable:
+        return {}
+    if not days:
+        raise ValueError("No working days to plan")
+
+    total = len(movable) + len(fixed)
+    if max_per_day is None:
+        max_per_day = -(-total // len(days))
+
+    day_index = {day: c for c, day in enumerate(days)}
+    xy = project([point for _, point in movable] + [point for _, point in fixed])
+    movable_xy, fixed_xy = xy[:len(movable)], xy[len(movable):]
+
+    anchors = {}
+    for (day, _), p in zip(fixed, fixed_xy):
+        if day in day_index:
+            anchors.setdefault(day_index[day], []).append(p)
+    capacities = [max(max_per_day - len(anchors.get(c, [])), 0) for c in range(len(days))]
+
+    labels = capacitated_kmeans(movable_xy, len(days), capacities, anchors)
+    return {key: days[c] for (key, _), c in zip(movable, labels)}
@@ -0,0 +1,24 @@
+import argparse
+import datetime
+import sys
+
+from trip_planning import precompute_day_trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute every employee's ordered trip for a day.")
+    parser.add_argument('--date', help='Day to plan as YYYY-MM-DD, tomorrow by default.')
+    args = parser.parse_args()
+
+    apt_date = args.date or (datetime.date.today() + datetime.timedelta(days=1)).strftime('%Y-%m-%d')
+    count, error = precompute_day_trips(apt_date)
+    if error:
+        print(f"Trip precomputation for {apt_date} failed: {error}")
+        return 1
+
+    print(f"Precomputed {count} trips for {apt_date}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
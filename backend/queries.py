@@ -0,0 +1,244 @@
+import threading
+from time import perf_counter
+
+import mysql.connector
+
+CLIENT_COLUMNS = (
+    'client_id', 'client_name', 'client_city', 'client_street', 'client_street_number',
+    'client_rep', 'client_lat', 'client_long'
+)
+REP_COLUMNS = ('rep_id', 'rep_firstname', 'rep_lastname', 'rep_phone')
+APPOINTMENT_COLUMNS = ('apt_date', 'apt_client', 'apt_emp_executive', 'apt_status')
+EQUIPMENT_COLUMNS = ('eqp_cat_number', 'eqp_name', 'eqp_type', 'eqp_manufacturer')
+MAINTENANCE_OP_COLUMNS = ('mop_id', 'mop_desc')
+REPORTED_EQUIPMENT_COLUMNS = (
+    'reqp_id', 'reqp_date', 'reqp_client', 'reqp_details', 'reqp_location', 'reqp_belongs_cabinet',
+    'reqp_is_new', 'reqp_in_use', 'reqp_pressure_test_year', 'reqp_maintenance_ops', 'reqp_fix_desc',
+    'reqp_future_treatment', 'reqp_remarks'
+)
+REPORTED_CABINET_COLUMNS = (
+    'rcab_id', 'rcab_date', 'rcab_client', 'rcab_location', 'rcab_rollers', 'rcab_nozzle2s', 'rcab_hoses',
+    'rcab_firehydrants', 'rcab_firecabinets', 'rcab_new_hoses', 'rcab_new_rollers', 'rcab_new_nozzle2s',
+    'rcab_new_nozzle1s', 'rcab_new_firehydrants', 'rcab_roller_standard', 'rcab_fix_desc', 'rcab_remarks'
+)
+
+
+def columns_sql(columns, prefix=''):
+    return ', '.join(prefix + column for column in columns)
+
+
+class Statement:
+    """Named SQL statement whose result rows come back in the order of columns."""
+
+    __slots__ = ('name', 'sql', 'columns')
+
+    def __init__(self, name, sql, columns=()):
+        self.name = name
+        self.sql = ' '.join(sql.split())
+        self.columns = tuple(columns)
+
+
+STATEMENTS = {}
+
+
+def statement(name, sql, columns=()):
+    STATEMENTS[name] = Statement(name, sql, columns)
+
+
+statement('client_by_id', f"""
+    SELECT {columns_sql(CLIENT_COLUMNS)} FROM Client WHERE client_id = %s
+""", CLIENT_COLUMNS)
+
+statement('rep_by_id', f"""
+    SELECT {columns_sql(REP_COLUMNS)} FROM ClientRepresentative WHERE rep_id = %s
+""", REP_COLUMNS)
+
+statement('client_contact', """
+    SELECT c.client_id, c.client_rep, r.rep_firstname, r.rep_lastname, r.rep_phone
+    FROM Client c
+    LEFT JOIN ClientRepresentative r ON c.client_rep = r.rep_id
+    WHERE c.client_id = %s
+""", ('client_id', 'client_rep', 'rep_firstname', 'rep_lastname', 'rep_phone'))
+
+# Date ranges are half open, [start, end), so an index on apt_date can serve them.
+statement('appointments_in_range', f"""
+    SELECT {columns_sql(APPOINTMENT_COLUMNS)} FROM Appointment WHERE apt_date >= %s AND apt_date < %s
+""", APPOINTMENT_COLUMNS)
+
+statement('appointment_counts_in_range', """
+    SELECT apt_date, COUNT(*) FROM Appointment WHERE apt_date >= %s AND apt_date < %s GROUP BY apt_date
+""", ('apt_date', 'count'))
+
+statement('last_closed_appointment', f"""
+    SELECT {columns_sql(APPOINTMENT_COLUMNS)} FROM Appointment
+    WHERE apt_client = %s AND apt_date < CURDATE() AND apt_status = 'closed'
+    ORDER BY apt_date DESC LIMIT 1
+""", APPOINTMENT_COLUMNS)
+
+# Report reads, once against the hot tables and once (suffix _archive) against the archive tables.
+REPORT_TABLES = (
+    ('', 'ReportedEquipment', 'ReportedCabinet'),
+    ('_archive', 'ReportedEquipmentArchive', 'ReportedCabinetArchive')
+)
+
+for suffix, equipment_table, cabinet_table in REPORT_TABLES:
+    statement('equipment_reports_in_date' + suffix, f"""
+        SELECT {columns_sql(REPORTED_EQUIPMENT_COLUMNS, 're.')}, e.eqp_name, e.eqp_type, e.eqp_manufacturer
+        FROM {equipment_table} re
+        LEFT JOIN Equipment e ON re.reqp_details = e.eqp_cat_number
+        WHERE re.reqp_date = %s AND re.reqp_client = %s
+    """, REPORTED_EQUIPMENT_COLUMNS + ('eqp_name', 'eqp_type', 'eqp_manufacturer'))
+
+    statement('cabinet_reports_in_date' + suffix, f"""
+        SELECT {columns_sql(REPORTED_CABINET_COLUMNS)} FROM {cabinet_table} WHERE rcab_date = %s AND rcab_client = %s
+    """, REPORTED_CABINET_COLUMNS)
+
+    # The client's latest visit in one round trip. With the REPORT_INDEXES below the MAX() reads the
+    # client's index range backwards and stops at the first in-use entry, and the outer rows come from
+    # the same range. Check with bench_latest_reports.py, which prints the plans.
+    statement('latest_equipment_reports' + suffix, f"""
+        SELECT {columns_sql(REPORTED_EQUIPMENT_COLUMNS, 're.')} FROM {equipment_table} re
+        JOIN (
+            SELECT MAX(reqp_date) AS latest_date FROM {equipment_table} WHERE reqp_client = %s AND reqp_in_use = 1
+        ) latest ON re.reqp_date = latest.latest_date
+        WHERE re.reqp_client = %s AND re.reqp_in_use = 1
+    """, REPORTED_EQUIPMENT_COLUMNS)
+
+    statement('latest_cabinet_reports' + suffix, f"""
+        SELECT {columns_sql(REPORTED_CABINET_COLUMNS, 'rc.')} FROM {cabinet_table} rc
+        JOIN (
+            SELECT MAX(rcab_date) AS latest_date FROM {cabinet_table} WHERE rcab_client = %s
+        ) latest ON rc.rcab_date = latest.latest_date
+        WHERE rc.rcab_client = %s
+    """, REPORTED_CABINET_COLUMNS)
+
+    # Copy the client's last visit to a new date in one statement, unless that date already has reports.
+    # New visits always go to the hot tables, whichever table the last visit is read from.
+    statement('copy_latest_equipment_reports' + suffix, f"""
+        INSERT INTO ReportedEquipment (reqp_id, reqp_date, reqp_client, reqp_details, reqp_location, reqp_belongs_cabinet, reqp_pressure_test_year)
+        SELECT re.reqp_id, %s, re.reqp_client, re.reqp_details, re.reqp_location, re.reqp_belongs_cabinet, re.reqp_pressure_test_year
+        FROM {equipment_table} re
+        JOIN (
+            SELECT MAX(reqp_date) AS latest_date FROM {equipment_table} WHERE reqp_client = %s AND reqp_in_use = 1
+        ) latest ON re.reqp_date = latest.latest_date
+        WHERE re.reqp_client = %s AND re.reqp_in_use = 1
+        AND NOT EXISTS (SELECT 1 FROM ReportedEquipment done WHERE done.reqp_date = %s AND done.reqp_client = %s)
+    """)
+
+    statement('copy_latest_cabinet_reports' + suffix, f"""
+        INSERT INTO ReportedCabinet (rcab_id, rcab_date, rcab_client, rcab_location, rcab_rollers, rcab_nozzle2s, rcab_hoses, rcab_firehydrants, rcab_firecabinets)
+        SELECT rc.rcab_id, %s, rc.rcab_client, rc.rcab_location, rc.rcab_rollers, rc.rcab_nozzle2s, rc.rcab_hoses, rc.rcab_firehydrants, rc.rcab_firecabinets
+        FROM {cabinet_table} rc
+        JOIN (
+            SELECT MAX(rcab_date) AS latest_date FROM {cabinet_table} WHERE rcab_client = %s
+        ) latest ON rc.rcab_date = latest.latest_date
+        WHERE rc.rcab_client = %s
+        AND NOT EXISTS (SELECT 1 FROM ReportedCabinet done WHERE done.rcab_date = %s AND done.rcab_client = %s)
+    """)
+
+# (table, index name, columns) the report lookups above depend on. The archive tables are created
+# LIKE the hot ones, so they carry the indexes too when these exist before the first archive run.
+REPORT_INDEXES = tuple(
+    index
+    for _, equipment_table, cabinet_table in REPORT_TABLES
+    for index in (
+        (equipment_table, 'idx_reqp_client_date', ('reqp_client', 'reqp_date', 'reqp_in_use')),
+        (cabinet_table, 'idx_rcab_client_date', ('rcab_client', 'rcab_date'))
+    )
+)
+
+
+statement('all_equipment', f"""
+    SELECT {columns_sql(EQUIPMENT_COLUMNS)} FROM Equipment
+""", EQUIPMENT_COLUMNS)
+
+statement('all_maintenance_ops', f"""
+    SELECT {columns_sql(MAINTENANCE_OP_COLUMNS)} FROM MaintenanceOperations
+""", MAINTENANCE_OP_COLUMNS)
+
+
+class QueryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, elapsed_ms, rows, failed=False):
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = {'calls': 0, 'errors': 0, 'rows': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            entry['calls'] += 1
+            entry['rows'] += rows
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            if failed:
+                entry['errors'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = {name: dict(entry) for name, entry in self._stats.items()}
+        for entry in stats.values():
+            entry['avg_ms'] = round(entry['total_ms'] / entry['calls'], 3)
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+        return stats
+
+
+query_stats = QueryStats()
+
+
+def _run(conn, name, params, fetch=True):
+    stmt = STATEMENTS[name]
+    started = perf_counter()
+    try:
+        cursor = conn.prepared_cursor(stmt.sql)
+        cursor.execute(stmt.sql, tuple(params))
+        rows = cursor.fetchall() if fetch else cursor.rowcount
+    except mysql.connector.Error:
+        conn.discard_prepared(stmt.sql)
+        query_stats.record(name, (perf_counter() - started) * 1000, 0, failed=True)
+        raise
+    query_stats.record(name, (perf_counter() - started) * 1000, len(rows) if fetch else rows)
+    return stmt.columns, rows
+
+
+def fetch_all(conn, name, params=()):
+    """Rows of the named statement as dicts keyed by its columns."""
+    columns, rows = _run(conn, name, params)
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def fetch_one(conn, name, params=()):
+    columns, rows = _run(conn, name, params)
+    return dict(zip(columns, rows[0])) if rows else None
+
+
+def execute(conn, name, params=()):
+    """Run a named write statement, returning the affected row count. The caller commits."""
+    _, rowcount = _run(conn, name, params, fetch=False)
+    return rowcount
+
+
+def missing_indexes(conn, indexes=REPORT_INDEXES):
+    """The entries of indexes whose table exists but has no index by that name."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE()")
+        present = {(table, name) for table, name in cur.fetchall()}
+        cur.execute("SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()")
+        tables = {row[0] for row in cur.fetchall()}
+    finally:
+        cur.close()
+    return [index for index in indexes if index[0] in tables and index[:2] not in present]
+
+
+def create_indexes(conn, indexes=REPORT_INDEXES):
+    """Add the missing indexes, returning the ones created. DDL commits, so run it outside a transaction."""
+    created = missing_indexes(conn, indexes)
+    cur = conn.cursor()
+    try:
+        for table, name, columns in created:
+            cur.execute(f"ALTER TABLE {table} ADD INDEX {name} ({', '.join(columns)})")
+    finally:
+        cur.close()
+    return created
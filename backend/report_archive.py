@@ -0,0 +1,120 @@
+import datetime
+import threading
+from time import monotonic, sleep
+
+import mysql.connector
+from mysql.connector import errorcode
+
+# Hot report table -> (archive table, date column). Visits older than the archive cutoff live in
+# the archive table, so the hot tables and their indexes only hold the last year or so.
+ARCHIVE_TABLES = {
+    'ReportedEquipment': ('ReportedEquipmentArchive', 'reqp_date'),
+    'ReportedCabinet': ('ReportedCabinetArchive', 'rcab_date')
+}
+
+CREATE_TABLES = (
+    "CREATE TABLE IF NOT EXISTS ReportedEquipmentArchive LIKE ReportedEquipment",
+    "CREATE TABLE IF NOT EXISTS ReportedCabinetArchive LIKE ReportedCabinet",
+    """
+    CREATE TABLE IF NOT EXISTS ReportArchive (
+        table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+        archived_before DATE NOT NULL
+    )
+    """
+)
+
+
+def create_tables(conn):
+    cur = conn.cursor()
+    try:
+        for statement in CREATE_TABLES:
+            cur.execute(statement)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def default_cutoff(today=None, keep_years=1):
+    """January 1st keep_years before this year: the current year and keep_years before it stay hot."""
+    today = today or datetime.date.today()
+    return datetime.date(today.year - keep_years, 1, 1)
+
+
+def archive_before(conn, before, tables=ARCHIVE_TABLES, progress=None, wait=0.0):
+    """Move report rows dated before `before` to the archive tables, one transaction per table and date.
+
+    The cutoffs are recorded first. Readers cache them (ArchiveCutoffs), so
+    when a cutoff moves forward no rows are moved until wait seconds later,
+    which should be at least the readers' refresh interval; after that every
+    reader looks for the old dates in the archive too. Returns {table: rows moved}.
+    """
+    moved = {}
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT table_name, archived_before FROM ReportArchive")
+        previous = dict(cur.fetchall())
+        for table in tables:
+            cur.execute(
+                "INSERT INTO ReportArchive (table_name, archived_before) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE archived_before = GREATEST(archived_before, VALUES(archived_before))",
+                (table, before)
+            )
+        conn.commit()
+        if any(previous.get(table) is None or previous[table] < before for table in tables):
+            sleep(wait)
+
+        for table, (archive_table, date_column) in tables.items():
+            cur.execute(f"SELECT DISTINCT {date_column} FROM {table} WHERE {date_column} < %s ORDER BY {date_column}", (before,))
+            moved[table] = 0
+            for (day,) in cur.fetchall():
+                try:
+                    cur.execute(f"INSERT INTO {archive_table} SELECT * FROM {table} WHERE {date_column} = %s", (day,))
+                    cur.execute(f"DELETE FROM {table} WHERE {date_column} = %s", (day,))
+                    count = cur.rowcount
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                moved[table] += count
+                if progress:
+                    progress(table, day, count)
+    finally:
+        cur.close()
+    return moved
+
+
+class ArchiveCutoffs:
+    """Per-table archive cutoff dates, re-read from ReportArchive every refresh seconds."""
+
+    def __init__(self, refresh=60.0):
+        self.refresh = refresh
+        self._cutoffs = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get(self, conn, table):
+        with self._lock:
+            if self._loaded_at is not None and monotonic() - self._loaded_at < self.refresh:
+                return self._cutoffs.get(table)
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT table_name, archived_before FROM ReportArchive")
+            cutoffs = dict(cur.fetchall())
+        except mysql.connector.ProgrammingError as err:
+            # archive_reports.py has not run yet, so nothing is archived.
+            if err.errno != errorcode.ER_NO_SUCH_TABLE:
+                raise
+            cutoffs = {}
+        finally:
+            cur.close()
+        with self._lock:
+            self._cutoffs = cutoffs
+            self._loaded_at = monotonic()
+        return cutoffs.get(table)
+
+    def is_archived(self, conn, table, day):
+        """True when day is before the table's cutoff, so its rows may sit in the archive table."""
+        cutoff = self.get(conn, table)
+        if cutoff is None or day is None:
+            return False
+        return day < cutoff
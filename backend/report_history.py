@@ -0,0 +1,250 @@
+import datetime
+import json
+from decimal import Decimal
+
+from queries import REPORTED_EQUIPMENT_COLUMNS, REPORTED_CABINET_COLUMNS
+
+# Per report kind: the full-row table a visit is written to and its key columns.
+KINDS = {
+    'equipment': {
+        'table': 'ReportedEquipment', 'id': 'reqp_id', 'date': 'reqp_date', 'client': 'reqp_client',
+        'columns': REPORTED_EQUIPMENT_COLUMNS
+    },
+    'cabinet': {
+        'table': 'ReportedCabinet', 'id': 'rcab_id', 'date': 'rcab_date', 'client': 'rcab_client',
+        'columns': REPORTED_CABINET_COLUMNS
+    }
+}
+
+# Older visits are kept as a per-visit change log instead of full copies of the inventory.
+# ReportHistoryVisit lists the compacted visits, ReportHistoryChange holds what each visit added,
+# changed ('set', with the whole item) or removed compared to the visit before it.
+# New visits are still written as full rows, compact_reports.py moves them into the log later.
+CREATE_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS ReportHistoryVisit (
+        client_id INT NOT NULL,
+        kind VARCHAR(16) NOT NULL,
+        report_date DATE NOT NULL,
+        items INT NOT NULL,
+        PRIMARY KEY (client_id, kind, report_date)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ReportHistoryChange (
+        client_id INT NOT NULL,
+        kind VARCHAR(16) NOT NULL,
+        report_date DATE NOT NULL,
+        item_id INT NOT NULL,
+        op ENUM('set', 'remove') NOT NULL,
+        data JSON NULL,
+        PRIMARY KEY (client_id, kind, report_date, item_id)
+    )
+    """
+)
+
+
+def create_tables(conn):
+    cur = conn.cursor()
+    try:
+        for statement in CREATE_TABLES:
+            cur.execute(statement)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def _item_data(kind, row):
+    # Everything but the key columns, which the change log stores on its own.
+    spec = KINDS[kind]
+    keys = (spec['id'], spec['date'], spec['client'])
+    data = {column: row.get(column) for column in spec['columns'] if column not in keys}
+    # Compare and store values the way they come back out of the JSON column.
+    return json.loads(json.dumps(data, default=_encode))
+
+
+# JSON has no Decimal or date types, so those values are stored tagged with their type
+# and turned back into it when a visit is reconstructed, matching the rows of the live table.
+_DECODERS = {
+    'decimal': Decimal,
+    'date': datetime.date.fromisoformat,
+    'datetime': datetime.datetime.fromisoformat,
+    'time': datetime.time.fromisoformat,
+    'timedelta': lambda value: datetime.timedelta(seconds=float(value))
+}
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return {'$type': 'decimal', 'value': str(value)}
+    if isinstance(value, datetime.datetime):
+        return {'$type': 'datetime', 'value': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'$type': 'date', 'value': value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {'$type': 'time', 'value': value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {'$type': 'timedelta', 'value': str(value.total_seconds())}
+    return str(value)
+
+
+def _decode(value):
+    if isinstance(value, dict) and value.keys() == {'$type', 'value'} and value['$type'] in _DECODERS:
+        return _DECODERS[value['$type']](value['value'])
+    return value
+
+
+def diff_visit(kind, previous, current):
+    """Changes turning state previous ({item_id: data}) into the rows of current.
+
+    Returns (changes, state) where changes are (item_id, op, data) tuples
+    and state is the new {item_id: data}.
+    """
+    spec = KINDS[kind]
+    state = {row[spec['id']]: _item_data(kind, row) for row in current}
+    changes = [(item_id, 'remove', None) for item_id in previous if item_id not in state]
+    changes.extend(
+        (item_id, 'set', data) for item_id, data in state.items()
+        if previous.get(item_id) != data
+    )
+    return changes, state
+
+
+def apply_changes(state, changes):
+    for item_id, op, data in changes:
+        if op == 'remove':
+            state.pop(item_id, None)
+        else:
+            state[item_id] = data
+    return state
+
+
+def _load_changes(cur, client_id, kind, until=None):
+    # Changes grouped per visit date, oldest first.
+    sql = "SELECT report_date, item_id, op, data FROM ReportHistoryChange WHERE client_id = %s AND kind = %s"
+    params = [client_id, kind]
+    if until is not None:
+        sql += " AND report_date <= %s"
+        params.append(until)
+    cur.execute(sql + " ORDER BY report_date", params)
+    visits = {}
+    for report_date, item_id, op, data in cur.fetchall():
+        visits.setdefault(report_date, []).append((item_id, op, json.loads(data) if data is not None else None))
+    return visits
+
+
+def compacted_dates(cur, client_id, kind):
+    cur.execute(
+        "SELECT report_date FROM ReportHistoryVisit WHERE client_id = %s AND kind = %s ORDER BY report_date",
+        (client_id, kind)
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def is_compacted(conn, client_id, kind, report_date):
+    """Whether a visit has been moved into the change log. Compacted visits are read-only."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT 1 FROM ReportHistoryVisit WHERE client_id = %s AND kind = %s AND report_date = %s",
+            (client_id, kind, report_date)
+        )
+        return bool(cur.fetchall())
+    finally:
+        cur.close()
+
+
+def reconstruct(conn, client_id, kind, report_date):
+    """Rows of a compacted visit in the shape of the full-row table, or None if it is not in the log."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT report_date FROM ReportHistoryVisit WHERE client_id = %s AND kind = %s AND report_date = %s",
+            (client_id, kind, report_date)
+        )
+        found = cur.fetchall()
+        if not found:
+            return None
+        report_date = found[0][0]
+        visits = _load_changes(cur, client_id, kind, until=report_date)
+    finally:
+        cur.close()
+
+    state = {}
+    for changes in visits.values():
+        apply_changes(state, changes)
+    return rows_from_state(kind, state, client_id, report_date)
+
+
+def rows_from_state(kind, state, client_id, report_date):
+    """Full-table rows of a visit's state ({item_id: data}), with the column types of the live table."""
+    spec = KINDS[kind]
+    rows = []
+    for item_id, data in state.items():
+        row = {column: None for column in spec['columns']}
+        row.update((column, _decode(value)) for column, value in data.items())
+        row.update({spec['id']: item_id, spec['date']: report_date, spec['client']: client_id})
+        rows.append(row)
+    return rows
+
+
+def compact_client(conn, client_id, kind, keep_visits=1):
+    """Move every visit of the client but the latest keep_visits from the full-row table into the change log.
+
+    Runs in one transaction and returns the number of visits compacted.
+    """
+    spec = KINDS[kind]
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute(
+            f"SELECT DISTINCT {spec['date']} AS report_date FROM {spec['table']} WHERE {spec['client']} = %s ORDER BY report_date",
+            (client_id,)
+        )
+        dates = [row['report_date'] for row in cur.fetchall()]
+        dates = dates[:max(len(dates) - keep_visits, 0)]
+        if not dates:
+            return 0
+
+        plain = conn.cursor()
+        try:
+            last_compacted = compacted_dates(plain, client_id, kind)
+            state = {}
+            for changes in _load_changes(plain, client_id, kind).values():
+                apply_changes(state, changes)
+        finally:
+            plain.close()
+
+        compacted = 0
+        columns = ', '.join(spec['columns'])
+        for report_date in dates:
+            if last_compacted and report_date <= last_compacted[-1]:
+                # Visits older than the log can no longer be expressed as changes, leave them alone.
+                continue
+            cur.execute(
+                f"SELECT {columns} FROM {spec['table']} WHERE {spec['client']} = %s AND {spec['date']} = %s",
+                (client_id, report_date)
+            )
+            changes, state = diff_visit(kind, state, cur.fetchall())
+            cur.executemany(
+                "INSERT INTO ReportHistoryChange (client_id, kind, report_date, item_id, op, data) VALUES (%s, %s, %s, %s, %s, %s)",
+                [
+                    (client_id, kind, report_date, item_id, op, json.dumps(data) if data is not None else None)
+                    for item_id, op, data in changes
+                ]
+            )
+            cur.execute(
+                "INSERT INTO ReportHistoryVisit (client_id, kind, report_date, items) VALUES (%s, %s, %s, %s)",
+                (client_id, kind, report_date, len(state))
+            )
+            cur.execute(
+                f"DELETE FROM {spec['table']} WHERE {spec['client']} = %s AND {spec['date']} = %s",
+                (client_id, report_date)
+            )
+            compacted += 1
+        conn.commit()
+        return compacted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
@@ -0,0 +1,322 @@
+from math import radians, sin, cos, asin, sqrt
+from time import perf_counter
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Hard limit for the improvement phase, so a huge day can never stall a request.
+MAX_IMPROVE_SECONDS = 0.05
+
+
+def to_point(lat, lon):
+    # Coordinates arrive from MySQL as Decimal/str, or may be missing entirely.
+    try:
+        return float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+
+
+def haversine_km(a, b):
+    lat1, lon1 = a
+    lat2, lon2 = b
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    h = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(h))
+
+
+def distance_matrix(points):
+    n = len(points)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        row = matrix[i]
+        for j in range(i + 1, n):
+            d = haversine_km(points[i], points[j])
+            row[j] = d
+            matrix[j][i] = d
+    return matrix
+
+
+def path_length(matrix, path):
+    return sum(matrix[path[k]][path[k + 1]] for k in range(len(path) - 1))
+
+
+def nearest_neighbour(matrix, start=0):
+    n = len(matrix)
+    path = [start]
+    unvisited = set(range(n))
+    unvisited.discard(start)
+    current = start
+    while unvisited:
+        row = matrix[current]
+        current = min(unvisited, key=row.__getitem__)
+        unvisited.discard(current)
+        path.append(current)
+    return path
+
+
+def two_opt(matrix, path, deadline, lo=1, hi=None):
+    # Open path: path[0] is the fixed start, the last stop has no return leg.
+    # lo/hi restrict the moves to a window of positions.
+    n = len(path)
+    hi = n if hi is None else min(hi, n)
+    improved = True
+    while improved and perf_counter() < deadline:
+        improved = False
+        for i in range(max(lo, 1), hi - 1):
+            a, b = path[i - 1], path[i]
+            for j in range(i + 1, hi):
+                c = path[j]
+                d = path[j + 1] if j + 1 < n else None
+                before = matrix[a][b] + (matrix[c][d] if d is not None else 0.0)
+                after = matrix[a][c] + (matrix[b][d] if d is not None else 0.0)
+                if after < before - 1e-9:
+                    path[i:j + 1] = reversed(path[i:j + 1])
+                    b = path[i]
+                    improved = True
+    return path
+
+
+def or_opt(matrix, path, deadline, max_segment=3, lo=1, hi=None):
+    # Move chains of up to max_segment consecutive stops to a cheaper position.
+    improved = True
+    while improved and perf_counter() < deadline:
+        improved = False
+        n = len(path)
+        end = n if hi is None else min(hi, n)
+        for seg_len in range(1, max_segment + 1):
+            for i in range(max(lo, 1), end - seg_len + 1):
+                j = i + seg_len - 1
+                prev, first, last = path[i - 1], path[i], path[j]
+                nxt = path[j + 1] if j + 1 < n else None
+                removed = matrix[prev][first] + (matrix[last][nxt] if nxt is not None else 0.0)
+                bridged = matrix[prev][nxt] if nxt is not None else 0.0
+                gain = removed - bridged
+                if gain <= 1e-9:
+                    continue
+                segment = path[i:j + 1]
+                rest = path[:i] + path[j + 1:]
+                best_pos, best_cost = None, gain
+                for k in range(max(lo - 1, 0), min(end, len(rest))):
+                    if k == i - 1:
+                        continue
+                    p = rest[k]
+                    q = rest[k + 1] if k + 1 < len(rest) else None
+                    added = matrix[p][first] + (matrix[last][q] - matrix[p][q] if q is not None else 0.0)
+                    if added < best_cost - 1e-9:
+                        best_pos, best_cost = k, added
+                if best_pos is not None:
+                    path[:] = rest[:best_pos + 1] + segment + rest[best_pos + 1:]
+                    improved = True
+                    break
+            if improved:
+                break
+    return path
+
+
+def improve_path(matrix, path, time_budget=MAX_IMPROVE_SECONDS):
+    deadline = perf_counter() + time_budget
+    while True:
+        length = path_length(matrix, path)
+        two_opt(matrix, path, deadline)
+        or_opt(matrix, path, deadline)
+        if perf_counter() >= deadline or path_length(matrix, path) >= length - 1e-9:
+            return path
+
+
+def solve_open_path(matrix, time_budget=MAX_IMPROVE_SECONDS):
+    """Order the nodes of matrix as a path starting at node 0 (no return leg)."""
+    if len(matrix) <= 2:
+        return list(range(len(matrix)))
+    path = nearest_neighbour(matrix, 0)
+    return improve_path(matrix, path, time_budget)
+
+
+def trip_matrix(start, stops, stop_matrix=None):
+    """Distance matrix with start as node 0 followed by stops.
+
+    stop_matrix, when given, holds precomputed distances between the stops
+    and only the start row is computed here.
+    """
+    if stop_matrix is None:
+        return distance_matrix([start] + stops)
+    start_row = [haversine_km(start, point) for point in stops]
+    matrix = [[0.0] + start_row]
+    for i, row in enumerate(stop_matrix):
+        matrix.append([start_row[i]] + list(row))
+    return matrix
+
+
+def order_stops(start, stops, stop_matrix=None):
+    """Return the indexes of stops in visiting order when leaving from start.
+
+    start is a (lat, lon) tuple and stops a list of (lat, lon) tuples or None.
+    Stops without coordinates cannot be routed and keep their relative order
+    at the end of the trip. stop_matrix may supply precomputed distances
+    between the stops, in which case every stop must have coordinates.
+    """
+    routable = [i for i, point in enumerate(stops) if point is not None]
+    unroutable = [i for i, point in enumerate(stops) if point is None]
+
+    if stop_matrix is not None and unroutable:
+        stop_matrix = None
+    matrix = trip_matrix(start, [stops[i] for i in routable], stop_matrix)
+    path = solve_open_path(matrix)
+
+    return [routable[node - 1] for node in path[1:]] + unroutable
+
+
+def savings_routes(matrix, capacity):
+    # Clarke-Wright savings on node 0 as depot, every route holding at most capacity stops.
+    n = len(matrix)
+    route_of = {i: [i] for i in range(1, n)}
+    savings = sorted(
+        ((matrix[0][i] + matrix[0][j] - matrix[i][j], i, j) for i in range(1, n) for j in range(i + 1, n)),
+        reverse=True,
+    )
+    for saving, i, j in savings:
+        if saving <= 0:
+            break
+        route_i, route_j = route_of[i], route_of[j]
+        if route_i is route_j or len(route_i) + len(route_j) > capacity:
+            continue
+        # Only route ends can be linked.
+        if route_i[0] == i:
+            route_i.reverse()
+        if route_j[-1] == j:
+            route_j.reverse()
+        if route_i[-1] != i or route_j[0] != j:
+            continue
+        route_i.extend(route_j)
+        for node in route_j:
+            route_of[node] = route_i
+    unique = {id(route): route for route in route_of.values()}
+    return list(unique.values())
+
+
+def open_route_length(matrix, route):
+    return path_length(matrix, [0] + route)
+
+
+def cheapest_insertion(matrix, route, node):
+    # Returns (extra distance, position) for inserting node into the open route.
+    path = [0] + route
+    best_cost, best_pos = None, None
+    for k in range(len(path)):
+        p = path[k]
+        q = path[k + 1] if k + 1 < len(path) else None
+        cost = matrix[p][node] + (matrix[node][q] - matrix[p][q] if q is not None else 0.0)
+        if best_cost is None or cost < best_cost:
+            best_cost, best_pos = cost, k
+    return best_cost, best_pos
+
+
+def relocate_between_routes(matrix, routes, capacity, deadline):
+    # Move single stops to another route when that shortens the total drive.
+    improved = True
+    while improved and perf_counter() < deadline:
+        improved = False
+        for source in routes:
+            for idx in range(len(source)):
+                node = source[idx]
+                path = [0] + source
+                prev = path[idx]
+                nxt = path[idx + 2] if idx + 2 < len(path) else None
+                gain = matrix[prev][node] + (matrix[node][nxt] - matrix[prev][nxt] if nxt is not None else 0.0)
+                best = None
+                for target in routes:
+                    if target is source or len(target) >= capacity:
+                        continue
+                    cost, pos = cheapest_insertion(matrix, target, node)
+                    if cost < gain - 1e-9 and (best is None or cost < best[0]):
+                        best = (cost, target, pos)
+                if best is not None:
+                    _, target, pos = best
+                    source.pop(idx)
+                    target.insert(pos, node)
+                    improved = True
+                    break
+            if improved:
+                break
+    return routes
+
+
+def solve_route(matrix, route, deadline):
+    # Re-order a single route's stops as an open path from node 0.
+    if len(route) < 3:
+        return route
+    sub = [0] + route
+    local = [[matrix[a][b] for b in sub] for a in sub]
+    path = improve_path(local, nearest_neighbour(local, 0), max(deadline - perf_counter(), 0.0))
+    return [sub[node] for node in path[1:]]
+
+
+def plan_routes(matrix, vehicles, capacity=None, time_budget=0.5):
+    """Split nodes 1..n of matrix into at most vehicles open routes from node 0.
+
+    Every route holds at most capacity stops (an even split when not given).
+    Returns exactly vehicles lists of node indexes, some possibly empty.
+    """
+    n = len(matrix) - 1
+    if vehicles <= 0:
+        raise ValueError("At least one vehicle is required")
+    if capacity is None:
+        capacity = -(-n // vehicles)
+    if capacity * vehicles < n:
+        raise ValueError("Not enough capacity for all stops")
+    deadline = perf_counter() + time_budget
+
+    routes = savings_routes(matrix, capacity) if n else []
+
+    # Dissolve the shortest routes until they fit the fleet.
+    routes.sort(key=len)
+    while len(routes) > vehicles:
+        extra = routes.pop(0)
+        for node in extra:
+            candidates = [route for route in routes if len(route) < capacity]
+            best = min(
+                ((cheapest_insertion(matrix, route, node), route) for route in candidates),
+                key=lambda item: item[0][0],
+            )
+            (_, pos), route = best
+            route.insert(pos, node)
+    routes.extend([] for _ in range(vehicles - len(routes)))
+
+    routes = [solve_route(matrix, route, deadline) for route in routes]
+    relocate_between_routes(matrix, routes, capacity, deadline)
+    return [solve_route(matrix, route, deadline) for route in routes]
+
+
+def repair_path(matrix, previous, window=5, time_budget=MAX_IMPROVE_SECONDS):
+    """Update a known open path from node 0 after stops were removed or added.
+
+    previous is the old visiting order as node indexes of matrix, with None
+    in place of stops that were removed. Nodes of matrix missing from it are
+    inserted at their cheapest position, then the tour is only improved
+    within window positions around every change, so the cost per event
+    does not depend on the length of the day.
+    """
+    deadline = perf_counter() + time_budget
+    path = [0]
+    touched = set()
+    for node in previous:
+        if node is None:
+            touched.add(path[-1])
+        else:
+            path.append(node)
+    # The start row always changes with the technician's position.
+    if len(path) > 1:
+        touched.add(path[1])
+
+    for node in sorted(set(range(1, len(matrix))) - set(path)):
+        _, pos = cheapest_insertion(matrix, path[1:], node)
+        path.insert(pos + 1, node)
+        touched.add(node)
+
+    for node in touched:
+        if perf_counter() >= deadline:
+            break
+        p = path.index(node)
+        lo, hi = max(p - window, 1), p + window + 1
+        two_opt(matrix, path, deadline, lo, hi)
+        or_opt(matrix, path, deadline, lo=lo, hi=hi)
+    return path
@@ -0,0 +1,148 @@
+import threading
+from collections import deque
+from time import monotonic, perf_counter
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class RoutingUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling a failing service for reset_timeout seconds after failure_threshold consecutive failures.
+
+    Once the timeout passed a single trial call is let through (half-open);
+    its outcome closes the breaker again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = monotonic()
+            self.trial_running = False
+
+
+class RoutingClient:
+    """OSRM trip client with a pooled session, per-call timeout and circuit breaker."""
+
+    def __init__(self, base_url, timeout=3.0, pool_size=10, failure_threshold=3, reset_timeout=30.0):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=256)
+        self.counters = {'calls': 0, 'successes': 0, 'failures': 0, 'timeouts': 0, 'short_circuits': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def trip(self, coordinates):
+        """Visiting order of coordinates ((lon, lat) pairs, first one the fixed start) as waypoint indexes.
+
+        Raises RoutingUnavailable when the call is short-circuited, times
+        out or OSRM answers with an error.
+        """
+        if not self.breaker.allow():
+            self._count('short_circuits')
+            raise RoutingUnavailable("Routing service circuit is open")
+
+        coordinates_str = ';'.join(f'{lon},{lat}' for lon, lat in coordinates)
+        trip_url = f'{self.base_url}{coordinates_str}?source=first&roundtrip=false'
+
+        self._count('calls')
+        started = perf_counter()
+        try:
+            response = self.session.get(trip_url, timeout=self.timeout)
+            order = self._parse_trip(response.json(), len(coordinates))
+        except requests.Timeout as err:
+            self._count('timeouts')
+            self._fail()
+            raise RoutingUnavailable(f"Routing service timed out: {err}")
+        except RoutingUnavailable:
+            self._fail()
+            raise
+        except Exception as err:
+            # Anything else, a malformed body included, still has to settle a half-open trial.
+            self._fail()
+            raise RoutingUnavailable(f"Routing service failed: {err}")
+        finally:
+            with self._lock:
+                self._latencies.append((perf_counter() - started) * 1000)
+
+        self.breaker.record_success()
+        self._count('successes')
+        return order
+
+    @staticmethod
+    def _parse_trip(data, count):
+        if not isinstance(data, dict):
+            raise RoutingUnavailable("Routing service returned a malformed response")
+        if data.get('code') != 'Ok':
+            raise RoutingUnavailable(data.get('message', 'Routing service error'))
+        # Waypoints come back in input order, each with its position in the trip.
+        waypoints = data.get('waypoints')
+        try:
+            order = sorted(range(len(waypoints)), key=lambda i: int(waypoints[i]['waypoint_index']))
+        except (TypeError, KeyError, ValueError):
+            raise RoutingUnavailable("Routing service returned malformed waypoints")
+        if len(order) != count or order[0] != 0:
+            raise RoutingUnavailable("Routing service returned a trip that does not match the request")
+        return order
+
+    def _fail(self):
+        self.breaker.record_failure()
+        self._count('failures')
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counters = dict(self.counters)
+        if latencies:
+            counters['latency_ms'] = {
+                'avg': round(sum(latencies) / len(latencies), 1),
+                'p50': round(latencies[len(latencies) // 2], 1),
+                'p95': round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 1),
+                'max': round(latencies[-1], 1)
+            }
+        counters['circuit'] = self.breaker.state
+        return counters
@@ -0,0 +1,117 @@
+import logging
+import queue
+import threading
+import uuid
+from time import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class SMSQueueFull(Exception):
+    pass
+
+
+class SMSDispatcher:
+    """Sends SMS messages from a bounded queue on a pool of background workers.
+
+    send() returns a message id right away; the HTTP call, retries with
+    exponential backoff and status tracking happen on the workers. While a
+    message to a recipient is still waiting in the queue, a new message to
+    the same recipient replaces its text instead of queueing a second SMS.
+    """
+
+    def __init__(self, url, build_payload, workers=4, queue_size=1000, retries=3, backoff=0.5, timeout=5.0, status_ttl=3600):
+        self.url = url
+        self.build_payload = build_payload
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        # recipient -> message id still waiting in the queue
+        self._pending = {}
+        self._messages = {}
+        self.statuses = LRUCache(maxsize=queue_size * 10, ttl=status_ttl)
+        self._stop = threading.Event()
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def send(self, recipient, text):
+        with self._lock:
+            message_id = self._pending.get(recipient)
+            if message_id is not None:
+                self._messages[message_id] = (recipient, text)
+                return message_id
+
+            message_id = uuid.uuid4().hex
+            self._pending[recipient] = message_id
+            self._messages[message_id] = (recipient, text)
+            self._set_status(message_id, 'queued', attempts=0)
+            try:
+                self._queue.put_nowait(message_id)
+            except queue.Full:
+                del self._pending[recipient]
+                del self._messages[message_id]
+                self.statuses.pop(message_id)
+                raise SMSQueueFull("SMS queue is full")
+        return message_id
+
+    def status(self, message_id):
+        return self.statuses.get(message_id)
+
+    def _set_status(self, message_id, status, **details):
+        self.statuses.set(message_id, dict(details, status=status, updated_at=time()))
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                message_id = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            with self._lock:
+                recipient, text = self._messages.pop(message_id)
+                if self._pending.get(recipient) == message_id:
+                    del self._pending[recipient]
+            try:
+                self._deliver(message_id, recipient, text)
+            except Exception as err:
+                # A bug in one message (e.g. in build_payload) must not take the worker down with it.
+                logger.exception("SMS delivery of %s failed", message_id)
+                self._set_status(message_id, 'failed', error=str(err))
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, message_id, recipient, text):
+        error = None
+        for attempt in range(1, self.retries + 2):
+            self._set_status(message_id, 'sending', attempts=attempt)
+            try:
+                response = self.session.post(self.url, json=self.build_payload(recipient, text), timeout=self.timeout)
+                if response.status_code < 400:
+                    self._set_status(message_id, 'sent', attempts=attempt, response=response.text[:200])
+                    return True
+                error = f"HTTP {response.status_code}"
+                # Client errors will not get better by retrying.
+                if response.status_code < 500 and response.status_code != 429:
+                    break
+            except requests.RequestException as err:
+                error = str(err)
+            if attempt <= self.retries and self._stop.wait(self.backoff * 2 ** (attempt - 1)):
+                break
+        self._set_status(message_id, 'failed', attempts=attempt, error=error)
+        return False
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'statuses': self.statuses.stats()}
+
+    def close(self):
+        self._stop.set()
@@ -0,0 +1,81 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Fake sms4free endpoint, to exercise the SMS dispatcher and measure its throughput locally:
+#   python sms_stub.py --port 5002 --delay 0.2 --fail-rate 0.1
+#   SMS_URL=http://127.0.0.1:5002/ python api_handler.py, then GET http://127.0.0.1:5002/stats
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    fail_rate = 0.0
+    lock = threading.Lock()
+    received = 0
+    failed = 0
+    recipients = {}
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(self.delay)
+
+        with self.lock:
+            if random.random() < self.fail_rate:
+                StubHandler.failed += 1
+                self.reply(500, {'status': 0, 'message': 'Stub failure'})
+                return
+            StubHandler.received += 1
+            recipient = data.get('recipient')
+            StubHandler.recipients[recipient] = StubHandler.recipients.get(recipient, 0) + 1
+        self.reply(200, {'status': 1, 'message': 'Sent'})
+
+    def do_GET(self):
+        with self.lock:
+            self.reply(200, {'received': self.received, 'failed': self.failed, 'recipients': len(self.recipients)})
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def reset():
+    with StubHandler.lock:
+        StubHandler.delay = 0.0
+        StubHandler.fail_rate = 0.0
+        StubHandler.received = 0
+        StubHandler.failed = 0
+        StubHandler.recipients = {}
+
+
+def serve(port=0):
+    """Start the stub on a background thread, returning the server (server_address holds the port)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local fake SMS provider.')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before answering.')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of requests answered with HTTP 500.')
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    StubHandler.fail_rate = args.fail_rate
+    ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
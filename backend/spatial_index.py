@@ -0,0 +1,143 @@
+import heapq
+import threading
+from math import cos, radians, floor, isfinite
+
+from routing import haversine_km
+
+KM_PER_DEGREE = 111.32
+
+
+class GridIndex:
+    """Uniform lat/long grid of keyed points for radius and k-nearest queries.
+
+    Cells are cell_km wide around ref_lat, so a query only visits the few
+    cells its radius overlaps. Points can be added, moved and removed one
+    at a time.
+    """
+
+    def __init__(self, cell_km=5.0, ref_lat=31.5):
+        self.cell_km = cell_km
+        self.lat_step = cell_km / KM_PER_DEGREE
+        self.lon_step = cell_km / (KM_PER_DEGREE * cos(radians(ref_lat)))
+        # Cells get narrower away from ref_lat, keep bounds valid a few degrees north of it.
+        self.min_cell_km = cell_km * cos(radians(ref_lat + 5)) / cos(radians(ref_lat))
+        self._cells = {}
+        self._points = {}
+        self._bounds = None
+        self._lock = threading.RLock()
+
+    def _cell(self, point):
+        return floor(point[0] / self.lat_step), floor(point[1] / self.lon_step)
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def keys(self):
+        with self._lock:
+            return list(self._points)
+
+    def get(self, key):
+        entry = self._points.get(key)
+        return entry[1] if entry else None
+
+    def add(self, key, point, payload=None):
+        with self._lock:
+            if key in self._points:
+                self.remove(key)
+            self._points[key] = (point, payload)
+            cell = self._cell(point)
+            if cell not in self._cells:
+                self._cells[cell] = set()
+                self._bounds = None
+            self._cells[cell].add(key)
+
+    def remove(self, key):
+        with self._lock:
+            entry = self._points.pop(key, None)
+            if entry is None:
+                return False
+            cell = self._cell(entry[0])
+            keys = self._cells.get(cell)
+            keys.discard(key)
+            if not keys:
+                del self._cells[cell]
+                self._bounds = None
+            return True
+
+    def _max_ring(self, center):
+        # Ring radius that covers every occupied cell from center.
+        if self._bounds is None:
+            rows = [i for i, _ in self._cells]
+            cols = [j for _, j in self._cells]
+            self._bounds = (min(rows), max(rows), min(cols), max(cols))
+        min_i, max_i, min_j, max_j = self._bounds
+        return max(abs(center[0] - min_i), abs(center[0] - max_i), abs(center[1] - min_j), abs(center[1] - max_j))
+
+    def _ring(self, center, radius, bounds=None):
+        # Cells at Chebyshev distance radius from center, clipped to bounds when given.
+        ci, cj = center
+        min_i, max_i, min_j, max_j = bounds or (ci - radius, ci + radius, cj - radius, cj + radius)
+        if radius == 0:
+            yield center
+            return
+        rows = range(max(ci - radius, min_i), min(ci + radius, max_i) + 1)
+        for j in (cj - radius, cj + radius):
+            if min_j <= j <= max_j:
+                for i in rows:
+                    yield i, j
+        cols = range(max(cj - radius + 1, min_j), min(cj + radius - 1, max_j) + 1)
+        for i in (ci - radius, ci + radius):
+            if min_i <= i <= max_i:
+                for j in cols:
+                    yield i, j
+
+    def within(self, point, radius_km, limit=None):
+        """(distance_km, key, payload) of points within radius_km, nearest first."""
+        if not isfinite(radius_km) or radius_km < 0:
+            raise ValueError(f"radius_km must be a finite non-negative number, got {radius_km}")
+        with self._lock:
+            if not self._points:
+                return []
+            center = self._cell(point)
+            # Rings past the occupied cells cannot hold anything, however large the radius.
+            rings = min(int(radius_km / self.min_cell_km) + 1, self._max_ring(center))
+            found = []
+            for radius in range(rings + 1):
+                for cell in self._ring(center, radius, self._bounds):
+                    for key in self._cells.get(cell, ()):
+                        stored, payload = self._points[key]
+                        d = haversine_km(point, stored)
+                        if d <= radius_km:
+                            found.append((d, key, payload))
+            found.sort(key=lambda item: item[0])
+            return found[:limit] if limit is not None else found
+
+    def nearest(self, point, k, predicate=None):
+        """(distance_km, key, payload) of the k nearest points accepted by predicate."""
+        with self._lock:
+            if k <= 0 or not self._points:
+                return []
+            center = self._cell(point)
+            heap = []
+            radius = 0
+            max_radius = self._max_ring(center)
+            while radius <= max_radius:
+                for cell in self._ring(center, radius, self._bounds):
+                    for key in self._cells.get(cell, ()):
+                        stored, payload = self._points[key]
+                        if predicate is not None and not predicate(key, payload):
+                            continue
+                        d = haversine_km(point, stored)
+                        item = (-d, key, payload)
+                        if len(heap) < k:
+                            heapq.heappush(heap, item)
+                        elif d < -heap[0][0]:
+                            heapq.heapreplace(heap, item)
+                # Points outside the scanned rings are at least radius cells away.
+                if len(heap) == k and -heap[0][0] <= radius * self.min_cell_km:
+                    break
+                radius += 1
+            return sorted(((-d, key, payload) for d, key, payload in heap), key=lambda item: item[0])
@@ -0,0 +1,63 @@
+import unittest
+from unittest import mock
+
+import cache
+from cache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c')), (1, 3))
+        self.assertEqual(len(lru), 2)
+
+    def test_ttl(self):
+        lru = LRUCache(ttl=10)
+        with mock.patch.object(cache, 'monotonic', return_value=100.0):
+            lru.set('short', 1, ttl=1)
+            lru.set('default', 2)
+        with mock.patch.object(cache, 'monotonic', return_value=105.0):
+            self.assertIsNone(lru.get('short'))
+            self.assertEqual(lru.get('default'), 2)
+        with mock.patch.object(cache, 'monotonic', return_value=110.0):
+            self.assertEqual(lru.get('default', 'gone'), 'gone')
+        self.assertEqual(len(lru), 0)
+
+    def test_invalidate_tag(self):
+        lru = LRUCache()
+        lru.set('trip-1', 1, tags=('emp:1', 'day:2024-03-03'))
+        lru.set('trip-2', 2, tags=('emp:2', 'day:2024-03-03'))
+        lru.set('trip-3', 3, tags=('emp:1',))
+        self.assertEqual(lru.invalidate_tag('emp:1'), 2)
+        self.assertEqual((lru.get('trip-1'), lru.get('trip-2'), lru.get('trip-3')), (None, 2, None))
+        self.assertEqual(lru.invalidate_tag('emp:1'), 0)
+        self.assertEqual(lru.invalidate_tag('day:2024-03-03'), 1)
+        self.assertEqual(len(lru), 0)
+
+    def test_replaced_and_evicted_entries_leave_their_tags(self):
+        lru = LRUCache(maxsize=1)
+        lru.set('a', 1, tags=('old',))
+        lru.set('a', 2, tags=('new',))
+        self.assertEqual(lru.invalidate_tag('old'), 0)
+        lru.set('b', 3, tags=('new',))
+        # 'a' was evicted, only 'b' is left under the tag.
+        self.assertEqual(lru.invalidate_tag('new'), 1)
+
+    def test_pop_and_stats(self):
+        lru = LRUCache(maxsize=4)
+        lru.set('a', 1)
+        self.assertEqual(lru.pop('a'), 1)
+        self.assertIsNone(lru.pop('a'))
+        lru.get('a')
+        lru.set('b', 2)
+        lru.get('b')
+        self.assertEqual(lru.stats(), {'size': 1, 'maxsize': 4, 'hits': 1, 'misses': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
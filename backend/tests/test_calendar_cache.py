@@ -0,0 +1,106 @@
+import datetime
+import unittest
+
+from auth_store import MemoryAuthStore, StoreDict
+from calendar_cache import CalendarCache
+
+DAY = datetime.date(2024, 3, 10)
+
+
+class CalendarCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = CalendarCache(StoreDict(MemoryAuthStore(sweep_interval=0), 'calendar_version'))
+        # The Appointment table.
+        self.db = [
+            {'apt_date': DAY, 'apt_client': 1, 'apt_emp_executive': None, 'apt_status': 'open'}
+        ]
+
+    def query_counts(self):
+        counts = {}
+        for row in self.db:
+            counts[row['apt_date']] = counts.get(row['apt_date'], 0) + 1
+        return counts
+
+    def read(self):
+        """What /appointmentCounts does: serve the cache or load the month from the database."""
+        counts, version = self.cache.counts(2024, 3)
+        if counts is None:
+            self.cache.load_counts(2024, 3, self.query_counts(), version)
+            counts = {day.strftime('%Y-%m-%d'): n for day, n in self.query_counts().items()}
+        return counts
+
+    def make_appointment(self, client_id):
+        """What /makeAppointment does, returning the steps to interleave with a reader."""
+        row = {'apt_date': DAY, 'apt_client': client_id, 'apt_emp_executive': None, 'apt_status': 'open'}
+        write = self.cache.begin(DAY)
+        yield 'begun'
+        self.db.append(row)
+        yield 'committed'
+        self.cache.add(write, row)
+
+    def assert_consistent(self):
+        self.assertEqual(self.read(), {'2024-03-10': len(self.db)})
+        # Served from the cache now, and still right.
+        counts, _ = self.cache.counts(2024, 3)
+        self.assertEqual(counts, {'2024-03-10': len(self.db)})
+
+    def test_cached_month_is_patched_in_place(self):
+        self.read()
+        for _ in self.make_appointment(2):
+            pass
+        misses = self.cache.stats()['misses']
+        self.assert_consistent()
+        self.assertEqual(self.cache.stats()['misses'], misses)
+
+    def test_reader_that_started_before_the_write(self):
+        # The reader gets the version, the writer commits, then the reader queries the new row.
+        counts, version = self.cache.counts(2024, 3)
+        self.assertIsNone(counts)
+        writer = self.make_appointment(2)
+        next(writer)
+        next(writer)
+        self.cache.load_counts(2024, 3, self.query_counts(), version)
+        next(writer, None)
+        self.assert_consistent()
+
+    def test_reader_during_the_write(self):
+        # The reader gets the version bumped by begin(), queries after the commit and caches
+        # before the writer applies its change: the change must not be counted twice.
+        writer = self.make_appointment(2)
+        next(writer)
+        counts, version = self.cache.counts(2024, 3)
+        next(writer)
+        self.cache.load_counts(2024, 3, self.query_counts(), version)
+        next(writer, None)
+        self.assert_consistent()
+
+    def test_reader_during_the_write_before_the_commit(self):
+        writer = self.make_appointment(2)
+        next(writer)
+        self.read()
+        next(writer)
+        next(writer, None)
+        self.assert_consistent()
+
+    def test_concurrent_writers(self):
+        self.read()
+        first, second = self.make_appointment(2), self.make_appointment(3)
+        next(first)
+        next(second)
+        next(first)
+        next(second)
+        next(second, None)
+        next(first, None)
+        self.assert_consistent()
+
+    def test_move_within_a_month(self):
+        self.read()
+        write = self.cache.begin(DAY, DAY + datetime.timedelta(days=1))
+        self.db[0]['apt_date'] = DAY + datetime.timedelta(days=1)
+        self.cache.move(write, DAY, 1, DAY + datetime.timedelta(days=1))
+        counts, _ = self.cache.counts(2024, 3)
+        self.assertEqual(counts, {'2024-03-11': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import random
+import statistics
+import unittest
+from time import perf_counter
+
+from equipment_search import EquipmentSearch
+
+CATALOG = [
+    {'eqp_cat_number': 'EXT-6-POW', 'eqp_name': 'Powder extinguisher 6 kg', 'eqp_type': 'Extinguisher', 'eqp_manufacturer': 'Silvan'},
+    {'eqp_cat_number': 'EXT-2-CO2', 'eqp_name': 'CO2 extinguisher 2 kg', 'eqp_type': 'Extinguisher', 'eqp_manufacturer': 'Silvan'},
+    {'eqp_cat_number': 'HOSE-25', 'eqp_name': 'Fire hose 25 m', 'eqp_type': 'Hose', 'eqp_manufacturer': 'Powertex'},
+    {'eqp_cat_number': 'NOZ-1', 'eqp_name': 'Nozzle 1 inch', 'eqp_type': 'Nozzle', 'eqp_manufacturer': 'Angus'},
+]
+
+
+def cat_numbers(rows):
+    return [row['eqp_cat_number'] for row in rows]
+
+
+def synthetic_catalog(size, seed=7):
+    rng = random.Random(seed)
+    words = ['powder', 'foam', 'water', 'co2', 'hose', 'nozzle', 'roller', 'cabinet', 'hydrant', 'valve', 'sign', 'blanket']
+    makers = ['Silvan', 'Angus', 'Powertex', 'Kidde', 'Amerex', 'Gloria']
+    return [
+        {
+            'eqp_cat_number': f'EQ-{i:05d}',
+            'eqp_name': f'{rng.choice(words)} {rng.choice(words)} {rng.randint(1, 50)}',
+            'eqp_type': rng.choice(words),
+            'eqp_manufacturer': rng.choice(makers)
+        }
+        for i in range(size)
+    ]
+
+
+class EquipmentSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.search = EquipmentSearch()
+        self.search.sync(CATALOG, 'v1')
+
+    def test_every_query_word_must_match(self):
+        self.assertEqual(cat_numbers(self.search.search('extinguisher co2')), ['EXT-2-CO2'])
+        self.assertEqual(self.search.search('extinguisher hose'), [])
+
+    def test_prefix_and_typo_matches(self):
+        self.assertEqual(cat_numbers(self.search.search('noz')), ['NOZ-1'])
+        self.assertEqual(sorted(cat_numbers(self.search.search('extingusher'))), ['EXT-2-CO2', 'EXT-6-POW'])
+        self.assertEqual(cat_numbers(self.search.search('co2 extingusher')), ['EXT-2-CO2'])
+
+    def test_ranking_prefers_exact_words_and_stronger_fields(self):
+        # 'powder' is a word of the name, 'Powertex' only shares a prefix in the manufacturer.
+        self.assertEqual(cat_numbers(self.search.search('pow')), ['EXT-6-POW', 'HOSE-25'])
+        self.assertEqual(cat_numbers(self.search.search('powder')), ['EXT-6-POW'])
+
+    def test_limit_and_empty_query(self):
+        self.assertEqual(len(self.search.search('extinguisher', limit=1)), 1)
+        # No query lists the catalog by name.
+        self.assertEqual(cat_numbers(self.search.search('', limit=2)), ['EXT-2-CO2', 'HOSE-25'])
+
+    def test_sync_reindexes_only_changes(self):
+        self.assertEqual(self.search.sync(CATALOG, 'v1'), 0)
+
+        renamed = dict(CATALOG[3], eqp_name='Jet nozzle 1 inch')
+        rows = CATALOG[1:3] + [renamed, {'eqp_cat_number': 'BLK-1', 'eqp_name': 'Fire blanket', 'eqp_type': 'Blanket', 'eqp_manufacturer': 'Angus'}]
+        # One removed, one changed, one added.
+        self.assertEqual(self.search.sync(rows, 'v2'), 3)
+        self.assertEqual(self.search.search('powder'), [])
+        self.assertEqual(cat_numbers(self.search.search('jet')), ['NOZ-1'])
+        self.assertEqual(cat_numbers(self.search.search('blanket')), ['BLK-1'])
+        self.assertEqual(self.search.stats()['items'], 4)
+
+    def test_sync_matches_a_full_rebuild(self):
+        catalog = synthetic_catalog(500)
+        self.search.sync(catalog, 'a')
+        changed = [dict(row, eqp_name=row['eqp_name'] + ' mk2') if i % 7 == 0 else row for i, row in enumerate(catalog[50:])]
+        self.search.sync(changed, 'b')
+
+        rebuilt = EquipmentSearch()
+        rebuilt.sync(changed, 'b')
+        self.assertEqual(self.search.stats(), rebuilt.stats())
+        for query in ('foam', 'mk2', 'hos', 'nozle', 'kidde valve', ''):
+            self.assertEqual(self.search.search(query, 20), rebuilt.search(query, 20), query)
+
+    def test_large_catalog_ranking_and_limits(self):
+        catalog = synthetic_catalog(5000)
+        search = EquipmentSearch()
+        search.sync(catalog, 'v1')
+
+        for query in ('pow', 'foam hose', 'nozle', 'silvan water 12', 'cabinet', 'eq-012', 'hydrnt valve', ''):
+            everything = search.search(query, len(catalog))
+            top = search.search(query, 20)
+            self.assertLessEqual(len(top), 20, query)
+            self.assertEqual(top, everything[:20], query)
+
+        # Every item with the word is found, those with it in the name before those with it only as type.
+        found = cat_numbers(search.search('cabinet', len(catalog)))
+        in_name = {row['eqp_cat_number'] for row in catalog if 'cabinet' in row['eqp_name'].split()}
+        only_type = {row['eqp_cat_number'] for row in catalog if row['eqp_type'] == 'cabinet'} - in_name
+        self.assertTrue(in_name and only_type)
+        self.assertEqual(set(found[:len(in_name)]), in_name)
+        self.assertEqual(set(found[len(in_name):]), only_type)
+
+    @unittest.skipUnless(os.environ.get('RUN_BENCHMARKS'), 'timing benchmark, set RUN_BENCHMARKS=1 to run')
+    def test_latency(self):
+        search = EquipmentSearch()
+        search.sync(synthetic_catalog(5000), 'v1')
+        samples = []
+        for query in ('pow', 'foam hose', 'nozle', 'silvan water 12', 'cabinet', 'eq-012', 'hydrnt valve'):
+            # Best of a few runs, so a busy machine does not fail the test.
+            best = None
+            for _ in range(5):
+                started = perf_counter()
+                search.search(query, 20)
+                elapsed = (perf_counter() - started) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            samples.append(best)
+        self.assertLess(statistics.median(samples), 1.0, samples)
+
+
+if __name__ == '__main__':
+    unittest.main()
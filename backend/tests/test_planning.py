@@ -0,0 +1,75 @@
+import datetime
+import random
+import unittest
+from collections import Counter
+
+from planning import capacitated_kmeans, plan_month, project, working_days
+
+
+def blobs(rng, centers, per_blob, spread=0.01):
+    return [(lat + rng.uniform(-spread, spread), lon + rng.uniform(-spread, spread)) for lat, lon in centers for _ in range(per_blob)]
+
+
+class CapacitatedKMeansTest(unittest.TestCase):
+    def test_separated_groups_get_their_own_cluster(self):
+        rng = random.Random(1)
+        points = blobs(rng, [(32.0, 34.8), (31.0, 35.2), (33.0, 35.5)], 10)
+        labels = capacitated_kmeans(project(points), 3, [10, 10, 10])
+        for blob in range(3):
+            self.assertEqual(len(set(labels[blob * 10:(blob + 1) * 10])), 1)
+        self.assertEqual(len(set(labels)), 3)
+
+    def test_capacities_are_respected(self):
+        for seed in range(10):
+            rng = random.Random(seed)
+            xy = project([(31.0 + rng.random() * 2, 34.5 + rng.random()) for _ in range(40)])
+            capacities = [rng.randint(5, 15) for _ in range(4)]
+            capacities[0] += max(40 - sum(capacities), 0)
+            counts = Counter(capacitated_kmeans(xy, 4, capacities, seed=seed))
+            self.assertEqual(sum(counts.values()), 40)
+            for cluster, count in counts.items():
+                self.assertLessEqual(count, capacities[cluster])
+
+    def test_closed_cluster_gets_nothing(self):
+        xy = project(blobs(random.Random(2), [(32.0, 34.8)], 6))
+        self.assertNotIn(1, capacitated_kmeans(xy, 2, [6, 0]))
+
+    def test_fixed_points_pull_their_cluster(self):
+        rng = random.Random(3)
+        north, south = blobs(rng, [(33.0, 35.5)], 5), blobs(rng, [(31.0, 34.8)], 5)
+        xy = project(north + south + [(33.0, 35.5), (31.0, 34.8)])
+        # Cluster 1 is anchored in the north, so the northern points join it.
+        labels = capacitated_kmeans(xy[:10], 2, [5, 5], fixed={1: [xy[10]], 0: [xy[11]]})
+        self.assertEqual(labels, [1] * 5 + [0] * 5)
+
+    def test_not_enough_capacity(self):
+        with self.assertRaises(ValueError):
+            capacitated_kmeans(project([(32.0, 34.8)] * 3), 2, [1, 1])
+        self.assertEqual(capacitated_kmeans([], 2, [0, 0]), [])
+
+
+class PlanMonthTest(unittest.TestCase):
+    def test_working_days(self):
+        days = working_days(2024, 2, {6, 0, 1, 2, 3})
+        self.assertEqual(len(days), 21)
+        self.assertTrue(all(day.weekday() not in (4, 5) for day in days))
+
+    def test_spreads_movable_appointments_within_the_daily_limit(self):
+        rng = random.Random(4)
+        days = working_days(2024, 3, {6, 0, 1, 2, 3})[:5]
+        movable = [(f'apt{i}', point) for i, point in enumerate(blobs(rng, [(32.0, 34.8), (31.5, 35.0)], 8))]
+        fixed = [(days[0], (32.0, 34.8)), (days[0], (32.0, 34.8))]
+        plan = plan_month(days, movable, fixed, max_per_day=4)
+        self.assertEqual(set(plan), {key for key, _ in movable})
+        per_day = Counter(plan.values())
+        per_day[days[0]] += 2
+        self.assertTrue(all(count <= 4 for count in per_day.values()))
+
+    def test_edge_cases(self):
+        self.assertEqual(plan_month([], [], []), {})
+        with self.assertRaises(ValueError):
+            plan_month([], [('apt', (32.0, 34.8))], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
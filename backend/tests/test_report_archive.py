@@ -0,0 +1,76 @@
+import datetime
+import unittest
+from unittest import mock
+
+import mysql.connector
+
+import report_archive
+from report_archive import ArchiveCutoffs
+
+
+class FakeConnection:
+    """Answers the ReportArchive reads from cutoffs and records every statement."""
+
+    def __init__(self, cutoffs=None):
+        self.cutoffs = cutoffs
+        self.statements = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        self.statements.append(sql)
+        self.rows = []
+        if sql.startswith("SELECT table_name, archived_before FROM ReportArchive"):
+            if self.cutoffs is None:
+                raise mysql.connector.ProgrammingError(msg="Table 'ReportArchive' doesn't exist", errno=1146)
+            self.rows = list(self.cutoffs.items())
+        self.rowcount = 0
+
+    def fetchall(self):
+        return self.rows
+
+    def commit(self):
+        self.statements.append('COMMIT')
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ArchiveBeforeTest(unittest.TestCase):
+    def archive(self, conn, before):
+        with mock.patch.object(report_archive, 'sleep') as sleep:
+            report_archive.archive_before(conn, before, wait=60)
+        return sleep
+
+    def test_waits_for_readers_before_moving_rows(self):
+        conn = FakeConnection({'ReportedEquipment': datetime.date(2022, 1, 1)})
+        sleep = self.archive(conn, datetime.date(2023, 1, 1))
+        sleep.assert_called_once_with(60)
+        # The cutoffs are committed before any row is selected for moving.
+        first_move = next(i for i, sql in enumerate(conn.statements) if sql.startswith('SELECT DISTINCT'))
+        self.assertIn('COMMIT', conn.statements[:first_move])
+
+    def test_no_wait_when_the_cutoffs_stay(self):
+        before = datetime.date(2023, 1, 1)
+        conn = FakeConnection({'ReportedEquipment': before, 'ReportedCabinet': before})
+        self.archive(conn, before).assert_not_called()
+
+
+class ArchiveCutoffsTest(unittest.TestCase):
+    def test_missing_table_means_nothing_archived(self):
+        cutoffs = ArchiveCutoffs()
+        self.assertFalse(cutoffs.is_archived(FakeConnection(), 'ReportedEquipment', datetime.date(2000, 1, 1)))
+
+    def test_day_before_the_cutoff_is_archived(self):
+        cutoffs = ArchiveCutoffs()
+        conn = FakeConnection({'ReportedEquipment': datetime.date(2023, 1, 1)})
+        self.assertTrue(cutoffs.is_archived(conn, 'ReportedEquipment', datetime.date(2022, 12, 31)))
+        self.assertFalse(cutoffs.is_archived(conn, 'ReportedEquipment', datetime.date(2023, 1, 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import datetime
+import json
+import unittest
+from decimal import Decimal
+
+import report_history
+
+
+def equipment_row(item_id, report_date, **values):
+    row = {column: None for column in report_history.KINDS['equipment']['columns']}
+    row.update({'reqp_id': item_id, 'reqp_date': report_date, 'reqp_client': 7, 'reqp_details': 'EXT-6'})
+    row.update(values)
+    return row
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cur = FakeCursor(rows)
+
+    def cursor(self):
+        return self.cur
+
+
+def through_log(changes):
+    # What _load_changes reads back from the JSON column.
+    return [(item_id, op, json.loads(json.dumps(data)) if data is not None else None) for item_id, op, data in changes]
+
+
+class ReportHistoryTest(unittest.TestCase):
+    def test_reconstructed_rows_keep_column_types(self):
+        first = datetime.date(2022, 3, 1)
+        live = equipment_row(
+            1, first,
+            reqp_location='Lobby',
+            reqp_belongs_cabinet=4,
+            reqp_is_new=0,
+            reqp_in_use=1,
+            reqp_pressure_test_year=2021,
+            reqp_fix_desc='Replaced the seal',
+            reqp_remarks=None
+        )
+        changes, _ = report_history.diff_visit('equipment', {}, [live])
+        state = report_history.apply_changes({}, through_log(changes))
+
+        rows = report_history.rows_from_state('equipment', state, 7, first)
+        self.assertEqual(rows, [live])
+        for column, value in live.items():
+            self.assertIs(type(rows[0][column]), type(value), column)
+
+    def test_tagged_values_round_trip(self):
+        for value in (
+            Decimal('12.50'),
+            datetime.date(2023, 3, 1),
+            datetime.datetime(2022, 3, 1, 9, 30),
+            datetime.time(9, 30),
+            datetime.timedelta(hours=1, minutes=30)
+        ):
+            stored = json.loads(json.dumps(report_history._encode(value)))
+            decoded = report_history._decode(stored)
+            self.assertEqual(decoded, value)
+            self.assertIs(type(decoded), type(value))
+
+    def test_unchanged_visit_records_no_changes(self):
+        first, second = datetime.date(2022, 3, 1), datetime.date(2022, 9, 1)
+        changes, state = report_history.diff_visit('equipment', {}, [equipment_row(1, first, reqp_in_use=1, reqp_location='Lobby')])
+        state = report_history.apply_changes({}, through_log(changes))
+
+        changes, _ = report_history.diff_visit('equipment', state, [equipment_row(1, second, reqp_in_use=1, reqp_location='Lobby')])
+        self.assertEqual(changes, [])
+
+        changes, _ = report_history.diff_visit('equipment', state, [equipment_row(1, second, reqp_in_use=0, reqp_location='Lobby')])
+        self.assertEqual([(item_id, op) for item_id, op, _ in changes], [(1, 'set')])
+
+    def test_plain_values_are_left_alone(self):
+        # Entries written before values were tagged come back as they were stored.
+        state = {1: {'reqp_details': 'EXT-6', 'reqp_remarks': '2022-03-01'}}
+        rows = report_history.rows_from_state('equipment', state, 7, datetime.date(2022, 3, 1))
+        self.assertEqual(rows[0]['reqp_remarks'], '2022-03-01')
+
+    def test_is_compacted(self):
+        conn = FakeConnection([(1,)])
+        self.assertTrue(report_history.is_compacted(conn, 7, 'equipment', '2022-03-01'))
+        self.assertEqual(conn.cur.executed[0][1], (7, 'equipment', '2022-03-01'))
+        self.assertFalse(report_history.is_compacted(FakeConnection([]), 7, 'equipment', '2022-03-01'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import itertools
+import random
+import unittest
+from time import perf_counter
+
+from routing import (
+    distance_matrix, path_length, two_opt, or_opt, solve_open_path, order_stops, savings_routes, plan_routes,
+    repair_path
+)
+
+
+def random_points(rng, count):
+    return [(32.0 + rng.random(), 34.5 + rng.random()) for _ in range(count)]
+
+
+def brute_force_length(matrix):
+    return min(path_length(matrix, [0] + list(order)) for order in itertools.permutations(range(1, len(matrix))))
+
+
+class OpenPathTest(unittest.TestCase):
+    def test_close_to_brute_force_on_small_days(self):
+        for seed in range(40):
+            rng = random.Random(seed)
+            matrix = distance_matrix(random_points(rng, rng.randint(3, 8)))
+            path = solve_open_path(matrix, time_budget=1.0)
+            self.assertEqual(path[0], 0)
+            self.assertEqual(sorted(path), list(range(len(matrix))))
+            # A heuristic, but on days this small it stays within 10% of the optimum.
+            self.assertLessEqual(path_length(matrix, path), brute_force_length(matrix) * 1.1 + 1e-9, seed)
+
+    def test_moves_keep_the_start_and_never_lengthen(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            matrix = distance_matrix(random_points(rng, 12))
+            stops = list(range(1, 12))
+            rng.shuffle(stops)
+            path = [0] + stops
+            for move in (two_opt, or_opt):
+                before = path_length(matrix, path)
+                move(matrix, path, perf_counter() + 1.0)
+                self.assertEqual(path[0], 0)
+                self.assertEqual(sorted(path), list(range(12)))
+                self.assertLessEqual(path_length(matrix, path), before + 1e-9)
+
+    def test_trivial_sizes(self):
+        self.assertEqual(solve_open_path([[0.0]]), [0])
+        self.assertEqual(solve_open_path([[0.0, 1.0], [1.0, 0.0]]), [0, 1])
+
+    def test_order_stops_keeps_unroutable_stops_last(self):
+        stops = [(32.1, 34.8), None, (32.0, 34.81), (32.2, 34.79)]
+        order = order_stops((31.9, 34.8), stops)
+        self.assertEqual(sorted(order), [0, 1, 2, 3])
+        self.assertEqual(order[-1], 1)
+        self.assertEqual(order[0], 2)
+
+
+class PlanRoutesTest(unittest.TestCase):
+    def check_plan(self, matrix, routes, vehicles, capacity):
+        self.assertEqual(len(routes), vehicles)
+        self.assertTrue(all(len(route) <= capacity for route in routes))
+        self.assertEqual(sorted(node for route in routes for node in route), list(range(1, len(matrix))))
+
+    def test_capacity_and_fleet_size(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            stops = rng.randint(0, 30)
+            vehicles = rng.randint(1, 6)
+            capacity = -(-stops // vehicles) + rng.randint(0, 3)
+            matrix = distance_matrix(random_points(rng, stops + 1))
+            self.check_plan(matrix, plan_routes(matrix, vehicles, capacity, time_budget=0.05), vehicles, capacity)
+
+    def test_even_split_by_default(self):
+        matrix = distance_matrix(random_points(random.Random(1), 11))
+        self.check_plan(matrix, plan_routes(matrix, 3, time_budget=0.05), 3, 4)
+
+    def test_more_vehicles_than_stops(self):
+        matrix = distance_matrix(random_points(random.Random(2), 3))
+        routes = plan_routes(matrix, 5)
+        self.check_plan(matrix, routes, 5, 1)
+        self.assertEqual(sum(1 for route in routes if not route), 3)
+
+    def test_rejects_impossible_plans(self):
+        matrix = distance_matrix(random_points(random.Random(3), 7))
+        with self.assertRaises(ValueError):
+            plan_routes(matrix, 0)
+        with self.assertRaises(ValueError):
+            plan_routes(matrix, 2, capacity=2)
+
+    def test_savings_routes_respect_capacity(self):
+        rng = random.Random(4)
+        matrix = distance_matrix(random_points(rng, 16))
+        routes = savings_routes(matrix, 4)
+        self.assertTrue(all(len(route) <= 4 for route in routes))
+        self.assertEqual(sorted(node for route in routes for node in route), list(range(1, 16)))
+
+
+class RepairPathTest(unittest.TestCase):
+    def edit_day(self, seed, removed=0, added=0, start_moves=False):
+        """A solved day edited like the API does: returns (matrix, previous, edited previous path)."""
+        rng = random.Random(seed)
+        start = random_points(rng, 1)[0]
+        stops = random_points(rng, rng.randint(3, 15))
+        order = [node - 1 for node in solve_open_path(distance_matrix([start] + stops))[1:]]
+
+        gone = set(rng.sample(range(len(stops)), min(removed, len(stops))))
+        kept = [i for i in range(len(stops)) if i not in gone]
+        if start_moves:
+            start = (start[0] + rng.uniform(-0.05, 0.05), start[1] + rng.uniform(-0.05, 0.05))
+        matrix = distance_matrix([start] + [stops[i] for i in kept] + random_points(rng, added))
+
+        node_of = {stop: node for node, stop in enumerate(kept, start=1)}
+        previous = [node_of.get(stop) for stop in order]
+        # The old order with the same edits and no repair: removed stops dropped, new ones appended.
+        naive = [0] + [node for node in previous if node is not None] + list(range(len(kept) + 1, len(matrix)))
+        return matrix, previous, naive
+
+    def check_repair(self, matrix, previous, naive):
+        path = repair_path(matrix, previous, time_budget=1.0)
+        self.assertEqual(path[0], 0)
+        self.assertEqual(sorted(path), list(range(len(matrix))))
+        self.assertLessEqual(path_length(matrix, path), path_length(matrix, naive) + 1e-9)
+        return path
+
+    def test_removed_stops(self):
+        for seed in range(30):
+            matrix, previous, naive = self.edit_day(seed, removed=2)
+            self.assertIn(None, previous)
+            self.check_repair(matrix, previous, naive)
+
+    def test_added_stops(self):
+        for seed in range(30):
+            self.check_repair(*self.edit_day(seed, added=3))
+
+    def test_moved_start(self):
+        for seed in range(30):
+            self.check_repair(*self.edit_day(seed, start_moves=True))
+
+    def test_all_edits_at_once(self):
+        for seed in range(30):
+            self.check_repair(*self.edit_day(seed, removed=1, added=2, start_moves=True))
+
+    def test_unchanged_day_keeps_its_order(self):
+        matrix, previous, naive = self.edit_day(7)
+        self.assertEqual(self.check_repair(matrix, previous, naive), naive)
+
+    def test_every_stop_removed(self):
+        self.assertEqual(repair_path([[0.0]], [None, None]), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# Run from backend/: python -m unittest discover tests
+import time
+import unittest
+
+import osrm_stub
+from osrm_stub import StubHandler
+from routing_client import RoutingClient, RoutingUnavailable
+
+COORDINATES = [(34.78, 32.08), (34.80, 32.10), (34.85, 32.05), (34.90, 32.00)]
+
+
+class RoutingClientTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = osrm_stub.serve()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}/trip/v1/driving/'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubHandler.delay = 0.0
+        StubHandler.fail_rate = 0.0
+        StubHandler.response = None
+
+    def client(self, **kwargs):
+        options = {'timeout': 1.0, 'failure_threshold': 2, 'reset_timeout': 0.2}
+        options.update(kwargs)
+        return RoutingClient(self.base_url, **options)
+
+    def test_trip_orders_waypoints(self):
+        # The stub keeps the start first and visits the rest in reverse.
+        self.assertEqual(self.client().trip(COORDINATES), [0, 3, 2, 1])
+
+    def test_timeout(self):
+        StubHandler.delay = 0.3
+        client = self.client(timeout=0.1)
+        with self.assertRaises(RoutingUnavailable):
+            client.trip(COORDINATES)
+        self.assertEqual(client.counters['timeouts'], 1)
+        self.assertEqual(client.counters['failures'], 1)
+
+    def test_error_response(self):
+        StubHandler.fail_rate = 1.0
+        with self.assertRaises(RoutingUnavailable):
+            self.client().trip(COORDINATES)
+
+    def test_malformed_responses(self):
+        client = self.client(failure_threshold=10)
+        for response in [
+            (200, ['not', 'a', 'dict']),
+            (200, {'code': 'Ok', 'waypoints': None}),
+            (200, {'code': 'Ok', 'waypoints': [{'location': [0, 0]}]}),
+            (200, {'code': 'Ok', 'waypoints': [{'waypoint_index': i} for i in range(2)]}),
+        ]:
+            StubHandler.response = response
+            with self.assertRaises(RoutingUnavailable):
+                client.trip(COORDINATES)
+        self.assertEqual(client.counters['failures'], 4)
+
+    def test_breaker_opens_and_short_circuits(self):
+        StubHandler.fail_rate = 1.0
+        client = self.client()
+        for _ in range(2):
+            with self.assertRaises(RoutingUnavailable):
+                client.trip(COORDINATES)
+        self.assertEqual(client.breaker.state, 'open')
+
+        StubHandler.fail_rate = 0.0
+        with self.assertRaises(RoutingUnavailable):
+            client.trip(COORDINATES)
+        self.assertEqual(client.counters['short_circuits'], 1)
+        self.assertEqual(client.counters['calls'], 2)
+
+    def test_failed_trial_reopens_and_successful_trial_closes(self):
+        StubHandler.fail_rate = 1.0
+        client = self.client(failure_threshold=1)
+        with self.assertRaises(RoutingUnavailable):
+            client.trip(COORDINATES)
+
+        # A malformed body during the half-open trial must still settle it.
+        time.sleep(0.25)
+        StubHandler.fail_rate = 0.0
+        StubHandler.response = (200, 'garbage')
+        with self.assertRaises(RoutingUnavailable):
+            client.trip(COORDINATES)
+        self.assertFalse(client.breaker.trial_running)
+        self.assertEqual(client.breaker.state, 'open')
+
+        time.sleep(0.25)
+        StubHandler.response = None
+        self.assertEqual(client.trip(COORDINATES), [0, 3, 2, 1])
+        self.assertEqual(client.breaker.state, 'closed')
+
+
+if __name__ == '__main__':
+    unittest.main()
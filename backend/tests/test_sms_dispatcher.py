@@ -0,0 +1,98 @@
+import time
+import unittest
+
+import sms_stub
+from sms_stub import StubHandler
+from sms_dispatcher import SMSDispatcher, SMSQueueFull
+
+
+def payload(recipient, text):
+    return {'recipient': recipient, 'msg': text}
+
+
+class SMSDispatcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = sms_stub.serve()
+        cls.url = f'http://127.0.0.1:{cls.server.server_address[1]}/'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        sms_stub.reset()
+        self.dispatchers = []
+
+    def tearDown(self):
+        for dispatcher in self.dispatchers:
+            dispatcher.close()
+
+    def dispatcher(self, build_payload=payload, **kwargs):
+        options = {'workers': 2, 'retries': 2, 'backoff': 0.01, 'timeout': 1.0}
+        options.update(kwargs)
+        dispatcher = SMSDispatcher(self.url, build_payload, **options)
+        self.dispatchers.append(dispatcher)
+        return dispatcher
+
+    def wait_for(self, dispatcher, message_id, statuses=('sent', 'failed'), timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = dispatcher.status(message_id)
+            if status is not None and status['status'] in statuses:
+                return status
+            time.sleep(0.01)
+        self.fail(f"message {message_id} did not reach {statuses}")
+
+    def test_delivers_in_background(self):
+        dispatcher = self.dispatcher()
+        message_ids = [dispatcher.send(f'05000000{i:02d}', 'code') for i in range(20)]
+        for message_id in message_ids:
+            self.assertEqual(self.wait_for(dispatcher, message_id)['status'], 'sent')
+        self.assertEqual(StubHandler.received, 20)
+
+    def test_retries_then_fails(self):
+        StubHandler.fail_rate = 1.0
+        dispatcher = self.dispatcher()
+        status = self.wait_for(dispatcher, dispatcher.send('0500000000', 'code'))
+        self.assertEqual(status['status'], 'failed')
+        self.assertEqual(status['attempts'], 3)
+        self.assertEqual(StubHandler.failed, 3)
+
+    def test_queued_message_to_same_recipient_is_replaced(self):
+        StubHandler.delay = 0.2
+        dispatcher = self.dispatcher(workers=1)
+        dispatcher.send('0500000001', 'first')
+        time.sleep(0.05)
+        # The worker is busy with the first message, these two share one queue slot.
+        second = dispatcher.send('0500000002', 'old code')
+        third = dispatcher.send('0500000002', 'new code')
+        self.assertEqual(second, third)
+        self.wait_for(dispatcher, third)
+        self.assertEqual(StubHandler.recipients.get('0500000002'), 1)
+
+    def test_queue_full(self):
+        StubHandler.delay = 0.2
+        dispatcher = self.dispatcher(workers=1, queue_size=1)
+        dispatcher.send('0500000001', 'busy')
+        time.sleep(0.05)
+        dispatcher.send('0500000002', 'queued')
+        with self.assertRaises(SMSQueueFull):
+            dispatcher.send('0500000003', 'no room')
+
+    def test_worker_survives_unexpected_errors(self):
+        def build_payload(recipient, text):
+            if text == 'boom':
+                raise RuntimeError('broken payload')
+            return payload(recipient, text)
+
+        dispatcher = self.dispatcher(build_payload, workers=1)
+        with self.assertLogs('sms_dispatcher', 'ERROR'):
+            broken = dispatcher.send('0500000001', 'boom')
+            self.assertEqual(self.wait_for(dispatcher, broken)['status'], 'failed')
+        self.assertEqual(self.wait_for(dispatcher, dispatcher.send('0500000002', 'code'))['status'], 'sent')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import random
+import unittest
+
+from routing import haversine_km
+from spatial_index import GridIndex
+
+
+def random_points(rng, count):
+    return {key: (31.0 + rng.random() * 2, 34.4 + rng.random()) for key in range(count)}
+
+
+class GridIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.points = random_points(random.Random(5), 300)
+        self.index = GridIndex(cell_km=5.0)
+        for key, point in self.points.items():
+            self.index.add(key, point, payload={'id': key})
+
+    def brute_force(self, center, radius_km):
+        return sorted(
+            (haversine_km(center, point), key) for key, point in self.points.items()
+            if haversine_km(center, point) <= radius_km
+        )
+
+    def test_within_matches_brute_force(self):
+        rng = random.Random(6)
+        for radius_km in (0.0, 1.0, 4.9, 12.0, 40.0, 500.0):
+            center = (31.0 + rng.random() * 2, 34.4 + rng.random())
+            found = self.index.within(center, radius_km)
+            self.assertEqual([(d, key) for d, key, _ in found], self.brute_force(center, radius_km))
+            self.assertTrue(all(payload == {'id': key} for _, key, payload in found))
+
+    def test_within_limit_keeps_the_nearest(self):
+        center = (32.0, 34.9)
+        self.assertEqual(
+            [key for _, key, _ in self.index.within(center, 30.0, limit=5)],
+            [key for _, key in self.brute_force(center, 30.0)[:5]]
+        )
+
+    def test_nearest_matches_brute_force(self):
+        center = (31.7, 34.8)
+        expected = [key for _, key in sorted((haversine_km(center, point), key) for key, point in self.points.items())[:7]]
+        self.assertEqual([key for _, key, _ in self.index.nearest(center, 7)], expected)
+        odd = self.index.nearest(center, 3, predicate=lambda key, payload: key % 2)
+        self.assertTrue(all(key % 2 for _, key, _ in odd))
+
+    def test_move_and_remove(self):
+        self.index.add(0, (29.5, 34.9))
+        # Adding an existing key moves it, with the new payload (none here).
+        self.assertIsNone(self.index.get(0))
+        self.assertEqual([key for _, key, _ in self.index.within((29.5, 34.9), 1.0)], [0])
+        self.assertTrue(self.index.remove(0))
+        self.assertFalse(self.index.remove(0))
+        self.assertNotIn(0, self.index)
+        self.assertEqual(self.index.within((29.5, 34.9), 1.0), [])
+        self.assertEqual(len(self.index), 299)
+
+    def test_invalid_radius(self):
+        for radius_km in (-1.0, float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                self.index.within((32.0, 34.9), radius_km)
+        self.assertEqual(GridIndex().within((32.0, 34.9), 10.0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
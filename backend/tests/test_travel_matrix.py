@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+from routing import haversine_km
+from travel_matrix import TravelMatrix
+
+
+def clients(count, lat=32.0, lon=34.8):
+    return [(client_id, lat + client_id * 0.01, lon) for client_id in range(1, count + 1)]
+
+
+class TravelMatrixTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # A directory that does not exist yet, it is created on first use.
+        self.path = os.path.join(self.tmp.name, 'data', 'travel_matrix.bin')
+        self.matrices = []
+
+    def tearDown(self):
+        for matrix in self.matrices:
+            matrix.close()
+        self.tmp.cleanup()
+
+    def matrix(self, capacity=4):
+        matrix = TravelMatrix(self.path, capacity=capacity)
+        self.matrices.append(matrix)
+        return matrix
+
+    def assert_distances(self, matrix, rows):
+        points = {client_id: (lat, lon) for client_id, lat, lon in rows}
+        for a in points:
+            for b in points:
+                self.assertAlmostEqual(matrix.distance(a, b), haversine_km(points[a], points[b]), places=3)
+
+    def test_growth_keeps_existing_distances(self):
+        matrix = self.matrix(capacity=4)
+        rows = clients(3)
+        self.assertEqual(matrix.sync(rows), 3)
+        self.assertEqual(matrix.capacity, 4)
+
+        rows += clients(10)[3:]
+        self.assertEqual(matrix.sync(rows), 7)
+        self.assertEqual(matrix.capacity, 16)
+        self.assert_distances(matrix, rows)
+        self.assertEqual(os.path.getsize(self.path), 16 * 16 * 4)
+
+    def test_only_new_or_moved_clients_are_recomputed(self):
+        matrix = self.matrix()
+        rows = clients(5)
+        matrix.sync(rows)
+        self.assertEqual(matrix.sync(rows), 0)
+
+        rows[2] = (3, 31.5, 35.0)
+        self.assertEqual(matrix.sync(rows), 1)
+        self.assert_distances(matrix, rows)
+        self.assertEqual(matrix.submatrix([3, 1]), [[0.0, matrix.distance(3, 1)], [matrix.distance(1, 3), 0.0]])
+
+    def test_clients_without_coordinates_are_skipped(self):
+        matrix = self.matrix()
+        self.assertEqual(matrix.sync([(1, 32.0, 34.8), (2, None, 34.8)]), 1)
+        self.assertIn(1, matrix)
+        self.assertNotIn(2, matrix)
+
+    def test_instances_share_the_file(self):
+        first, second = self.matrix(capacity=2), self.matrix(capacity=2)
+        rows = clients(3)
+        first.sync(rows)
+        # The second worker sees the first one's work and has nothing to compute.
+        self.assertEqual(second.sync(rows), 0)
+        self.assert_distances(second, rows)
+
+        rows += clients(6)[3:]
+        second.sync(rows)
+        self.assertIn(6, first)
+        self.assertEqual(first.capacity, 8)
+        self.assert_distances(first, rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+import ttl_store
+from auth_store import MemoryAuthStore, StoreDict
+from ttl_store import TTLStore
+
+
+class TTLStoreTest(unittest.TestCase):
+    def test_expiry(self):
+        store = TTLStore(sweep_interval=0)
+        with mock.patch.object(ttl_store, 'monotonic', return_value=100.0):
+            store.set('otp', '123456', ttl=10)
+            store.set('version', 3)
+            self.assertEqual(store.incr('attempts', ttl=10), 1)
+            self.assertEqual(store.incr('attempts', ttl=10), 2)
+        with mock.patch.object(ttl_store, 'monotonic', return_value=110.0):
+            self.assertIsNone(store.get('otp'))
+            self.assertEqual(store.incr('attempts', ttl=10), 1)
+            self.assertEqual(store.sweep(), 0)
+            self.assertEqual(store.get('version'), 3)
+
+    def test_full_stripe_evicts_the_entry_closest_to_expiring(self):
+        store = TTLStore(max_entries=3, stripes=1, sweep_interval=0)
+        store.set('soon', 1, ttl=10)
+        store.set('later', 2, ttl=100)
+        store.set('forever', 3)
+        store.set('new', 4, ttl=50)
+        self.assertIsNone(store.get('soon'))
+        self.assertEqual([store.get(key) for key in ('later', 'forever', 'new')], [2, 3, 4])
+        self.assertEqual(store.stats()['evictions'], 1)
+        self.assertEqual(len(store), 3)
+
+
+class MemoryAuthStoreTest(unittest.TestCase):
+    def test_attempt_flood_does_not_lift_blocks(self):
+        store = MemoryAuthStore(max_entries=1600, sweep_interval=0)
+        blocked = StoreDict(store, 'employee_login_blocked')
+        attempts = StoreDict(store, 'employee_login_attempts')
+        otps = StoreDict(store, 'otp')
+        versions = StoreDict(store, 'calendar_version')
+        blocked.set('admin', 1, ttl=7200)
+        otps.set('0500000000', '123456', ttl=600)
+        versions.incr('2024-03')
+
+        # Credential stuffing with made-up usernames, each counter expiring before the block.
+        for i in range(5000):
+            attempts.incr(f'user{i}', ttl=60)
+
+        self.assertIn('admin', blocked)
+        self.assertEqual(otps.get('0500000000'), '123456')
+        self.assertEqual(versions.get('2024-03'), 1)
+        stats = store.stats()
+        self.assertGreater(stats['namespaces']['employee_login_attempts']['evictions'], 0)
+        self.assertEqual(stats['namespaces']['employee_login_blocked']['evictions'], 0)
+        self.assertLessEqual(stats['namespaces']['employee_login_attempts']['entries'], 1600)
+
+
+if __name__ == '__main__':
+    unittest.main()
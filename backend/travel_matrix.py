@@ -0,0 +1,228 @@
+import json
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): the matrix file is then only safe to share between threads of one process.
+    fcntl = None
+
+from routing import haversine_km
+
+# Bytes per stored distance (float32).
+CELL_SIZE = 4
+
+
+class TravelMatrix:
+    """Pairwise client distance matrix persisted in a memory-mapped file.
+
+    Distances are stored in km in a capacity x capacity float32 grid, and a
+    small JSON index next to it maps client_id to its slot and the
+    coordinates the slot was computed from. sync() only recomputes the
+    row/column of clients that are new or whose coordinates changed, so the
+    matrix is never rebuilt from scratch.
+
+    Workers share the file through a lock file: lookups hold a shared lock
+    while they read the mapped cells, sync() takes the exclusive lock only
+    when some client actually needs (re)computing.
+    """
+
+    def __init__(self, path, capacity=512, road_factor=1.3, avg_speed_kmh=50.0):
+        self.path = path
+        self.index_path = path + '.json'
+        self.lock_path = path + '.lock'
+        self.road_factor = road_factor
+        self.avg_speed_kmh = avg_speed_kmh
+        self.min_capacity = capacity
+        self.capacity = 0
+        self.slots = {}
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._mm = None
+        self._view = None
+        self._index_mtime = None
+
+    # --- file handling ---
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        # Called with self._lock held, so one open lock file serves every thread.
+        if self._lock_file is None:
+            # Every file access goes through here first, so this is where the data directory gets created.
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            if fcntl is None:
+                self._lock_file = False
+            else:
+                self._lock_file = open(self.lock_path, 'a')
+        if not self._lock_file:
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            self._index_mtime = os.path.getmtime(self.index_path)
+            return index
+        except (OSError, ValueError):
+            self._index_mtime = None
+            return {'capacity': self.min_capacity, 'slots': {}}
+
+    def _write_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'capacity': self.capacity, 'slots': self.slots}, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = os.path.getmtime(self.index_path)
+
+    def _map(self, capacity):
+        self._unmap()
+        size = capacity * capacity * CELL_SIZE
+        with open(self.path, 'a+b') as f:
+            if os.fstat(f.fileno()).st_size < size:
+                f.truncate(size)
+        with open(self.path, 'r+b') as f:
+            self._mm = mmap.mmap(f.fileno(), size)
+        self._view = memoryview(self._mm).cast('f')
+        self.capacity = capacity
+
+    def _unmap(self):
+        if self._view is not None:
+            self._view.release()
+            self._mm.close()
+        self._view = None
+        self._mm = None
+
+    def _load(self):
+        # Another worker may have extended the matrix since we last looked.
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            mtime = None
+        if self._view is not None and mtime == self._index_mtime:
+            return
+        index = self._read_index()
+        self.slots = index['slots']
+        self._map(index['capacity'])
+
+    def _grow(self, capacity):
+        old_capacity, old_view = self.capacity, self._view
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.truncate(capacity * capacity * CELL_SIZE)
+        with open(tmp_path, 'r+b') as f:
+            mm = mmap.mmap(f.fileno(), capacity * capacity * CELL_SIZE)
+        view = memoryview(mm).cast('f')
+        for row in range(old_capacity):
+            view[row * capacity:row * capacity + old_capacity] = old_view[row * old_capacity:(row + 1) * old_capacity]
+        view.release()
+        mm.flush()
+        mm.close()
+        self._unmap()
+        os.replace(tmp_path, self.path)
+        self._map(capacity)
+
+    # --- updates ---
+
+    def _pending(self, clients):
+        # (key, lat, lon) of the clients that are new or moved.
+        pending = []
+        for client_id, lat, lon in clients:
+            if lat is None or lon is None:
+                continue
+            key = str(client_id)
+            lat, lon = float(lat), float(lon)
+            entry = self.slots.get(key)
+            if entry is None or entry[1] != lat or entry[2] != lon:
+                pending.append((key, lat, lon))
+        return pending
+
+    def sync(self, clients):
+        """Bring the matrix up to date with (client_id, lat, lon) tuples.
+
+        Returns the number of clients whose distances were (re)computed.
+        Clients without coordinates are ignored.
+        """
+        clients = list(clients)
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                self._load()
+                if not self._pending(clients):
+                    return 0
+
+            with self._file_lock(exclusive=True):
+                # Another worker may have done the work while we waited for the lock.
+                self._load()
+                changed = []
+                for key, lat, lon in self._pending(clients):
+                    entry = self.slots.get(key)
+                    if entry is None:
+                        entry = [len(self.slots), lat, lon]
+                        self.slots[key] = entry
+                    else:
+                        entry[1], entry[2] = lat, lon
+                    changed.append(entry)
+
+                if not changed:
+                    return 0
+
+                if len(self.slots) > self.capacity:
+                    capacity = self.capacity
+                    while capacity < len(self.slots):
+                        capacity *= 2
+                    self._grow(capacity)
+
+                points = [(slot, (lat, lon)) for slot, lat, lon in self.slots.values()]
+                view, capacity = self._view, self.capacity
+                for slot, lat, lon in changed:
+                    origin = (lat, lon)
+                    for other, point in points:
+                        d = haversine_km(origin, point) if other != slot else 0.0
+                        view[slot * capacity + other] = d
+                        view[other * capacity + slot] = d
+
+                self._mm.flush()
+                self._write_index()
+                return len(changed)
+
+    # --- lookups ---
+
+    def __contains__(self, client_id):
+        with self._lock, self._file_lock(exclusive=False):
+            self._load()
+            return str(client_id) in self.slots
+
+    def distance(self, a, b):
+        # The shared lock keeps a concurrent sync() from rewriting cells while they are read.
+        with self._lock, self._file_lock(exclusive=False):
+            self._load()
+            slot_a = self.slots[str(a)][0]
+            slot_b = self.slots[str(b)][0]
+            return self._view[slot_a * self.capacity + slot_b]
+
+    def submatrix(self, client_ids):
+        """Distances (km) between the given clients, in the given order."""
+        with self._lock, self._file_lock(exclusive=False):
+            self._load()
+            slots = [self.slots[str(client_id)][0] for client_id in client_ids]
+            view, capacity = self._view, self.capacity
+            return [[view[a * capacity + b] for b in slots] for a in slots]
+
+    def duration_minutes(self, distance_km):
+        # Straight-line km scaled to an approximate road drive time.
+        return distance_km * self.road_factor / self.avg_speed_kmh * 60
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+            if self._lock_file:
+                self._lock_file.close()
+                self._lock_file = None
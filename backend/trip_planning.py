@@ -0,0 +1,145 @@
+import datetime
+import logging
+
+import mysql.connector
+
+from config import (
+    OSRM_TRIP_URL, OSRM_REFINE, OSRM_TIMEOUT, OSRM_POOL_SIZE, OSRM_FAILURE_THRESHOLD, OSRM_RESET_TIMEOUT,
+    TRAVEL_MATRIX_PATH, PRECOMPUTED_TRIPS_DIR, DEPOT_LAT, DEPOT_LONG
+)
+from database import get_db_connection
+from routing import to_point, order_stops
+from routing_client import RoutingClient, RoutingUnavailable
+from travel_matrix import TravelMatrix
+from trip_store import TripStore
+
+logger = logging.getLogger(__name__)
+
+# Trip ordering shared by the API and precompute_trips.py.
+travel_matrix = TravelMatrix(TRAVEL_MATRIX_PATH)
+routing_client = RoutingClient(OSRM_TRIP_URL, OSRM_TIMEOUT, OSRM_POOL_SIZE, OSRM_FAILURE_THRESHOLD, OSRM_RESET_TIMEOUT)
+trip_store = TripStore(PRECOMPUTED_TRIPS_DIR)
+
+
+def get_osrm_trip(start_lat, start_lon, clients):
+    # Extract the waypoints coordinates from the clients array
+    waypoints = [(client['client_lat'], client['client_long']) for client in clients]
+
+    # Combine starting point and waypoints into a single list
+    coordinates = [(start_lon, start_lat)] + [(lon, lat) for lat, lon in waypoints]
+
+    try:
+        waypoint_order = routing_client.trip(coordinates)
+    except RoutingUnavailable as err:
+        return None, str(err)
+
+    # Create an ordered list of clients based on the waypoints order
+    ordered_clients = [clients[i - 1] for i in waypoint_order[1:]]  # Skip the first element as it is the start point
+
+    return ordered_clients, None
+
+
+def get_travel_submatrix(clients):
+    # Shared client-to-client distances; only new or moved clients are recomputed.
+    try:
+        travel_matrix.sync((client['apt_client'], client['client_lat'], client['client_long']) for client in clients)
+        return travel_matrix.submatrix([client['apt_client'] for client in clients])
+    except (OSError, KeyError, ValueError) as err:
+        logger.warning(f"Travel matrix unavailable: {err}")
+        return None
+
+
+def get_optimal_trip(start_lat, start_lon, clients):
+    start = to_point(start_lat, start_lon)
+    if start is None:
+        return None, "Invalid start coordinates"
+
+    # Order the trip locally from the coordinates we already have.
+    stops = [to_point(client['client_lat'], client['client_long']) for client in clients]
+    stop_matrix = get_travel_submatrix(clients)
+    ordered_clients = [clients[i] for i in order_stops(start, stops, stop_matrix)]
+
+    # Road-network refinement through OSRM is optional, the local order is always a valid answer.
+    if OSRM_REFINE and all(stops):
+        osrm_clients, error = get_osrm_trip(start_lat, start_lon, ordered_clients)
+        if not error:
+            return osrm_clients, None
+        logger.warning(f"OSRM refinement failed: {error}")
+
+    return ordered_clients, None
+
+
+def fetch_day_open_tasks(apt_date):
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Database connection failed"
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute('''
+                SELECT 
+                    a.apt_emp_executive,
+                    a.apt_client,
+                    c.client_name,
+                    c.client_lat,
+                    c.client_long,
+                    c.client_city,
+                    c.client_street,
+                    c.client_street_number,
+                    cr.rep_phone
+                FROM 
+                    Appointment a
+                LEFT JOIN 
+                    Client c ON a.apt_client = c.client_id
+                LEFT JOIN 
+                    ClientRepresentative cr ON c.client_rep = cr.rep_id
+                WHERE 
+                    a.apt_emp_executive IS NOT NULL
+                    AND a.apt_date = %s
+                    AND a.apt_status = 'open'
+                ''', (apt_date,))
+        result = cursor.fetchall()
+    except mysql.connector.Error as err:
+        logger.error("Database query failed.")
+        logger.error(err)
+        return None, "Database query failed"
+    finally:
+        cursor.close()
+        conn.close()
+
+    return result, None
+
+
+def precompute_day_trips(apt_date):
+    """Order every employee's open stops of apt_date from the home base and store the plans."""
+    try:
+        apt_date = datetime.date.fromisoformat(str(apt_date)).isoformat()
+    except ValueError:
+        return None, "apt_date must be YYYY-MM-DD"
+    depot = to_point(DEPOT_LAT, DEPOT_LONG)
+    if depot is None:
+        return None, "DEPOT_LAT and DEPOT_LONG must be set to precompute trips"
+
+    results, error = fetch_day_open_tasks(apt_date)
+    if error:
+        return None, error
+
+    tasks_by_employee = {}
+    for row in results:
+        emp_id = row.pop('apt_emp_executive')
+        tasks_by_employee.setdefault(str(emp_id), []).append(row)
+
+    plans = {}
+    for emp_id, tasks in tasks_by_employee.items():
+        ordered_tasks, error = get_optimal_trip(depot[0], depot[1], tasks)
+        if error:
+            logger.warning(f"Could not precompute the trip of employee {emp_id}: {error}")
+            continue
+        plans[emp_id] = {
+            "start": list(depot),
+            "stops": ordered_tasks,
+            "computed_at": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    trip_store.put_day(apt_date, plans)
+    return len(plans), None
@@ -0,0 +1,136 @@
+import datetime
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): only threads of one process may then share the directory.
+    fcntl = None
+
+
+class TripStore:
+    """Precomputed trips per day, shared between workers through JSON files.
+
+    Every day has its own file mapping emp_ID to the planned trip. Reads
+    are served from memory and only reload a file when its mtime changed,
+    so a lookup is a stat and a dict access.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._days = {}
+        self._claim_file = None
+
+    @staticmethod
+    def _day(apt_date):
+        # Days come from request data and end up in a file name, so only real dates get through.
+        return datetime.date.fromisoformat(str(apt_date)).isoformat()
+
+    def _path(self, apt_date):
+        return os.path.join(self.directory, f'{apt_date}.json')
+
+    def _read(self, apt_date):
+        path = self._path(apt_date)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self._days.pop(apt_date, None)
+            return {}
+        cached = self._days.get(apt_date)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path) as f:
+                plans = json.load(f)
+        except (OSError, ValueError):
+            plans = {}
+        if not isinstance(plans, dict):
+            plans = {}
+        self._days[apt_date] = (mtime, plans)
+        return plans
+
+    def _write(self, apt_date, plans):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(apt_date)
+        if not plans:
+            if os.path.exists(path):
+                os.remove(path)
+            self._days.pop(apt_date, None)
+            return
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(plans, f, default=str)
+        os.replace(tmp_path, path)
+        self._days.pop(apt_date, None)
+
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return open(os.path.join(self.directory, '.lock'), 'a')
+
+    @staticmethod
+    def _flock(lock_file, unlock=False):
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN if unlock else fcntl.LOCK_EX)
+
+    def get(self, emp_id, apt_date):
+        """The stored plan, or None. Raises ValueError when apt_date is not a YYYY-MM-DD date."""
+        apt_date = self._day(apt_date)
+        with self._lock:
+            return self._read(apt_date).get(str(emp_id))
+
+    def put_day(self, apt_date, plans):
+        """Replace every plan of a day with plans, a dict of emp_ID -> plan."""
+        apt_date = self._day(apt_date)
+        with self._lock, self._locked() as lock_file:
+            self._flock(lock_file)
+            try:
+                self._write(apt_date, {str(emp_id): plan for emp_id, plan in plans.items()})
+            finally:
+                self._flock(lock_file, unlock=True)
+
+    def invalidate(self, apt_date, emp_id=None, client_id=None):
+        """Drop the employee's plan and any plan visiting the client, or the whole day when neither is given."""
+        apt_date = self._day(apt_date)
+        with self._lock, self._locked() as lock_file:
+            self._flock(lock_file)
+            try:
+                plans = self._read(apt_date)
+                if not plans:
+                    return 0
+                if emp_id is None and client_id is None:
+                    kept = {}
+                else:
+                    kept = {
+                        emp: plan for emp, plan in plans.items()
+                        if emp != str(emp_id)
+                        and not any(str(stop['apt_client']) == str(client_id) for stop in plan['stops'])
+                    }
+                if len(kept) != len(plans):
+                    self._write(apt_date, kept)
+                return len(plans) - len(kept)
+            finally:
+                self._flock(lock_file, unlock=True)
+
+    def claim_precompute(self):
+        """True in exactly one of the processes sharing the directory, so only that one runs the nightly job.
+
+        The first caller takes a lock on the directory's claim file and keeps
+        it until it exits, after which the next caller takes over.
+        """
+        if fcntl is None:
+            return True
+        with self._lock:
+            if self._claim_file is not None:
+                return True
+            os.makedirs(self.directory, exist_ok=True)
+            claim_file = open(os.path.join(self.directory, '.precompute.lock'), 'a')
+            try:
+                fcntl.flock(claim_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                claim_file.close()
+                return False
+            self._claim_file = claim_file
+            return True
@@ -0,0 +1,137 @@
+import heapq
+import sys
+import threading
+from time import monotonic
+
+
+class _Stripe:
+    __slots__ = ('lock', 'data', 'heap')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (value, expires or None)
+        self.data = {}
+        # (expires, key) entries, possibly stale after a key was re-set or deleted
+        self.heap = []
+
+
+class TTLStore:
+    """Bounded in-memory key/value store whose entries expire on their own.
+
+    Keys are spread over lock stripes so concurrent requests rarely wait on
+    each other; get/set/incr are O(1) apart from the O(log n) heap push
+    that schedules an expiry. Expired entries are dropped on access and by
+    sweep(), which a background thread runs every sweep_interval seconds.
+    When a stripe is full, the entry closest to expiring is evicted.
+    """
+
+    def __init__(self, max_entries=100000, stripes=16, sweep_interval=30.0):
+        self.stripes = [_Stripe() for _ in range(stripes)]
+        self.max_per_stripe = max(max_entries // stripes, 1)
+        self.evictions = 0
+        self.expired = 0
+        if sweep_interval:
+            self._stop = threading.Event()
+            sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,), daemon=True)
+            sweeper.start()
+
+    def _stripe(self, key):
+        return self.stripes[hash(key) % len(self.stripes)]
+
+    def _live(self, stripe, key, now):
+        entry = stripe.data.get(key)
+        if entry is not None and entry[1] is not None and now >= entry[1]:
+            del stripe.data[key]
+            self.expired += 1
+            return None
+        return entry
+
+    def _store(self, stripe, key, value, expires):
+        if key not in stripe.data and len(stripe.data) >= self.max_per_stripe:
+            self._evict(stripe)
+        stripe.data[key] = (value, expires)
+        if expires is not None:
+            heapq.heappush(stripe.heap, (expires, key))
+            if len(stripe.heap) > 2 * len(stripe.data) + 64:
+                stripe.heap = [(entry[1], k) for k, entry in stripe.data.items() if entry[1] is not None]
+                heapq.heapify(stripe.heap)
+
+    def _evict(self, stripe):
+        while stripe.heap:
+            expires, key = heapq.heappop(stripe.heap)
+            entry = stripe.data.get(key)
+            if entry is not None and entry[1] == expires:
+                del stripe.data[key]
+                self.evictions += 1
+                return
+        # Nothing scheduled to expire, drop the oldest entry instead.
+        del stripe.data[next(iter(stripe.data))]
+        self.evictions += 1
+
+    def get(self, key, default=None):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = self._live(stripe, key, monotonic())
+            return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            self._store(stripe, key, value, monotonic() + ttl if ttl is not None else None)
+
+    def incr(self, key, amount=1, ttl=None):
+        """Add amount to the value of key, creating it with ttl when missing or expired."""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            now = monotonic()
+            entry = self._live(stripe, key, now)
+            if entry is None:
+                value = amount
+                self._store(stripe, key, value, now + ttl if ttl is not None else None)
+            else:
+                value = entry[0] + amount
+                stripe.data[key] = (value, entry[1])
+            return value
+
+    def delete(self, key):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            return stripe.data.pop(key, None) is not None
+
+    def sweep(self):
+        """Drop every expired entry, returning how many were removed."""
+        removed = 0
+        for stripe in self.stripes:
+            with stripe.lock:
+                now = monotonic()
+                while stripe.heap and stripe.heap[0][0] <= now:
+                    expires, key = heapq.heappop(stripe.heap)
+                    entry = stripe.data.get(key)
+                    if entry is not None and entry[1] == expires:
+                        del stripe.data[key]
+                        removed += 1
+        self.expired += removed
+        return removed
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.sweep()
+
+    def close(self):
+        if hasattr(self, '_stop'):
+            self._stop.set()
+
+    def __len__(self):
+        return sum(len(stripe.data) for stripe in self.stripes)
+
+    def stats(self):
+        entries = 0
+        size = 0
+        for stripe in self.stripes:
+            with stripe.lock:
+                entries += len(stripe.data)
+                size += sys.getsizeof(stripe.data) + sys.getsizeof(stripe.heap)
+                for key, entry in stripe.data.items():
+                    size += sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry[0])
+                size += len(stripe.heap) * 72
+        return {'entries': entries, 'bytes': size, 'evictions': self.evictions, 'expired': self.expired}